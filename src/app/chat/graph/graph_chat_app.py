@@ -1,11 +1,16 @@
 import sys
 import traceback
 import os
+import atexit
+import asyncio
 import logging
 import json
+import re
 from datetime import datetime
+from itertools import islice
+from contextlib import contextmanager
 from common.visualization_selector import VisualizationSelector, render_visualization
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, READ_ACCESS
 from decimal import Decimal
 
 # Get the src directory path
@@ -25,100 +30,87 @@ logger = logging.getLogger('database_chat')
 
 # Import using absolute paths
 from common.db_utils import get_db_connection
+from common.embed_batcher import embed
+from common.llm_utils import chat_completion, chat_completion_choices, iter_async, run_async, stream_chat_completion
 from metadata.get_database_ddl import get_database_ddl
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
+import orjson
 from sqlalchemy import text
-import openai
-from typing import Tuple, Dict
+from typing import AsyncIterator, Tuple, Dict, List
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
+def _json_default(obj):
+    """Serialize values orjson does not handle natively (Decimal, pandas Timestamps, ...)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+def to_json(obj) -> str:
+    """Serialize an object to a JSON string using orjson"""
+    return orjson.dumps(obj, default=_json_default).decode()
 
 # Neo4j connection parameters
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "password"
 
-def get_neo4j_driver():
-    """Get a Neo4j driver instance"""
-    return GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-
-
-def get_graph_summary() -> str:
-    """Generate a database summary using graph data"""
-    logger.info("Generating database summary from graph")
-    with get_neo4j_driver().session() as session:
-        # Query to get table and column statistics
-        result = session.run("""
-        MATCH (t:Table)-[:HAS_COLUMN]->(c:Column)
-        WITH t.schema as schema, t.name as name, count(c) as column_count
-        ORDER BY schema, name
-        WITH collect({name: name, schema: schema, columns: column_count}) as tables
-        RETURN size(tables) as table_count,
-               reduce(total = 0, t IN tables | total + t.columns) as total_columns,
-               tables
-        """)
-        stats = result.single()
-        
-        # Query to get semantic relationships
-        sem_result = session.run("""
-        MATCH (c1:Column)-[r:SEMANTIC_RELATION]->(c2:Column)
-        WITH type(r) as rel_type, count(r) as rel_count
-        RETURN collect({type: rel_type, count: rel_count}) as relationships,
-               sum(rel_count) as total_relationships
-        """)
-        sem_stats = sem_result.single()
-        
-        # Build summary context
-        context = {
-            "overview": {
-                "table_count": stats["table_count"],
-                "total_columns": stats["total_columns"],
-                "total_relationships": sem_stats["total_relationships"]
+# Default LIMIT appended to generated Cypher and hard cap on streamed context rows
+GRAPH_CONTEXT_LIMIT = 50
+MAX_GRAPH_CONTEXT_ROWS = 200
+_CYPHER_LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+|\$\w+)\s*$", re.IGNORECASE)
+
+# Optional Cypher runtime hint for graph queries, e.g. "pipelined" or "parallel". Those
+# runtimes require Neo4j Enterprise Edition; the bundled Community Edition only offers the
+# default slotted runtime, so no hint is sent unless one is configured
+NEO4J_CYPHER_RUNTIME = os.getenv("NEO4J_CYPHER_RUNTIME", "")
+# Debug mode: run graph queries under PROFILE and log the planner's choices
+NEO4J_PROFILE = os.getenv("NEO4J_PROFILE", "").lower() in ("1", "true", "yes")
+
+# Cosine similarity above which a question reuses the previous turn's graph context
+FOLLOW_UP_SIMILARITY = float(os.getenv("FOLLOW_UP_SIMILARITY", 0.85))
+
+# Sampling temperature when several SQL candidates are generated at once, so they actually differ
+SQL_CANDIDATE_TEMPERATURE = 0.7
+
+# Markdown code fence (optionally tagged, e.g. ```sql) wrapping a generated query
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?(.*?)\n?```\s*$", re.DOTALL)
+
+# Strict structured-output schema for validate_query responses
+VALIDATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "validation",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "is_valid": {"type": "boolean"},
+                "explanation": {"type": "string"},
+                "suggested_improvements": {"type": "array", "items": {"type": "string"}}
             },
-            "tables": stats["tables"],
-            "relationships": sem_stats["relationships"]
+            "required": ["is_valid", "explanation", "suggested_improvements"],
+            "additionalProperties": False
         }
-        
-        # Generate summary using LLM
-        system_prompt = """You are a helpful database expert. Given the database statistics, provide a concise summary of:
-        1. The database's main purpose and structure
-        2. Key entities/tables and their relationships
-        3. Types of questions users can ask
-        Keep the response under 200 words and focus on practical usage."""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": json.dumps(context, cls=DecimalEncoder)}
-        ]
-        
-        try:
-            response = openai.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.7,
-                max_tokens=300
-            )
-            summary = response.choices[0].message.content
-            logger.info("Database summary generated successfully")
-            return summary
-        except Exception as e:
-            logger.error(f"Error generating database summary: {str(e)}")
-            raise
+    }
+}
 
-def generate_sql_query(question: str, ddl: str, error_context: str = None) -> Dict:
-    context_msg = f" with error context: {error_context}" if error_context else ""
-    logger.info(f"Generating SQL query for question: {question}{context_msg}")
-    
-    # First, get relevant context from graph database
-    graph_context = generate_cypher_query(question)
-    
-    system_prompt = """You are an expert SQL query generator. Given a user's question, 
+# System prompts are module constants and the system message dicts are shared across
+# requests, so every call sends a byte-identical prefix that OpenAI's prompt cache can reuse
+
+# Get a concise database summary from graph statistics
+_SYS_SUMMARY = """You are a helpful database expert. Given the database statistics, provide a concise summary of:
+    1. The database's main purpose and structure
+    2. Key entities/tables and their relationships
+    3. Types of questions users can ask
+    Keep the response under 200 words and focus on practical usage."""
+_SYS_SUMMARY_MESSAGE = {"role": "system", "content": _SYS_SUMMARY}
+
+# Generate a SQL Server query from the question, DDL and graph context
+_SYS_SQL = """You are an expert SQL query generator. Given a user's question, 
     database DDL, and relevant context from graph analysis, generate a SQL query that answers the question.
 
     The graph context provides information about which tables and columns are most relevant to the question
@@ -142,45 +134,17 @@ def generate_sql_query(question: str, ddl: str, error_context: str = None) -> Di
     6. When asked to return a count, return the count
     7. When asked to return a single value, return the value
     8. When a table references another table that will add meaningful additional information, perform the join"""
+_SYS_SQL_MESSAGE = {"role": "system", "content": _SYS_SQL}
 
-    if error_context:
-        system_prompt += f"\n\nPrevious attempt failed with error: {error_context}\nPlease fix the query accordingly."
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"""Database DDL:\n{ddl}\n
-Graph Analysis Context:\n{json.dumps(graph_context, indent=2)}\n
-Question: {question}"""}
-    ]
-    
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.1,
-            max_tokens=500,
-            response_format={ "type": "json_object" }
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        result["graph_context"] = graph_context
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error generating SQL query: {str(e)}")
-        raise
-
-def generate_cypher_query(question: str) -> Dict:
-    """Generate a Cypher query to identify relevant tables and columns based on semantic context"""
-    logger.info(f"Generating Cypher query for question: {question}")
-    
-    system_prompt = """You are an expert at generating Cypher queries for Neo4j. Given a user's question, 
+# Generate a Cypher query that finds the relevant tables and columns
+_SYS_CYPHER = """You are an expert at generating Cypher queries for Neo4j. Given a user's question, 
     generate a Cypher query that will identify the most relevant tables and columns based on semantic relationships 
     and business context.
 
     Return your response in the following JSON structure:
     {
-        "cypher": "the Cypher query",
+        "cypher": "the Cypher query, using $parameters instead of literal values",
+        "params": {"parameter_name": "parameter value"},
         "explanation": "brief explanation of how the query finds relevant context"
     }
 
@@ -200,6 +164,8 @@ def generate_cypher_query(question: str) -> Dict:
     4. All variables must be introduced in MATCH or OPTIONAL MATCH clauses before being used in WHERE or RETURN
     5. Use WHERE clauses for filtering after establishing patterns
     6. Return distinct results to avoid duplicates
+    7. Never inline literal strings or numbers in the query; reference them as $parameters and
+       put their values in "params", so structurally identical queries reuse Neo4j's cached plan
     
     Example query pattern:
     ```
@@ -212,14 +178,249 @@ def generate_cypher_query(question: str) -> Dict:
     ORDER BY t.name, c.name
     ```
     """
+_SYS_CYPHER_MESSAGE = {"role": "system", "content": _SYS_CYPHER}
+
+# Validate a generated SQL query against the question and DDL
+_SYS_VALIDATE = """You are a SQL query validator. Given a user question, generated SQL query with metadata, and database DDL:
+    1. Check if the query will answer the user's question correctly
+    2. Verify table relationships and joins are correct
+    3. Ensure all necessary conditions are included
+    4. Verify the expected result type matches the question intent
+    5. Ensure the query reasonably limits the results for lists to less than 20
+    
+    Return your response in the following JSON structure:
+    {
+        "is_valid": true/false,
+        "explanation": "detailed explanation of validation result",
+        "suggested_improvements": ["list", "of", "improvements"] # empty if valid
+    }"""
+_SYS_VALIDATE_MESSAGE = {"role": "system", "content": _SYS_VALIDATE}
+
+# Interpret query results for a business user
+_SYS_INTERPRET = """You are a business analyst helping to interpret query results.
+    Given the context of the question, the data summary, and the query explanation,
+    provide a clear and concise interpretation focused on business insights.
+    
+    Keep your response focused on what would be most relevant to a business user.
+    Highlight key findings, trends, or notable data points."""
+_SYS_INTERPRET_MESSAGE = {"role": "system", "content": _SYS_INTERPRET}
+
+@st.cache_resource
+def get_neo4j_driver():
+    """Get the process-wide Neo4j driver instance.
+
+    The driver owns the Bolt connection pool, so it is created once and shared
+    across Streamlit reruns and sessions instead of being rebuilt per query.
+    """
+    driver = GraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=int(os.getenv("NEO4J_POOL", 32)),
+        max_connection_lifetime=3600,
+        connection_acquisition_timeout=30
+    )
+    atexit.register(driver.close)
+    return driver
+
+@st.cache_resource
+def get_sql_engine():
+    """Get the process-wide SQLAlchemy engine.
+
+    The engine owns the SQL Server connection pool, so it is created (and the
+    server readiness check run) once instead of on every executed query.
+    """
+    return get_db_connection()
+
+def get_neo4j_session():
+    """Get the read-only Neo4j session owned by the current Streamlit user session.
+
+    Back-to-back graph queries in one user session (schema version, summary,
+    Cypher context) reuse this session rather than checking out a new one per call.
+    Streamlit has no session-end hook; an idle session holds no connection and the
+    driver closes the pool at exit.
+    """
+    if "neo4j_session" not in st.session_state:
+        st.session_state.neo4j_session = get_neo4j_driver().session(
+            database="neo4j",
+            default_access_mode=READ_ACCESS,
+            fetch_size=MAX_GRAPH_CONTEXT_ROWS
+        )
+    return st.session_state.neo4j_session
+
+def with_query_options(cypher: str) -> str:
+    """Prefix a Cypher query with the configured runtime hint, and PROFILE in debug mode"""
+    prefix = f"CYPHER runtime={NEO4J_CYPHER_RUNTIME} " if NEO4J_CYPHER_RUNTIME else ""
+    if NEO4J_PROFILE:
+        prefix += "PROFILE "
+    return prefix + cypher
+
+def log_query_profile(summary, label: str):
+    """Log the profiled plan of a consumed graph query when profiling is enabled"""
+    if NEO4J_PROFILE and summary.profile:
+        logger.info(f"{label} query profile: {to_json(summary.profile)}")
+
+@contextmanager
+def _graph_session(session=None):
+    """Yield the given Neo4j session, or open (and close) a short-lived read session"""
+    if session is not None:
+        yield session
+        return
+    with get_neo4j_driver().session(database="neo4j", default_access_mode=READ_ACCESS,
+                                    fetch_size=MAX_GRAPH_CONTEXT_ROWS) as own_session:
+        yield own_session
+
+def fetch_graph_stats(session=None) -> Dict:
+    """Fetch table, column and semantic relationship statistics from the graph"""
+    with _graph_session(session) as session:
+        # One row per table and one row per semantic relationship type, streamed in
+        # fetch_size batches instead of being folded into one large collect() record
+        result = session.run(with_query_options("""
+        MATCH (t:Table)-[:HAS_COLUMN]->(c:Column)
+        RETURN 'table' as kind, t.schema as schema, t.name as name, count(c) as count
+        UNION ALL
+        MATCH (:Column)-[r:SEMANTIC_RELATION]->(:Column)
+        RETURN 'relationship' as kind, null as schema, type(r) as name, count(r) as count
+        """))
+        rows = result.to_df()
+        log_query_profile(result.consume(), "Graph stats")
+
+    # Aggregate client-side with vectorized pandas operations
+    if rows.empty:
+        rows = pd.DataFrame(columns=["kind", "schema", "name", "count"])
+    tables = rows[rows["kind"] == "table"].sort_values(["schema", "name"])
+    relationships = rows[rows["kind"] == "relationship"]
+    
+    # Build summary context
+    return {
+        "overview": {
+            "table_count": len(tables),
+            "total_columns": int(tables["count"].sum()),
+            "total_relationships": int(relationships["count"].sum())
+        },
+        "tables": [
+            {"name": name, "schema": schema, "columns": int(count)}
+            for name, schema, count in zip(tables["name"], tables["schema"], tables["count"])
+        ],
+        "relationships": [
+            {"type": name, "count": int(count)}
+            for name, count in zip(relationships["name"], relationships["count"])
+        ]
+    }
+
+async def get_graph_summary(session=None) -> str:
+    """Generate a database summary using graph data"""
+    logger.info("Generating database summary from graph")
+    context = await asyncio.to_thread(fetch_graph_stats, session)
+    
+    # Generate summary using LLM
     
     messages = [
-        {"role": "system", "content": system_prompt},
+        _SYS_SUMMARY_MESSAGE,
+        {"role": "user", "content": to_json(context)}
+    ]
+    
+    try:
+        summary = await chat_completion(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=300
+        )
+        logger.info("Database summary generated successfully")
+        return summary
+    except Exception as e:
+        logger.error(f"Error generating database summary: {str(e)}")
+        raise
+
+def get_graph_schema_version(session=None) -> Tuple:
+    """Get a cheap fingerprint of the graph schema used to invalidate cached summaries"""
+    with _graph_session(session) as session:
+        record = session.run("""
+        MATCH (t:Table)
+        OPTIONAL MATCH (t)-[:HAS_COLUMN]->(c:Column)
+        RETURN count(DISTINCT t) as table_count, count(c) as column_count, max(t.updated_at) as updated_at
+        """).single()
+        return (record["table_count"], record["column_count"], record["updated_at"])
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_graph_summary(schema_version: Tuple, _session=None) -> str:
+    """Graph summary memoized per schema version across Streamlit reruns and sessions"""
+    return run_async(get_graph_summary(_session))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_ddl() -> str:
+    """Database DDL memoized across Streamlit reruns and sessions"""
+    return get_database_ddl()
+
+async def generate_sql_candidates(question: str, ddl: str, graph_context: Dict, n: int = 1, error_context: str = None) -> List[Dict]:
+    """Generate n candidate SQL queries in a single chat completion request"""
+    context_msg = f" with error context: {error_context}" if error_context else ""
+    logger.info(f"Generating {n} SQL query candidate(s) for question: {question}{context_msg}")
+
+    # The retry feedback is the only variable part, so it goes in the user message
+    retry_msg = f"\n\nPrevious attempt failed with error: {error_context}\nPlease fix the query accordingly." if error_context else ""
+    
+    messages = [
+        _SYS_SQL_MESSAGE,
+        {"role": "user", "content": f"""Database DDL:\n{ddl}\n
+Graph Analysis Context:\n{json.dumps(graph_context, indent=2)}\n
+Question: {question}{retry_msg}"""}
+    ]
+    
+    try:
+        contents = await chat_completion_choices(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.1 if n == 1 else SQL_CANDIDATE_TEMPERATURE,
+            max_tokens=500,
+            n=n,
+            response_format={ "type": "json_object" }
+        )
+        
+        results = [json.loads(content) for content in contents]
+        for result in results:
+            result["graph_context"] = graph_context
+        return results
+        
+    except Exception as e:
+        logger.error(f"Error generating SQL query: {str(e)}")
+        raise
+
+async def generate_sql_query(question: str, ddl: str, graph_context: Dict, error_context: str = None) -> Dict:
+    """Generate a single SQL query for the question"""
+    candidates = await generate_sql_candidates(question, ddl, graph_context, 1, error_context)
+    return candidates[0]
+
+def ensure_cypher_limit(cypher: str, limit: int = GRAPH_CONTEXT_LIMIT) -> str:
+    """Append a LIMIT clause to a generated Cypher query that does not end with one"""
+    cypher = cypher.strip().rstrip(";").rstrip()
+    if _CYPHER_LIMIT_RE.search(cypher):
+        return cypher
+    return f"{cypher}\nLIMIT {limit}"
+
+def run_cypher_query(cypher: str, params: Dict = None, session=None) -> list:
+    """Execute a parameterized read-only Cypher query and return its records as dictionaries.
+
+    Records are streamed and the read stops after MAX_GRAPH_CONTEXT_ROWS, so an
+    overly broad generated query cannot materialize an unbounded result.
+    """
+    with _graph_session(session) as session:
+        result = session.run(with_query_options(ensure_cypher_limit(cypher)), params or {})
+        records = [record.data() for record in islice(result, MAX_GRAPH_CONTEXT_ROWS)]
+        log_query_profile(result.consume(), "Graph context")
+        return records
+
+async def generate_cypher_query(question: str, session=None) -> Dict:
+    """Generate a Cypher query to identify relevant tables and columns based on semantic context"""
+    logger.info(f"Generating Cypher query for question: {question}")
+    
+    messages = [
+        _SYS_CYPHER_MESSAGE,
         {"role": "user", "content": f"Question: {question}"}
     ]
     
     try:
-        response = openai.chat.completions.create(
+        content = await chat_completion(
             model="gpt-4o",
             messages=messages,
             temperature=0.1,
@@ -227,78 +428,127 @@ def generate_cypher_query(question: str) -> Dict:
             response_format={ "type": "json_object" }
         )
         
-        result = json.loads(response.choices[0].message.content)
+        result = json.loads(content)
         
-        # Execute the Cypher query to get relevant context
-        with get_neo4j_driver().session() as session:
-            cypher_result = session.run(result["cypher"])
-            context = cypher_result.data()
-            
-            result["context"] = context
-            return result
+        # Execute the Cypher query off the event loop to get relevant context
+        result.setdefault("params", {})
+        result["context"] = await asyncio.to_thread(run_cypher_query, result["cypher"], result["params"], session)
+        return result
             
     except Exception as e:
         logger.error(f"Error generating Cypher query: {str(e)}")
         raise
 
-def attempt_query_generation_and_validation(question: str, ddl: str, validation_retries: int = 2) -> Tuple[Dict, bool, str]:
-    """Attempt to generate and validate a query with retries."""
-    current_attempt = 0
-    error_context = None
+async def _validate_candidate(question: str, candidate: Dict, ddl: str) -> Tuple[Dict, bool, str]:
+    """Validate a candidate query, returning it alongside the validation result"""
+    is_valid, validation_message = await validate_query(question, candidate, ddl)
+    return candidate, is_valid, validation_message
+
+async def _first_valid_candidate(question: str, candidates: List[Dict], ddl: str) -> Tuple[Dict, bool, str, int]:
+    """Validate candidates concurrently and return the first that passes, or the last failure.
+
+    Returns the candidate, whether it is valid, the validation message and the number
+    of unique candidates validated; the remaining validations are cancelled on success.
+    """
+    # Identical SQL only needs to be validated once
+    unique_candidates = list({clean_sql_query(candidate.get("sql", "")): candidate for candidate in candidates}.values())
+    logger.info(f"Validating {len(unique_candidates)} unique candidate(s) of {len(candidates)} generated")
     
-    while current_attempt <= validation_retries:
-        logger.info(f"Attempt {current_attempt + 1} of {validation_retries + 1} for query generation and validation")
-        
-        # Generate query
-        query_response = generate_sql_query(question, ddl, error_context)
-        
-        # Validate query
-        is_valid, validation_message = validate_query(question, query_response, ddl)
-        
-        if is_valid:
-            logger.info("Query validation successful")
-            return query_response, True, validation_message
-            
-        error_context = f"Validation failed: {validation_message}"
-        logger.warning(f"Query validation failed on attempt {current_attempt + 1}: {validation_message}")
-        current_attempt += 1
-        
-        if current_attempt > validation_retries:
-            logger.error(f"Query validation failed after {validation_retries} attempts")
-            return query_response, False, f"Failed after {validation_retries} validation attempts. Last message: {validation_message}"
+    tasks = [asyncio.create_task(_validate_candidate(question, candidate, ddl)) for candidate in unique_candidates]
+    query_response, validation_message = unique_candidates[-1], "No candidate queries generated"
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            candidate, is_valid, message = await next_done
+            if is_valid:
+                logger.info("Query validation successful")
+                return candidate, True, message, len(unique_candidates)
+            query_response, validation_message = candidate, message
+            logger.warning(f"Candidate query failed validation: {message}")
+    finally:
+        for task in tasks:
+            task.cancel()
+    return query_response, False, validation_message, len(unique_candidates)
+
+async def attempt_query_generation_and_validation(question: str, ddl: str, graph_context: Dict, validation_retries: int = 2) -> Tuple[Dict, bool, str]:
+    """Speculatively generate and validate candidate queries.
+
+    Instead of a serial generate -> validate -> retry loop, validation_retries + 1
+    candidates are sampled in one request and validated concurrently. The first
+    candidate that passes wins and the remaining validations are cancelled. If every
+    candidate fails, one corrected query is generated from the validator's feedback
+    and validated in turn.
+    """
+    candidates = await generate_sql_candidates(question, ddl, graph_context, validation_retries + 1)
+    query_response, is_valid, validation_message, attempts = await _first_valid_candidate(question, candidates, ddl)
+    if is_valid:
+        return query_response, True, validation_message
+    
+    # Feed the failing query and the validator's objection back for one corrected attempt
+    logger.warning(f"All candidates failed validation, regenerating with feedback: {validation_message}")
+    error_context = f"{validation_message}\nFailed query: {query_response.get('sql', '')}"
+    corrected = await generate_sql_candidates(question, ddl, graph_context, 1, error_context)
+    query_response, is_valid, validation_message, _ = await _first_valid_candidate(question, corrected, ddl)
+    attempts += 1
+    if is_valid:
+        return query_response, True, validation_message
     
-    return query_response, False, "Maximum validation attempts reached"
+    logger.error(f"Query validation failed for all {attempts} candidates")
+    return query_response, False, f"Failed after {attempts} validation attempts. Last message: {validation_message}"
 
-def validate_query(question: str, query_response: Dict, ddl: str) -> Tuple[bool, str]:
-    logger.info("Validating generated query")
-    system_prompt = """You are a SQL query validator. Given a user question, generated SQL query with metadata, and database DDL:
-    1. Check if the query will answer the user's question correctly
-    2. Verify table relationships and joins are correct
-    3. Ensure all necessary conditions are included
-    4. Verify the expected result type matches the question intent
-    5. Ensure the query reasonably limits the results for lists to less than 20
+async def get_graph_context(question: str, session=None, last_turn: Dict = None) -> Dict:
+    """Get the graph context for a question, reusing the previous one for follow-ups.
+
+    Follow-up questions ("and for 2023?", "sort by date") need the same tables and
+    columns as the question before them. When the question embedding is within
+    FOLLOW_UP_SIMILARITY of the one that produced the last context, that context is
+    reused instead of generating and running a new Cypher query.
+
+    Args:
+        last_turn (Dict): Per-chat state holding the "embedding" and "graph_context"
+            of the last generated context; updated in place when a new one is generated
+    """
+    if last_turn is None:
+        return await generate_cypher_query(question, session)
     
-    Return your response in the following JSON structure:
-    {
-        "is_valid": true/false,
-        "explanation": "detailed explanation of validation result",
-        "suggested_improvements": ["list", "of", "improvements"] # only if not valid
-    }"""
+    embedding = await embed(question)
+    previous = last_turn.get("embedding")
+    # OpenAI embeddings are unit length, so the dot product is the cosine similarity
+    if previous is not None and float(np.dot(embedding, previous)) > FOLLOW_UP_SIMILARITY:
+        logger.info("Follow-up question detected, reusing previous graph context")
+        return last_turn["graph_context"]
     
+    graph_context = await generate_cypher_query(question, session)
+    last_turn.update(embedding=embedding, graph_context=graph_context)
+    return graph_context
+
+async def answer_question(question: str, session=None, last_turn: Dict = None) -> Tuple[Dict, bool, str]:
+    """Generate and validate a query for a question.
+
+    The DDL fetch and the graph context lookup are independent, so they run
+    concurrently; the graph context is then shared by every validation retry.
+    """
+    ddl, graph_context = await asyncio.gather(
+        asyncio.to_thread(_cached_ddl),
+        get_graph_context(question, session, last_turn)
+    )
+    return await attempt_query_generation_and_validation(question, ddl, graph_context)
+
+async def validate_query(question: str, query_response: Dict, ddl: str) -> Tuple[bool, str]:
+    logger.info("Validating generated query")
     messages = [
-        {"role": "system", "content": system_prompt},
+        _SYS_VALIDATE_MESSAGE,
         {"role": "user", "content": f"Question: {question}\nQuery Response: {json.dumps(query_response)}\nDDL: {ddl}"}
     ]
     
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
+        content = await chat_completion(
+            model="gpt-4o-mini",
             messages=messages,
             temperature=0.1,
-            max_tokens=300,
-            response_format={ "type": "json_object" }
+            max_tokens=150,
+            response_format=VALIDATION_RESPONSE_FORMAT
         )
-        validation_result = json.loads(response.choices[0].message.content)
+        validation_result = json.loads(content)
         logger.info(f"Query validation result: valid={validation_result['is_valid']}, message={validation_result['explanation']}")
         return validation_result["is_valid"], validation_result["explanation"]
     except Exception as e:
@@ -328,28 +578,18 @@ def attempt_query_execution(query: str, max_retries: int = 2) -> Tuple[pd.DataFr
 
 def clean_sql_query(query: str) -> str:
     """Clean a SQL query by removing markdown code blocks and extra whitespace."""
-    # Remove markdown code blocks if present
-    if query.startswith("```"):
-        lines = query.split("\n")
-        # Remove first and last lines if they contain ```
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        query = "\n".join(lines)
-    
-    # Remove extra whitespace
-    query = query.strip()
-    return query
+    # Structured responses almost always carry bare SQL; skip the regex for those
+    if "```" not in query:
+        return query.strip()
+    match = _FENCE_RE.match(query)
+    return (match.group(1) if match else query).strip()
 
 def execute_query(query: str) -> pd.DataFrame:
     logger.info("Executing SQL query")
     cleaned_query = clean_sql_query(query)
-    engine = get_db_connection()
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(cleaned_query))
-            df = pd.DataFrame(result.fetchall(), columns=result.keys())
+        with get_sql_engine().connect() as conn:
+            df = pd.read_sql(text(cleaned_query), conn)
             logger.info(f"Query executed successfully, returned {len(df)} rows")
             return df
     except Exception as e:
@@ -357,45 +597,43 @@ def execute_query(query: str) -> pd.DataFrame:
         logger.error(f"Error executing query: {str(e)}")
         raise
 
-def generate_data_interpretation(question: str, query_response: Dict, results_df: pd.DataFrame) -> Dict:
-    """Generate a business-focused interpretation of the query results."""
-    logger.info("Generating data interpretation")
-    
-    # Convert DataFrame to dict, handling Decimal types
-    sample_data = results_df.head(3).to_dict(orient='records')
-    sample_data = json.loads(json.dumps(sample_data, cls=DecimalEncoder))
+INTERPRETATION_ERROR_MESSAGE = "Unable to generate data interpretation due to an error."
+
+def build_interpretation_context(question: str, query_response: Dict, results_df: pd.DataFrame) -> Dict:
+    """Build the LLM context describing the query results"""
+    # Serialize the sample rows with pandas' native JSON writer (which handles Decimal
+    # and timestamps) and embed the result as-is instead of building per-row dicts
+    sample_data = orjson.Fragment(results_df.head(3).to_json(orient="records", date_format="iso"))
     
     # Prepare context for interpretation
     context = {
         "question": question,
         "row_count": len(results_df),
         "column_count": len(results_df.columns),
-        "columns": list(results_df.columns),
+        "columns": results_df.columns.tolist(),
         "sample_data": sample_data,
         "graph_context": query_response.get("graph_context", {}),
         "sql_explanation": query_response["explanation"]
     }
-    
-    system_prompt = """You are a business analyst helping to interpret query results.
-    Given the context of the question, the data summary, and the query explanation,
-    provide a clear and concise interpretation focused on business insights.
-    
-    Keep your response focused on what would be most relevant to a business user.
-    Highlight key findings, trends, or notable data points."""
+    return context
+
+async def generate_data_interpretation(question: str, query_response: Dict, results_df: pd.DataFrame) -> Dict:
+    """Generate a business-focused interpretation of the query results."""
+    logger.info("Generating data interpretation")
+    context = build_interpretation_context(question, query_response, results_df)
     
     messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": json.dumps(context, cls=DecimalEncoder)}
+        _SYS_INTERPRET_MESSAGE,
+        {"role": "user", "content": to_json(context)}
     ]
     
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
+        interpretation = await chat_completion(
+            model="gpt-4o-mini",
             messages=messages,
             temperature=0.7,
             max_tokens=150
         )
-        interpretation = response.choices[0].message.content
         logger.info("Data interpretation generated successfully")
         return {
             "summary": interpretation,
@@ -408,11 +646,34 @@ def generate_data_interpretation(question: str, query_response: Dict, results_df
     except Exception as e:
         logger.error(f"Error generating data interpretation: {str(e)}")
         return {
-            "summary": "Unable to generate data interpretation due to an error.",
+            "summary": INTERPRETATION_ERROR_MESSAGE,
             "details": {}
         }
 
-def add_visualization_options(query_response, results_df, question: str):
+async def stream_data_interpretation(question: str, query_response: Dict, results_df: pd.DataFrame) -> AsyncIterator[str]:
+    """Stream a business-focused interpretation of the query results as it is generated."""
+    logger.info("Streaming data interpretation")
+    context = build_interpretation_context(question, query_response, results_df)
+    
+    messages = [
+        _SYS_INTERPRET_MESSAGE,
+        {"role": "user", "content": to_json(context)}
+    ]
+    
+    try:
+        async for delta in stream_chat_completion(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=150
+        ):
+            yield delta
+        logger.info("Data interpretation streamed successfully")
+    except Exception as e:
+        logger.error(f"Error generating data interpretation: {str(e)}")
+        yield INTERPRETATION_ERROR_MESSAGE
+
+def add_visualization_options(query_response, results_df, question: str, interpretation: str = None):
     # Initialize visualization selector
     viz_selector = VisualizationSelector()
 
@@ -421,13 +682,14 @@ def add_visualization_options(query_response, results_df, question: str):
 
     # Create visualization section
     with st.expander("Data Visualization & Interpretation", expanded=True):
-        # Generate and display business interpretation
-        interpretation = generate_data_interpretation(
-            question,
-            query_response, 
-            results_df
-        )
-        st.info("**Business Interpretation:**\n" + interpretation["summary"])
+        # Display business interpretation, generating it only if the caller has none
+        if interpretation is None:
+            interpretation = run_async(generate_data_interpretation(
+                question,
+                query_response, 
+                results_df
+            ))["summary"]
+        st.info("**Business Interpretation:**\n" + interpretation)
         
         # Display visualization
         render_visualization(viz_config, results_df, st)
@@ -453,9 +715,13 @@ st.title("Graph-Enhanced DB Chat Assistant")
 if 'messages' not in st.session_state:
     st.session_state.messages = []
 
+if 'last_turn' not in st.session_state:
+    st.session_state.last_turn = {}
+
 if 'db_summary' not in st.session_state:
     try:
-        st.session_state.db_summary = get_graph_summary()
+        neo4j_session = get_neo4j_session()
+        st.session_state.db_summary = _cached_graph_summary(get_graph_schema_version(neo4j_session), neo4j_session)
     except Exception as e:
         st.error(f"Error getting database summary: {str(e)}")
         st.session_state.db_summary = "Error loading database summary"
@@ -479,11 +745,8 @@ if prompt := st.chat_input("Ask a question about your data"):
     # Generate assistant response
     with st.chat_message("assistant"):
         try:
-            # Get database DDL
-            ddl = get_database_ddl()
-            
-            # Generate and validate query
-            query_response, is_valid, error = attempt_query_generation_and_validation(prompt, ddl)
+            # Fetch DDL and graph context, then generate and validate query
+            query_response, is_valid, error = run_async(answer_question(prompt, get_neo4j_session(), st.session_state.last_turn))
             
             if not is_valid:
                 st.error(f"Generated query is invalid: {error}")
@@ -505,21 +768,22 @@ if prompt := st.chat_input("Ask a question about your data"):
                 try:
                     results_df = execute_query(query_response["sql"])
                     
-                    # Generate interpretation
-                    interpretation = generate_data_interpretation(prompt, query_response, results_df)
-                    st.write(interpretation["summary"])
+                    # Stream the interpretation so the first tokens show up immediately
+                    interpretation = st.write_stream(iter_async(
+                        stream_data_interpretation(prompt, query_response, results_df)
+                    ))
                     
                     # Display results
                     if not results_df.empty:
                         st.dataframe(results_df)
                         
                         # Add visualization options if appropriate
-                        add_visualization_options(query_response, results_df, prompt)
+                        add_visualization_options(query_response, results_df, prompt, interpretation)
                     
                     # Add response to chat history
                     st.session_state.messages.append({
                         "role": "assistant",
-                        "content": interpretation["summary"]
+                        "content": interpretation
                     })
                     
                 except Exception as e:
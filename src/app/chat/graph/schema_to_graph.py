@@ -4,260 +4,441 @@ It creates a graph representation of tables, columns, and their relationships.
 """
 
 import os
+import csv
+import shlex
+import argparse
+import threading
+import subprocess
 from neo4j import GraphDatabase
 import logging
 from metadata.get_database_ddl import get_database_schema
 from app.chat.graph.semantic_enrichment import SemanticEnricher
+from common.graph_utils import BatchWriter, write_sharded
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Indexes created before the bulk load. The id indexes back the MATCH-by-id lookups of
+# the column, key and enrichment writes; the text indexes back the chat app's generated
+# Cypher queries, which filter columns with CONTAINS on business_context and name
+SCHEMA_INDEXES = [
+    "CREATE INDEX table_id IF NOT EXISTS FOR (t:Table) ON (t.id)",
+    "CREATE INDEX column_id IF NOT EXISTS FOR (c:Column) ON (c.id)",
+    "CREATE TEXT INDEX column_business_context IF NOT EXISTS FOR (c:Column) ON (c.business_context)",
+    "CREATE TEXT INDEX column_name IF NOT EXISTS FOR (c:Column) ON (c.name)",
+]
+
+# Command used to run neo4j-admin for bulk imports, e.g. "docker compose exec neo4j neo4j-admin"
+NEO4J_ADMIN_COMMAND = os.getenv("NEO4J_ADMIN_COMMAND", "neo4j-admin")
+
+# Process-wide drivers by (uri, user, password); each driver owns a connection pool, so
+# it is created once per set of credentials and shared
+_drivers = {}
+_driver_lock = threading.Lock()
+
+def get_driver(uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password"):
+    """Get the shared Neo4j driver for these credentials, creating it on first use"""
+    key = (uri, user, password)
+    with _driver_lock:
+        if key not in _drivers:
+            _drivers[key] = GraphDatabase.driver(uri, auth=(user, password))
+        return _drivers[key]
+
+def close_driver():
+    """Close every shared Neo4j driver created by get_driver"""
+    with _driver_lock:
+        for driver in _drivers.values():
+            driver.close()
+        _drivers.clear()
+
 class SchemaGraphBuilder:
-    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password", openai_api_key: str = None):
-        """Initialize the Neo4j database connection"""
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password", openai_api_key: str = None,
+                 driver=None):
+        """Initialize the Neo4j database connection, reusing `driver` if one is given"""
+        self._owns_driver = driver is None
+        self.driver = driver or GraphDatabase.driver(uri, auth=(user, password))
         self.semantic_enricher = SemanticEnricher(openai_api_key) if openai_api_key else None
         
     def close(self):
-        """Close the Neo4j driver connection"""
-        self.driver.close()
+        """Close the Neo4j driver connection, unless it was injected by the caller"""
+        if self._owns_driver:
+            self.driver.close()
         
     def clear_graph(self):
         """Clear existing graph data"""
         with self.driver.session() as session:
             session.run("MATCH (n) DETACH DELETE n")
 
-    def build_schema_graph(self):
-        """Build the complete schema graph from database metadata"""
+    def create_indexes(self):
+        """Create the indexes used by graph context queries"""
+        with self.driver.session() as session:
+            for statement in SCHEMA_INDEXES:
+                session.run(statement)
+
+    def build_schema_graph(self, rebuild: bool = False):
+        """Build the complete schema graph from database metadata
+        
+        Nodes and relationships are merged on their ids, so re-running against an
+        existing graph only applies the differences; pass rebuild=True to wipe the
+        graph first instead.
+        """
         # Get the schema
         schema = get_database_schema()
         logger.info(f"Retrieved schema with {len(schema['tables'])} tables")
         
-        # Clear existing graph
-        self.clear_graph()
-        logger.info("Cleared existing graph")
+        # Clear existing graph only when asked to rebuild from scratch
+        if rebuild:
+            self.clear_graph()
+            logger.info("Cleared existing graph")
+        
+        # Create indexes before loading so id lookups are not full label scans
+        self.create_indexes()
+        logger.info("Created graph indexes")
         
-        # Dictionary to keep track of created nodes
+        # Column node ids by table id, then column name, so lookups need no string building
         node_mapping = {}
+        pk_column_ids = []
+        
+        # Load tables, columns and keys through one session in a single pass over the
+        # schema, writing each kind of row as soon as a batch fills
+        with self.driver.session() as session:
+            # First pass: Create all tables and their columns
+            logger.info("First pass: Creating tables and columns...")
+            tables = BatchWriter(session, self.add_table_nodes)
+            columns = BatchWriter(session, self.add_column_nodes, depends_on=tables)
+            primary_keys = BatchWriter(session, self.add_primary_keys, depends_on=columns)
+            writers = {"table": tables, "column": columns, "primary_key": primary_keys}
+            for kind, row in self._iter_table_rows(schema, node_mapping):
+                writers[kind].add(row)
+                if kind == "primary_key":
+                    pk_column_ids.append(row["column_id"])
+            primary_keys.flush()
+            logger.info(f"Added {tables.count} table nodes")
+            logger.info(f"Added {columns.count} column nodes")
+            logger.info(f"Added {primary_keys.count} primary key columns")
+            
+            # Foreign keys can reference tables later in the schema, so they are
+            # resolved once every column id is known
+            fk_rows = self._foreign_key_rows(schema, node_mapping)
+            if not rebuild:
+                session.execute_write(self.remove_stale_elements, node_mapping, pk_column_ids, fk_rows)
+        
+        # Second pass: Create all foreign key relationships from parallel writers
+        logger.info("\nSecond pass: Creating foreign key relationships...")
+        # Unresolvable foreign keys were already logged and dropped by _foreign_key_rows
+        write_sharded(self.driver, self.add_foreign_key_relationships, fk_rows, "to_id")
+        logger.info(f"Created {len(fk_rows)} FK relationships")
         
-        # First pass: Create all tables and their columns
-        logger.info("First pass: Creating tables and columns...")
+        # Third pass: Add semantic enrichment if enabled
+        if self.semantic_enricher:
+            logger.info("\nThird pass: Adding semantic enrichment...")
+            self.semantic_enricher.enrich_graph(self.driver, schema)
+
+    def _iter_table_rows(self, schema: dict, node_mapping: dict):
+        """Yield ("table" | "column" | "primary_key", row) pairs for UNWIND in one pass over the schema
+        
+        Fills node_mapping with column node ids by table id and column name as it goes.
+        """
         for table in schema['tables']:
-            # Add table node
             table_node_id = f"{table['schema']}.{table['name']}"
-            self.add_table_node(table['name'], table['schema'])
-            logger.info(f"Added table node: {table_node_id}")
+            yield "table", {"id": table_node_id, "name": table['name'], "schema": table['schema']}
+            table_columns = node_mapping[table_node_id] = {}
             
-            # Add columns
             for col in table['columns']:
-                column_node_id = self.add_column_node(
-                    table_node_id,
-                    col['name'],
-                    col['data_type'],
-                    col['is_nullable'],
-                    col['description']
-                )
-                node_mapping[f"{table_node_id}.{col['name']}"] = column_node_id
-                logger.info(f"Added column node: {column_node_id}")
+                column_node_id = f"{table_node_id}.{col['name']}"
+                table_columns[col['name']] = column_node_id
+                yield "column", {
+                    "table_id": table_node_id,
+                    "id": column_node_id,
+                    "name": col['name'],
+                    "data_type": col['data_type'],
+                    "is_nullable": col['is_nullable'],
+                    "description": col.get('description')
+                }
             
             # Add primary key relationship if exists
             if table['primary_key']:
                 for col_name in table['primary_key']['columns']:
-                    col_node_id = node_mapping[f"{table_node_id}.{col_name}"]
-                    self.add_primary_key_relationship(
-                        col_node_id,
-                        table['primary_key']['name']
-                    )
-                    logger.info(f"Added PK relationship for column: {col_node_id}")
+                    yield "primary_key", {
+                        "column_id": table_columns[col_name],
+                        "pk_name": table['primary_key']['name']
+                    }
 
-        # Second pass: Create all foreign key relationships
-        logger.info("\nSecond pass: Creating foreign key relationships...")
+    def _foreign_key_rows(self, schema: dict, node_mapping: dict) -> list:
+        """Resolve the schema's foreign keys into deduplicated rows for UNWIND"""
+        fk_rows, seen_fks, missing_fks = [], set(), []
         for table in schema['tables']:
+            table_id = f"{table['schema']}.{table['name']}"
+            from_columns = node_mapping[table_id]
             for fk in table['foreign_keys']:
-                for i, col_name in enumerate(fk['columns']):
-                    from_col_key = f"{table['schema']}.{table['name']}.{col_name}"
-                    to_col_key = f"{fk['references']['schema']}.{fk['references']['table']}.{fk['references']['columns'][i]}"
-                    
-                    logger.info(f"Creating FK relationship: {from_col_key} -> {to_col_key}")
-                    try:
-                        self.add_foreign_key_relationship(
-                            node_mapping[from_col_key],
-                            node_mapping[to_col_key],
-                            fk['name']
-                        )
-                    except KeyError as e:
-                        logger.error(f"Could not find column for FK relationship: {e}")
-                        logger.error(f"Available columns: {sorted(node_mapping.keys())}")
+                ref_table_id = f"{fk['references']['schema']}.{fk['references']['table']}"
+                to_columns = node_mapping.get(ref_table_id, {})
+                for col_name, ref_col_name in zip(fk['columns'], fk['references']['columns']):
+                    from_id = from_columns.get(col_name)
+                    to_id = to_columns.get(ref_col_name)
+                    if from_id is None or to_id is None:
+                        missing_fks.append(f"{table_id}.{col_name} -> {ref_table_id}.{ref_col_name}")
+                        continue
+                    # Skip duplicate FK entries so each relationship is merged once
+                    fk_key = (from_id, to_id, fk['name'])
+                    if fk_key in seen_fks:
+                        continue
+                    seen_fks.add(fk_key)
+                    fk_rows.append({"from_id": from_id, "to_id": to_id, "fk_name": fk['name']})
         
-        # Third pass: Add semantic enrichment if enabled
-        if self.semantic_enricher:
-            logger.info("\nThird pass: Adding semantic enrichment...")
-            self.semantic_enricher.enrich_graph(self.driver, schema)
+        # Report all unresolvable foreign keys once rather than per miss
+        if missing_fks:
+            logger.error(f"Could not find columns for {len(missing_fks)} FK relationships: {missing_fks}")
+        
+        return fk_rows
 
-    def add_table_node(self, table_name: str, schema: str) -> str:
-        """Add a table node to the graph"""
-        node_id = f"{schema}.{table_name}"
-        with self.driver.session() as session:
-            session.run(
-                """
-                CREATE (t:Table {
-                    id: $node_id,
-                    name: $table_name,
-                    schema: $schema
-                })
-                """,
-                node_id=node_id,
-                table_name=table_name,
-                schema=schema
-            )
-        return node_id
-    
-    def add_column_node(self, table_node_id: str, column_name: str, 
-                       data_type: str, is_nullable: bool, description: str = None) -> str:
-        """Add a column node and connect it to its table"""
-        column_node_id = f"{table_node_id}.{column_name}"
-        with self.driver.session() as session:
-            session.run(
-                """
-                MATCH (t:Table {id: $table_id})
-                CREATE (c:Column {
-                    id: $column_id,
-                    name: $column_name,
-                    data_type: $data_type,
-                    is_nullable: $is_nullable,
-                    description: $description
-                })
-                CREATE (t)-[:HAS_COLUMN]->(c)
-                """,
-                table_id=table_node_id,
-                column_id=column_node_id,
-                column_name=column_name,
-                data_type=data_type,
-                is_nullable=is_nullable,
-                description=description
-            )
-        return column_node_id
+    def _schema_rows(self, schema: dict):
+        """Flatten the schema into table, column, primary key and foreign key row lists"""
+        node_mapping = {}
+        rows = {"table": [], "column": [], "primary_key": []}
+        for kind, row in self._iter_table_rows(schema, node_mapping):
+            rows[kind].append(row)
+        return rows["table"], rows["column"], rows["primary_key"], self._foreign_key_rows(schema, node_mapping)
 
-    def add_primary_key_relationship(self, column_id: str, pk_name: str):
-        """Add a primary key relationship to a column"""
-        with self.driver.session() as session:
-            session.run(
-                """
-                MATCH (c:Column {id: $column_id})
-                SET c.is_primary_key = true,
-                    c.pk_name = $pk_name
-                """,
-                column_id=column_id,
-                pk_name=pk_name
-            )
+    def add_table_nodes(self, tx, rows: list):
+        """Add a batch of table nodes with a single UNWIND statement"""
+        tx.run(
+            """
+            UNWIND $rows AS r
+            MERGE (t:Table {id: r.id})
+            SET t.name = r.name,
+                t.schema = r.schema,
+                t.updated_at = timestamp()
+            """,
+            rows=rows
+        ).consume()
 
-    def add_foreign_key_relationship(self, from_column_id: str, to_column_id: str, fk_name: str):
-        """Add a foreign key relationship between columns"""
-        with self.driver.session() as session:
-            # First, verify both nodes exist
-            result = session.run(
-                """
-                MATCH (from:Column {id: $from_id})
-                MATCH (to:Column {id: $to_id})
-                RETURN from, to
-                """,
-                from_id=from_column_id,
-                to_id=to_column_id
-            )
-            
-            if result.single():
-                logger.info(f"Found both nodes for FK relationship: {from_column_id} -> {to_column_id}")
-                # Create the relationship
-                session.run(
-                    """
-                    MATCH (from:Column {id: $from_id})
-                    MATCH (to:Column {id: $to_id})
-                    MERGE (from)-[r:REFERENCES {constraint_name: $fk_name}]->(to)
-                    RETURN r
-                    """,
-                    from_id=from_column_id,
-                    to_id=to_column_id,
-                    fk_name=fk_name
-                )
-                logger.info(f"Created FK relationship: {from_column_id} -> {to_column_id}")
-            else:
-                logger.error(f"Could not find one or both nodes for FK relationship: {from_column_id} -> {to_column_id}")
+    def add_column_nodes(self, tx, rows: list):
+        """Add a batch of column nodes and connect them to their tables with a single UNWIND statement"""
+        tx.run(
+            """
+            UNWIND $cols AS c
+            MATCH (t:Table {id: c.table_id})
+            MERGE (col:Column {id: c.id})
+            SET col.name = c.name,
+                col.table_id = c.table_id,
+                col.data_type = c.data_type,
+                col.is_nullable = c.is_nullable,
+                col.description = c.description
+            MERGE (t)-[:HAS_COLUMN]->(col)
+            """,
+            cols=rows
+        ).consume()
+
+    def add_primary_keys(self, tx, rows: list):
+        """Label a batch of columns as primary key columns"""
+        # A label rather than a boolean property, so PK lookups use the label index
+        # instead of filtering every Column node
+        tx.run(
+            """
+            UNWIND $rows AS r
+            MATCH (c:Column {id: r.column_id})
+            SET c:PrimaryKey,
+                c.pk_name = r.pk_name
+            """,
+            rows=rows
+        ).consume()
+
+    def remove_stale_elements(self, tx, node_mapping: dict, pk_column_ids: list, fk_rows: list):
+        """Delete tables, columns, keys and foreign keys no longer present in the schema"""
+        table_ids = list(node_mapping)
+        column_ids = [column_id for columns in node_mapping.values() for column_id in columns.values()]
+        tx.run("MATCH (c:Column) WHERE NOT c.id IN $ids DETACH DELETE c", ids=column_ids).consume()
+        tx.run("MATCH (t:Table) WHERE NOT t.id IN $ids DETACH DELETE t", ids=table_ids).consume()
+        tx.run(
+            """
+            MATCH (c:PrimaryKey)
+            WHERE NOT c.id IN $ids
+            REMOVE c:PrimaryKey, c.pk_name
+            """,
+            ids=pk_column_ids
+        ).consume()
+        tx.run(
+            """
+            MATCH (f:Column)-[r:REFERENCES]->(t:Column)
+            WHERE NOT [f.id, t.id, r.constraint_name] IN $fks
+            DELETE r
+            """,
+            fks=[[row["from_id"], row["to_id"], row["fk_name"]] for row in fk_rows]
+        ).consume()
+
+    def add_foreign_key_relationships(self, tx, rows: list):
+        """Add a batch of foreign key relationships with a single UNWIND statement"""
+        tx.run(
+            """
+            UNWIND $rows AS r
+            MATCH (f:Column {id: r.from_id})
+            MATCH (t:Column {id: r.to_id})
+            MERGE (f)-[:REFERENCES {constraint_name: r.fk_name}]->(t)
+            """,
+            rows=rows
+        ).consume()
+
+    def export_csv_and_admin_import(self, schema: dict = None, export_dir: str = "neo4j_import",
+                                    admin_import_dir: str = None, database: str = "neo4j"):
+        """
+        Bulk load a fresh graph by writing CSV files and running neo4j-admin import.
+
+        neo4j-admin writes the store files directly, which is far faster than online
+        Cypher for greenfield loads. It replaces the target database, which must be
+        stopped while the import runs; start Neo4j again afterwards and call
+        create_indexes (and semantic enrichment, if wanted) against the new graph.
+
+        Args:
+            schema (dict): Database schema; fetched from SQL Server when omitted
+            export_dir (str): Directory the CSV files are written to
+            admin_import_dir (str): The same directory as seen by neo4j-admin (e.g. a
+                mounted path inside the Neo4j container); defaults to export_dir
+            database (str): Name of the database to import into
+        """
+        schema = schema or get_database_schema()
+        table_rows, column_rows, pk_rows, fk_rows = self._schema_rows(schema)
+        primary_keys = {row["column_id"]: row["pk_name"] for row in pk_rows}
+        
+        os.makedirs(export_dir, exist_ok=True)
+        files = {
+            "tables.csv": (
+                ["id:ID", "name", "schema", ":LABEL"],
+                ([r["id"], r["name"], r["schema"], "Table"] for r in table_rows)
+            ),
+            "columns.csv": (
+                ["id:ID", "table_id", "name", "data_type", "is_nullable:boolean", "description",
+                 "pk_name", ":LABEL"],
+                ([r["id"], r["table_id"], r["name"], r["data_type"], str(bool(r["is_nullable"])).lower(), r["description"],
+                  primary_keys.get(r["id"]), "Column;PrimaryKey" if r["id"] in primary_keys else "Column"]
+                 for r in column_rows)
+            ),
+            "has_column.csv": (
+                [":START_ID", ":END_ID", ":TYPE"],
+                ([r["table_id"], r["id"], "HAS_COLUMN"] for r in column_rows)
+            ),
+            "references.csv": (
+                [":START_ID", ":END_ID", "constraint_name", ":TYPE"],
+                ([r["from_id"], r["to_id"], r["fk_name"], "REFERENCES"] for r in fk_rows)
+            ),
+        }
+        for filename, (header, rows) in files.items():
+            with open(os.path.join(export_dir, filename), "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+        logger.info(f"Exported {len(table_rows)} tables, {len(column_rows)} columns and {len(fk_rows)} foreign keys to {export_dir}")
+        
+        import_dir = admin_import_dir or export_dir
+        command = shlex.split(NEO4J_ADMIN_COMMAND) + [
+            "database", "import", "full", database,
+            "--overwrite-destination",
+            f"--nodes={import_dir}/tables.csv",
+            f"--nodes={import_dir}/columns.csv",
+            f"--relationships={import_dir}/has_column.csv",
+            f"--relationships={import_dir}/references.csv",
+        ]
+        logger.info(f"Running {' '.join(command)}")
+        subprocess.run(command, check=True)
 
-def build_schema_graph(uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password", openai_api_key: str = None):
-    """Convenience function to build the schema graph"""
-    builder = SchemaGraphBuilder(uri, user, password, openai_api_key)
+def build_schema_graph(uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password", openai_api_key: str = None,
+                       rebuild: bool = False, driver=None):
+    """Convenience function to build the schema graph, opening and closing its own driver unless one is given"""
+    builder = SchemaGraphBuilder(uri, user, password, openai_api_key, driver=driver)
     try:
-        builder.build_schema_graph()
+        builder.build_schema_graph(rebuild)
     finally:
         builder.close()
 
-def run_sample_queries(uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password"):
-    """Run sample queries to validate graph ingestion"""
-    driver = GraphDatabase.driver(uri, auth=(user, password))
-    try:
-        with driver.session() as session:
-            # Count tables
-            result = session.run("MATCH (t:Table) RETURN count(t) as table_count")
-            print(f"Number of tables: {result.single()['table_count']}")
-            
-            # Count columns
-            result = session.run("MATCH (c:Column) RETURN count(c) as column_count")
-            print(f"Number of columns: {result.single()['column_count']}")
-            
-            # Count primary keys
-            result = session.run("MATCH (c:Column) WHERE c.is_primary_key = true RETURN count(c) as pk_count")
-            print(f"Number of primary key columns: {result.single()['pk_count']}")
-            
-            # Count relationships
-            result = session.run("MATCH ()-[r:REFERENCES]->() RETURN count(r) as fk_count")
-            print(f"Number of foreign key relationships: {result.single()['fk_count']}")
-            
-            # Sample table and its columns
-            result = session.run("""
-                MATCH (t:Table)-[:HAS_COLUMN]->(c:Column)
-                WITH t, collect({
-                    name: c.name, 
-                    type: c.data_type, 
-                    is_pk: c.is_primary_key
-                }) as columns
-                RETURN t.schema + '.' + t.name as table, columns
-                LIMIT 1
-            """)
-            record = result.single()
-            print(f"\nSample table: {record['table']}")
-            print("Columns:")
-            for col in record['columns']:
-                pk_marker = " (PK)" if col.get('is_pk') else ""
-                print(f"  - {col['name']} {col['type']}{pk_marker}")
-            
-            # Sample foreign key relationship
-            result = session.run("""
-                MATCH (from:Column)-[r:REFERENCES]->(to:Column)
-                RETURN 
-                    split(from.id, '.')[0] + '.' + split(from.id, '.')[1] as from_table,
-                    from.name as from_column,
-                    split(to.id, '.')[0] + '.' + split(to.id, '.')[1] as to_table,
-                    to.name as to_column,
-                    r.constraint_name as fk_name
-                LIMIT 1
-            """)
-            record = result.single()
-            if record:
-                print(f"\nSample foreign key:")
-                print(f"From: {record['from_table']}.{record['from_column']}")
-                print(f"To: {record['to_table']}.{record['to_column']}")
-                print(f"Constraint: {record['fk_name']}")
-    finally:
-        driver.close()
+def run_sample_queries(uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password",
+                       driver=None):
+    """Run sample queries to validate graph ingestion, opening and closing its own driver unless one is given"""
+    if driver is None:
+        with GraphDatabase.driver(uri, auth=(user, password)) as driver:
+            return run_sample_queries(uri, user, password, driver=driver)
+    with driver.session() as session:
+        # Count tables, columns, primary keys and relationships in one round trip
+        counts = session.execute_read(lambda tx: tx.run("""
+            CALL { MATCH (t:Table) RETURN count(t) AS table_count }
+            CALL { MATCH (c:Column) RETURN count(c) AS column_count }
+            CALL { MATCH (c:PrimaryKey) RETURN count(c) AS pk_count }
+            CALL { MATCH ()-[r:REFERENCES]->() RETURN count(r) AS fk_count }
+            RETURN table_count, column_count, pk_count, fk_count
+        """).single())
+        print(f"Number of tables: {counts['table_count']}")
+        print(f"Number of columns: {counts['column_count']}")
+        print(f"Number of primary key columns: {counts['pk_count']}")
+        print(f"Number of foreign key relationships: {counts['fk_count']}")
+        
+        # Sample table and its columns
+        result = session.run("""
+            MATCH (t:Table)-[:HAS_COLUMN]->(c:Column)
+            WITH t, collect({
+                name: c.name, 
+                type: c.data_type, 
+                is_pk: c:PrimaryKey
+            }) as columns
+            RETURN t.schema + '.' + t.name as table, columns
+            LIMIT 1
+        """)
+        record = result.single()
+        print(f"\nSample table: {record['table']}")
+        print("Columns:")
+        for col in record['columns']:
+            pk_marker = " (PK)" if col.get('is_pk') else ""
+            print(f"  - {col['name']} {col['type']}{pk_marker}")
+        
+        # Sample foreign key relationship
+        result = session.run("""
+            MATCH (from:Column)-[r:REFERENCES]->(to:Column)
+            RETURN 
+                from.table_id as from_table,
+                from.name as from_column,
+                to.table_id as to_table,
+                to.name as to_column,
+                r.constraint_name as fk_name
+            LIMIT 1
+        """)
+        record = result.single()
+        if record:
+            print(f"\nSample foreign key:")
+            print(f"From: {record['from_table']}.{record['from_column']}")
+            print(f"To: {record['to_table']}.{record['to_column']}")
+            print(f"Constraint: {record['fk_name']}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest SQL Server schema metadata into Neo4j")
+    parser.add_argument("--bulk-import", metavar="EXPORT_DIR",
+                        help="Write CSV files to EXPORT_DIR and load a fresh graph with neo4j-admin import "
+                             "(the Neo4j database must be stopped)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Delete the existing graph and rebuild it from scratch instead of merging changes")
+    parser.add_argument("--admin-import-dir",
+                        help="EXPORT_DIR as seen by neo4j-admin, if it runs in a container")
+    args = parser.parse_args()
+    
     uri = "bolt://localhost:7687"
     user = "neo4j"
     password = "password"
     openai_api_key = os.environ.get("OPENAI_API_KEY") if os.getenv("OPENAI_API_KEY") else None
     
-    print("Building schema graph...")
-    build_schema_graph(uri, user, password, openai_api_key)
-    print("\nRunning sample queries...")
-    run_sample_queries(uri, user, password)
+    if args.bulk_import:
+        print("Bulk importing schema graph...")
+        builder = SchemaGraphBuilder(uri, user, password)
+        try:
+            builder.export_csv_and_admin_import(export_dir=args.bulk_import, admin_import_dir=args.admin_import_dir)
+        finally:
+            builder.close()
+        print("Import complete; start Neo4j to use the imported graph")
+        raise SystemExit(0)
+    
+    # One driver (and connection pool) for the build and the validation queries
+    driver = get_driver(uri, user, password)
+    try:
+        print("Building schema graph...")
+        build_schema_graph(uri, user, password, openai_api_key, rebuild=args.rebuild, driver=driver)
+        print("\nRunning sample queries...")
+        run_sample_queries(uri, user, password, driver=driver)
+    finally:
+        close_driver()
@@ -1,18 +1,87 @@
 """
 This module handles semantic enrichment of the graph database using LLM analysis
 of column metadata to identify related columns and synonyms.
+
+All columns of a table are analyzed in one request, tables are analyzed
+concurrently with AsyncOpenAI (bounded by a semaphore), and results are cached by
+a hash of the column metadata so unchanged columns are not re-analyzed on later
+runs. For offline bulk runs the same requests can instead be submitted through
+the OpenAI Batch API and the results applied once the batch completes.
 """
 
 from typing import Dict, List
+import os
+import asyncio
+import hashlib
 import logging
 import json
-from openai import OpenAI
-from dataclasses import dataclass
+import orjson
+from openai import AsyncOpenAI, OpenAIError
+from dataclasses import dataclass, asdict
+from common.llm_cache import get_response_cache
+from common.llm_utils import call_with_retries
+from common.graph_utils import write_sharded
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of concurrent table analysis requests; call_with_retries further caps
+# in-flight requests process-wide at OPENAI_CONCURRENCY (common.llm_utils, default 8),
+# so raise that as well to go above it
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", 32))
+
+# Chat completion parameters shared by live and Batch API requests
+ANALYSIS_MODEL = "gpt-4o-mini"
+ANALYSIS_SYSTEM_PROMPT = "You are a database expert helping to analyze column semantics."
+
+# Strict structured-output schema for table analysis responses, so every response
+# parses and carries all fields instead of needing malformed-JSON fallbacks
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "table_semantics",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "columns": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "related_columns": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "schema": {"type": "string"},
+                                        "table": {"type": "string"},
+                                        "column": {"type": "string"},
+                                        "relationship_type": {
+                                            "type": "string",
+                                            "enum": ["equivalent", "related", "derived", "component"]
+                                        }
+                                    },
+                                    "required": ["schema", "table", "column", "relationship_type"],
+                                    "additionalProperties": False
+                                }
+                            },
+                            "synonyms": {"type": "array", "items": {"type": "string"}},
+                            "business_context": {"type": "string"}
+                        },
+                        "required": ["name", "related_columns", "synonyms", "business_context"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["columns"],
+            "additionalProperties": False
+        }
+    }
+}
+
 @dataclass
 class ColumnSemantics:
     """Data class to hold semantic analysis results for a column"""
@@ -20,112 +89,274 @@ class ColumnSemantics:
     synonyms: List[str]
     business_context: str
 
+def column_id(schema: str, table: str, column: str) -> str:
+    """Build the graph id of a column node"""
+    return f"{schema}.{table}.{column}"
+
+def semantics_cache_key(schema: str, table: str, column: str, data_type: str, description: str) -> str:
+    """Build the response cache key for a column's analysis inputs"""
+    key = f"{ANALYSIS_MODEL}|{schema}|{table}|{column}|{data_type}|{description}"
+    return "semantics:" + hashlib.sha256(key.encode()).hexdigest()
+
 class SemanticEnricher:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, concurrency: int = ENRICHMENT_CONCURRENCY):
         """Initialize the semantic enricher with OpenAI API key"""
-        self.client = OpenAI(api_key=api_key)
-        
-    def analyze_column(self, schema: str, table: str, column: str, 
-                      data_type: str, description: str) -> ColumnSemantics:
-        """
-        Analyze a column using LLM to identify related columns and synonyms
-        based on its description and context.
-        """
+        # Retries are handled by call_with_retries
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.concurrency = concurrency
+
+    def _analysis_request(self, schema: str, table: str, columns: List[Dict]) -> Dict:
+        """Build the chat completion parameters for analyzing a table's columns in one request"""
+        column_lines = "\n".join(
+            f"- {column['name']} ({column['data_type']}): {column.get('description', '')}"
+            for column in columns
+        )
         # Construct the prompt for the LLM
-        prompt = f"""Given a database column with the following details:
+        prompt = f"""Given a database table with the following details:
 Schema: {schema}
 Table: {table}
-Column: {column}
-Data Type: {data_type}
-Description: {description}
-
-Please analyze this column and provide a JSON response with the following structure:
-{{
-    "related_columns": [
-        {{
-            "schema": "schema_name",
-            "table": "table_name",
-            "column": "column_name",
-            "relationship_type": "semantic_relationship_type"
-        }}
-    ],
-    "synonyms": ["list", "of", "business", "synonyms"],
-    "business_context": "A brief description of the business meaning and usage of this column"
-}}
+Columns (name (data type): description):
+{column_lines}
+
+Please analyze each column and provide a JSON response with one entry per column listed above,
+each with the column name, its semantically related columns (schema, table, column and
+relationship_type), a list of business synonyms, and a brief description of the business
+meaning and usage of the column as its business_context.
 
 Focus on identifying semantically related columns that might be useful in natural language to SQL translation.
 The relationship_type should be one of: equivalent, related, derived, or component.
 """
-        
+        return {
+            "model": ANALYSIS_MODEL,
+            "messages": [
+                {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            # Scale the output budget with the number of columns in the request
+            "max_tokens": min(16000, 1000 * len(columns)),
+            "temperature": 0.1,  # Keep it focused and consistent
+            "response_format": ANALYSIS_RESPONSE_FORMAT
+        }
+
+    @staticmethod
+    def _parse_semantics(item: Dict) -> ColumnSemantics:
+        """Parse one column's analysis into ColumnSemantics"""
+        return ColumnSemantics(
+            related_columns=item["related_columns"],
+            synonyms=item["synonyms"],
+            business_context=item["business_context"]
+        )
+
+    @staticmethod
+    def _empty_semantics(schema: str, table: str, columns: List[Dict]) -> Dict[str, ColumnSemantics]:
+        """Empty analysis results for columns that could not be analyzed"""
+        return {column_id(schema, table, column['name']): ColumnSemantics([], [], "") for column in columns}
+
+    def _parse_table_semantics(self, schema: str, table: str, columns: List[Dict], content: str,
+                               finish_reason: str = "stop") -> Dict[str, ColumnSemantics]:
+        """Parse a table analysis response into ColumnSemantics keyed by column id
+
+        The strict response schema guarantees well-formed output, so the only failures
+        left are refusals (no content) and responses truncated by max_tokens.
+        """
+        if content is None or finish_reason == "length":
+            reason = "response truncated" if content is not None else "request refused"
+            logger.error(f"Error analyzing table {schema}.{table}: {reason}")
+            return self._empty_semantics(schema, table, columns)
+
+        parsed = {item["name"]: item for item in orjson.loads(content)["columns"]}
+        results = {}
+        for column in columns:
+            item = parsed.get(column['name'])
+            if item is None:
+                logger.warning(f"No analysis returned for column {schema}.{table}.{column['name']}")
+                results[column_id(schema, table, column['name'])] = ColumnSemantics([], [], "")
+            else:
+                results[column_id(schema, table, column['name'])] = self._parse_semantics(item)
+        return results
+
+    @staticmethod
+    def _cache_key(schema: str, table: str, column: Dict) -> str:
+        """Build the response cache key for a column dict"""
+        return semantics_cache_key(schema, table, column['name'], column['data_type'], column.get('description', ''))
+
+    async def analyze_table(self, table: Dict) -> Dict[str, ColumnSemantics]:
+        """
+        Analyze all columns of a table using one LLM request to identify related
+        columns and synonyms based on their descriptions and shared context.
+
+        Columns found in the persistent cache are not sent to the LLM.
+
+        Returns:
+            Dict[str, ColumnSemantics]: Analysis keyed by column id
+        """
+        schema, name = table['schema'], table['name']
+        results, pending = {}, []
+        # Serve unchanged columns from the persistent cache
+        for column in table['columns']:
+            cached = get_response_cache().get(self._cache_key(schema, name, column))
+            if cached is not None:
+                results[column_id(schema, name, column['name'])] = ColumnSemantics(**orjson.loads(cached))
+            else:
+                pending.append(column)
+        if not pending:
+            return results
+
         try:
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a database expert helping to analyze column semantics."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.1,  # Keep it focused and consistent,
-                response_format={ "type": "json_object" }
-            )
-            
-            # Parse the response
-            result = response.choices[0].message.content
-            parsed = json.loads(result)
-            
-            return ColumnSemantics(
-                related_columns=parsed["related_columns"],
-                synonyms=parsed["synonyms"],
-                business_context=parsed["business_context"]
+            # Call OpenAI API; rate limits and transient errors are retried with backoff
+            response = await call_with_retries(
+                self.client.chat.completions.create,
+                **self._analysis_request(schema, name, pending)
             )
-            
-        except Exception as e:
-            logger.error(f"Error analyzing column {schema}.{table}.{column}: {str(e)}")
-            return ColumnSemantics([], [], "")
+        except OpenAIError as e:
+            logger.error(f"Error analyzing table {schema}.{name}: {str(e)}")
+            analyzed = self._empty_semantics(schema, name, pending)
+        else:
+            choice = response.choices[0]
+            analyzed = self._parse_table_semantics(schema, name, pending, choice.message.content, choice.finish_reason)
+
+        # Cache successful analyses only
+        for column in pending:
+            semantics = analyzed[column_id(schema, name, column['name'])]
+            if semantics.business_context:
+                get_response_cache().set(self._cache_key(schema, name, column), json.dumps(asdict(semantics)))
+        results.update(analyzed)
+        return results
+
+    async def analyze_columns(self, schema_data: Dict) -> Dict[str, ColumnSemantics]:
+        """Analyze every table in the schema concurrently, at most `concurrency` at a time"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def analyze(table: Dict) -> Dict[str, ColumnSemantics]:
+            async with semaphore:
+                semantics = await self.analyze_table(table)
+            logger.info(f"Analyzed {len(semantics)} columns of {table['schema']}.{table['name']}")
+            return semantics
+
+        results = {}
+        for table_semantics in await asyncio.gather(*(analyze(table) for table in schema_data['tables'])):
+            results.update(table_semantics)
+        return results
+
+    async def submit_batch(self, schema_data: Dict, path: str = "semantic_enrichment_batch.jsonl") -> str:
+        """
+        Submit the analysis of every table as an OpenAI Batch API job.
+
+        Batch requests cost half as much as live requests and run server-side;
+        use fetch_batch_results once the batch has completed.
+
+        Returns:
+            str: The batch id
+        """
+        with open(path, "w") as f:
+            for table in schema_data['tables']:
+                f.write(json.dumps({
+                    "custom_id": f"{table['schema']}.{table['name']}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._analysis_request(table['schema'], table['name'], table['columns'])
+                }) + "\n")
 
-    def enrich_graph(self, driver, schema_data: Dict):
+        with open(path, "rb") as f:
+            batch_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted semantic enrichment batch {batch.id}")
+        return batch.id
+
+    async def fetch_batch_results(self, batch_id: str, schema_data: Dict) -> Dict[str, ColumnSemantics]:
+        """Fetch the parsed results of a completed Batch API job, keyed by column id"""
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch_id} is not completed (status: {batch.status})")
+
+        tables = {f"{table['schema']}.{table['name']}": table for table in schema_data['tables']}
+        output = await self.client.files.content(batch.output_file_id)
+        results = {}
+        for line in output.text.splitlines():
+            item = orjson.loads(line)
+            table = tables[item["custom_id"]]
+            response = item.get("response")
+            if item.get("error") or not response or response["status_code"] != 200:
+                logger.error(f"Batch request for table {item['custom_id']} failed: {item.get('error') or response}")
+                results.update(self._empty_semantics(table['schema'], table['name'], table['columns']))
+                continue
+            choice = response["body"]["choices"][0]
+            results.update(self._parse_table_semantics(
+                table['schema'], table['name'], table['columns'],
+                choice["message"]["content"], choice["finish_reason"]
+            ))
+        return results
+
+    def enrich_graph(self, driver, schema_data: Dict, semantics: Dict[str, ColumnSemantics] = None):
         """
         Enrich the Neo4j graph with semantic relationships and metadata
+
+        Args:
+            driver: Neo4j driver
+            schema_data (Dict): Database schema
+            semantics (Dict[str, ColumnSemantics]): Precomputed analysis keyed by column id,
+                e.g. from fetch_batch_results; columns are analyzed live when omitted
         """
         logger.info("Starting semantic enrichment of graph...")
-        
-        for table in schema_data['tables']:
-            for column in table['columns']:
-                # Analyze each column
-                semantics = self.analyze_column(
-                    table['schema'],
-                    table['name'],
-                    column['name'],
-                    column['data_type'],
-                    column.get('description', '')
-                )
-                
-                # Add semantic metadata to the graph
-                with driver.session() as session:
-                    # Add synonyms and business context
-                    session.run(
-                        """
-                        MATCH (c:Column {id: $column_id})
-                        SET c.synonyms = $synonyms,
-                            c.business_context = $business_context
-                        """,
-                        column_id=f"{table['schema']}.{table['name']}.{column['name']}",
-                        synonyms=semantics.synonyms,
-                        business_context=semantics.business_context
-                    )
-                    
-                    # Add semantic relationships
-                    for related in semantics.related_columns:
-                        session.run(
-                            """
-                            MATCH (c1:Column {id: $from_id})
-                            MATCH (c2:Column {id: $to_id})
-                            MERGE (c1)-[r:SEMANTIC_RELATION {type: $rel_type}]->(c2)
-                            """,
-                            from_id=f"{table['schema']}.{table['name']}.{column['name']}",
-                            to_id=f"{related['schema']}.{related['table']}.{related['column']}",
-                            rel_type=related['relationship_type']
-                        )
-                
-                logger.info(f"Enriched column {table['schema']}.{table['name']}.{column['name']}")
+
+        if semantics is None:
+            semantics = asyncio.run(self.analyze_columns(schema_data))
+
+        semantic_rows, relation_rows = [], []
+        for id_, column_semantics in semantics.items():
+            # Failed analyses have nothing to write; skip them rather than SET empty values
+            if column_semantics.synonyms or column_semantics.business_context:
+                semantic_rows.append({
+                    "column_id": id_,
+                    "synonyms": column_semantics.synonyms,
+                    "business_context": column_semantics.business_context
+                })
+            relation_rows.extend(
+                {
+                    "from_id": id_,
+                    "to_id": column_id(related['schema'], related['table'], related['column']),
+                    "rel_type": related['relationship_type']
+                }
+                for related in column_semantics.related_columns
+            )
+
+        # The model often lists the same relationship more than once; MERGE each only once
+        relation_rows = list({
+            (row["from_id"], row["to_id"], row["rel_type"]): row for row in relation_rows
+        }.values())
+
+        # Add semantic metadata to the graph from parallel writers, sharded by the
+        # node each write locks so workers do not contend with each other
+        write_sharded(driver, self._write_semantics, semantic_rows, "column_id")
+        write_sharded(driver, self._write_semantic_relations, relation_rows, "to_id")
+        logger.info(f"Enriched {len(semantic_rows)} columns with {len(relation_rows)} semantic relationships")
+
+    @staticmethod
+    def _write_semantics(tx, rows: List[Dict]):
+        """Write synonyms and business context for a batch of columns"""
+        tx.run(
+            """
+            UNWIND $rows AS r
+            MATCH (c:Column {id: r.column_id})
+            SET c.synonyms = r.synonyms,
+                c.business_context = r.business_context
+            """,
+            rows=rows
+        ).consume()
+
+    @staticmethod
+    def _write_semantic_relations(tx, rows: List[Dict]):
+        """Write a batch of semantic relationships between columns"""
+        tx.run(
+            """
+            UNWIND $rows AS r
+            MATCH (c1:Column {id: r.from_id})
+            MATCH (c2:Column {id: r.to_id})
+            MERGE (c1)-[:SEMANTIC_RELATION {type: r.rel_type}]->(c2)
+            """,
+            rows=rows
+        ).consume()
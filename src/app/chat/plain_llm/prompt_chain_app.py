@@ -2,6 +2,14 @@ import sys
 import os
 import logging
 import json
+import re
+import math
+import hashlib
+import time
+import asyncio
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from common.visualization_selector import VisualizationSelector, render_visualization
 
@@ -21,47 +29,123 @@ logging.basicConfig(
 logger = logging.getLogger('database_chat')
 
 # Import using absolute paths
-from src.common.db_utils import get_db_connection
-from src.metadata.get_database_ddl import get_database_ddl
+from common.db_utils import SessionConnection, get_db_connection
+from metadata.get_database_ddl import get_database_ddl
 import streamlit as st
 import pandas as pd
-import json
+import numpy as np
+import orjson
+import sqlglot
+from sqlglot import exp
 from sqlalchemy import text
-import openai
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
+from common.embed_batcher import embed
+from common.llm_cache import semantic_cache
+from common.llm_utils import chat_completion, chat_completion_choices, embed_texts, run_async, stream_chat_completion
 
-def get_db_summary(ddl: str) -> str:
-    logger.info("Generating database summary")
-    system_prompt = """You are a helpful database expert. Given the database DDL, provide a concise summary of:
+# Result rows shown per page; only the visible page is serialized to the browser
+RESULTS_PAGE_SIZE = 500
+
+# Worker pool for blocking LLM and database calls, so the script thread stays free to
+# update the status display while they run
+_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+# Markdown code fence (optionally tagged, e.g. ```sql) wrapping a generated query
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?(.*?)\n?```\s*$", re.DOTALL)
+
+# Table names listed in get_database_ddl output
+_DDL_TABLE_RE = re.compile(r"^-- Table: (\S+)", re.MULTILINE)
+# Start of each table, index and foreign key block in get_database_ddl output
+_DDL_BLOCK_RE = re.compile(r"^-- (?:Table|Indexes for|Foreign Keys for): (\S+)", re.MULTILINE)
+
+# Tables whose DDL is sent with each question; smaller schemas are always sent whole
+DDL_TOP_K_TABLES = int(os.getenv("DDL_TOP_K_TABLES", 15))
+# Best table similarity below which retrieval is considered unreliable and the full DDL is sent
+DDL_MIN_SIMILARITY = float(os.getenv("DDL_MIN_SIMILARITY", 0.2))
+# Table DDL embeddings per DDL text, built once per process on the shared event loop
+_DDL_INDEXES: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+# Statements the rule-based validator rejects outright; generated queries must be read-only
+_WRITE_EXPRESSIONS = (exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Drop, exp.Alter, exp.Create,
+                      exp.TruncateTable, exp.Command)
+# Deeper nesting than this is left to the LLM validator
+MAX_SUBQUERY_DEPTH = 5
+# Questions packed into each generate_sql_queries_batch request
+SQL_BATCH_SIZE = 10
+# Sampling temperature when several candidates are generated at once, so they actually differ
+SQL_CANDIDATE_TEMPERATURE = 0.7
+# List queries must return fewer rows than this to pass rule-based validation
+MAX_LIST_ROWS = 20
+
+# Shape of a generated query; strict structured outputs guarantee every key is present,
+# so a response can no longer come back as e.g. {"query": ...} and fail on ['sql']
+SQL_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sql": {"type": "string"},
+        "explanation": {"type": "string"},
+        "tables_used": {"type": "array", "items": {"type": "string"}},
+        "expected_result_type": {"type": "string", "enum": ["single_value", "list", "count", "aggregate"]}
+    },
+    "required": ["sql", "explanation", "tables_used", "expected_result_type"],
+    "additionalProperties": False
+}
+SQL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "sql_response", "strict": True, "schema": SQL_RESPONSE_SCHEMA}
+}
+# Batched generation returns one query per question, in question order
+SQL_BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sql_responses",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"queries": {"type": "array", "items": SQL_RESPONSE_SCHEMA}},
+            "required": ["queries"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Validation outcomes kept per process, keyed by question, SQL and DDL hash
+VALIDATION_CACHE_SIZE = 256
+_VALIDATION_RESULTS: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+
+# Strict structured-output schema for validate_query responses. Structured outputs emit
+# keys in schema order, so is_valid and explanation arrive before the improvements list
+VALIDATION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "validation",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "is_valid": {"type": "boolean"},
+                "explanation": {"type": "string"},
+                "suggested_improvements": {"type": "array", "items": {"type": "string"}}
+            },
+            "required": ["is_valid", "explanation", "suggested_improvements"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# System prompts are module constants and the DDL follows them in the system message,
+# so every request for a database shares a long static prefix that OpenAI's prompt
+# cache can reuse; only the question and other per-request details trail in the user message
+
+# Summarize the database from its DDL
+_SYS_SUMMARY = """You are a helpful database expert. Given the database DDL, provide a concise summary of:
     1. The database's main purpose
     2. Key entities/tables
     3. Types/examples of questions users can ask
     Keep the response under 200 words and focus on practical usage."""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Here is the database DDL:\n{ddl}"}
-    ]
-    
-    try:
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300
-        )
-        summary = response.choices[0].message.content
-        logger.info("Database summary generated successfully")
-        return summary
-    except Exception as e:
-        logger.error(f"Error generating database summary: {str(e)}")
-        raise
 
-def generate_sql_query(question: str, ddl: str, error_context: str = None) -> Dict:
-    context_msg = f" with error context: {error_context}" if error_context else ""
-    logger.info(f"Generating SQL query for question: {question}{context_msg}")
-    
-    system_prompt = """You are an expert SQL query generator. Given a user's question and 
+# Generate a SQL Server query from the question and DDL
+_SYS_SQL = """You are an expert SQL query generator. Given a user's question and 
     database DDL, generate a SQL query that answers the question.
 
     Return your response in the following JSON structure:
@@ -83,101 +167,397 @@ def generate_sql_query(question: str, ddl: str, error_context: str = None) -> Di
     8. When a table references another table that will add meaningful additional information, perform the join and include the detail
     9. Ensure the SQL syntax is consistent with SQL Server dialect"""
 
-    if error_context:
-        system_prompt += f"\n\nPrevious attempt failed with error: {error_context}\nPlease fix the query accordingly."
+# Generate queries for several numbered questions in one request
+_SQL_BATCH_INSTRUCTIONS = """For the numbered questions below, return a JSON object with key "queries" holding
+    one of the JSON structures above per question, in question order."""
+
+# Validate a generated query against the question and DDL
+_SYS_VALIDATE = """You are a SQL query validator. Given a user question, generated SQL query with metadata, and database DDL:
+    1. Check if the query will answer the user's question correctly
+    2. Verify table relationships and joins are correct
+    3. Ensure all necessary conditions are included
+    4. Verify the expected result type matches the question intent
+    5. Ensure the query reasonably limits the results for lists to less than 20
+    
+    Return your response in the following JSON structure:
+    {
+        "is_valid": true/false,
+        "explanation": "detailed explanation of validation result",
+        "suggested_improvements": ["list", "of", "improvements"] # only if not valid
+    }"""
+
+# Interpret query results for a business audience
+_SYS_INTERPRET = """You are a business analyst expert. Given a user's question, SQL query explanation, 
+    and the resulting data, provide a concise business-friendly interpretation of what the data shows.
+    Focus on key insights and business implications. Keep the response under 100 words."""
+_SYS_INTERPRET_MESSAGE = {"role": "system", "content": _SYS_INTERPRET}
+
+async def get_db_summary(ddl: str) -> str:
+    logger.info("Generating database summary")
+    messages = [
+        {"role": "system", "content": f"{_SYS_SUMMARY}\n\nDatabase DDL:\n{ddl}"},
+        {"role": "user", "content": "Summarize this database."}
+    ]
+    
+    try:
+        summary = await chat_completion(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.7,
+            max_tokens=300
+        )
+        logger.info("Database summary generated successfully")
+        return summary
+    except Exception as e:
+        logger.error(f"Error generating database summary: {str(e)}")
+        raise
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_ddl() -> str:
+    """Database DDL memoized across Streamlit reruns and sessions"""
+    return get_database_ddl()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _cached_db_summary(ddl: str) -> str:
+    """Database summary memoized per DDL across Streamlit reruns and sessions.
+
+    Keyed on the DDL itself, so a schema change produces a new summary while an
+    unchanged schema never triggers another LLM call; across restarts the request
+    is also served from the persistent response cache.
+    """
+    return run_async(get_db_summary(ddl))
+
+@semantic_cache("sql_candidates")
+async def generate_sql_candidates(question: str, ddl: str, n: int = 1, error_context: str = None,
+                                  prior_response: Dict = None) -> List[Dict]:
+    """Generate n candidate SQL queries in a single chat completion request.
+
+    On a retry, the failed attempt is replayed as an assistant turn followed by the error,
+    so the system + DDL + question prefix stays byte-identical to the first attempt.
+    """
+    context_msg = f" with error context: {error_context}" if error_context else ""
+    logger.info(f"Generating {n} SQL query candidate(s) for question: {question}{context_msg}")
     
     messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Database DDL:\n{ddl}\n\nQuestion: {question}"}
+        {"role": "system", "content": f"{_SYS_SQL}\n\nDatabase DDL:\n{ddl}"},
+        {"role": "user", "content": f"Question: {question}"}
     ]
+    if prior_response:
+        messages.append({"role": "assistant", "content": orjson.dumps(prior_response).decode()})
+    if error_context:
+        messages.append({"role": "user", "content": f"That query failed: {error_context}. Please produce a corrected JSON response."})
     
     try:
-        response = openai.chat.completions.create(
+        contents = await chat_completion_choices(
             model="gpt-4o",
             messages=messages,
-            temperature=0.1,
+            temperature=0.1 if n == 1 else SQL_CANDIDATE_TEMPERATURE,
             max_tokens=500,
-            response_format={ "type": "json_object" }
+            n=n,
+            response_format=SQL_RESPONSE_FORMAT
         )
-        query_response = json.loads(response.choices[0].message.content)
-        logger.info(f"Generated SQL query: {query_response['sql']}")
-        return query_response
+        candidates = [orjson.loads(content) for content in contents]
+        for candidate in candidates:
+            logger.info(f"Generated SQL query: {candidate['sql']}")
+        return candidates
     except Exception as e:
         logger.error(f"Error generating SQL query: {str(e)}")
         raise
 
-def attempt_query_generation_and_validation(question: str, ddl: str, validation_retries: int = 2) -> Tuple[Dict, bool, str]:
-    """Attempt to generate and validate a query with retries."""
-    current_attempt = 0
-    error_context = None
+async def generate_sql_query(question: str, ddl: str, error_context: str = None, prior_response: Dict = None) -> Dict:
+    """Generate a single SQL query for the question"""
+    candidates = await generate_sql_candidates(question, ddl, 1, error_context, prior_response)
+    return candidates[0]
+
+async def _generate_sql_query_batch(questions: List[str], ddl: str) -> List[Dict]:
+    """Generate one SQL query per question with a single chat completion request"""
+    numbered_questions = "\n".join(f"[{i}] {question}" for i, question in enumerate(questions, 1))
+    messages = [
+        {"role": "system", "content": f"{_SYS_SQL}\n\n{_SQL_BATCH_INSTRUCTIONS}\n\nDatabase DDL:\n{ddl}"},
+        {"role": "user", "content": numbered_questions}
+    ]
     
-    while current_attempt <= validation_retries:
-        logger.info(f"Attempt {current_attempt + 1} of {validation_retries + 1} for query generation and validation")
-        
-        # Generate query
-        query_response = generate_sql_query(question, ddl, error_context)
-        
-        # Validate query
-        is_valid, validation_message = validate_query(question, query_response, ddl)
-        
-        if is_valid:
-            logger.info("Query validation successful")
-            return query_response, True, validation_message
-            
-        error_context = f"Validation failed: {validation_message}"
-        logger.warning(f"Query validation failed on attempt {current_attempt + 1}: {validation_message}")
-        current_attempt += 1
-        
-        if current_attempt > validation_retries:
-            logger.error(f"Query validation failed after {validation_retries} attempts")
-            return query_response, False, f"Failed after {validation_retries} validation attempts. Last message: {validation_message}"
+    try:
+        content = await chat_completion(
+            model="gpt-4o",
+            messages=messages,
+            temperature=0.1,
+            max_tokens=500 * len(questions),
+            response_format=SQL_BATCH_RESPONSE_FORMAT
+        )
+        queries = orjson.loads(content)["queries"]
+        if len(queries) != len(questions):
+            raise ValueError(f"Expected {len(questions)} queries, got {len(queries)}")
+        return queries
+    except Exception as e:
+        logger.error(f"Error generating SQL queries for batch of {len(questions)} questions: {str(e)}")
+        raise
+
+async def generate_sql_queries_batch(questions: List[str], ddl: str, batch_size: int = SQL_BATCH_SIZE) -> List[Dict]:
+    """
+    Generate SQL queries for many questions, e.g. for evaluation runs.
     
-    return query_response, False, "Maximum validation attempts reached"
+    Up to batch_size questions are packed into each request, so N questions cost
+    ceil(N / batch_size) round trips sharing one DDL prefix; the batches run concurrently.
+    
+    Returns:
+        List[Dict]: One query response per question, in question order
+    """
+    logger.info(f"Generating SQL queries for {len(questions)} questions in batches of {batch_size}")
+    batches = [questions[i:i + batch_size] for i in range(0, len(questions), batch_size)]
+    results = await asyncio.gather(*(_generate_sql_query_batch(batch, ddl) for batch in batches))
+    return [query_response for batch_results in results for query_response in batch_results]
 
-def validate_query(question: str, query_response: Dict, ddl: str) -> Tuple[bool, str]:
-    logger.info("Validating generated query")
-    system_prompt = """You are a SQL query validator. Given a user question, generated SQL query with metadata, and database DDL:
-    1. Check if the query will answer the user's question correctly
-    2. Verify table relationships and joins are correct
-    3. Ensure all necessary conditions are included
-    4. Verify the expected result type matches the question intent
-    5. Ensure the query reasonably limits the results for lists to less than 20
+def _subquery_depth(tree: exp.Expression) -> int:
+    """Maximum nesting depth of subqueries in a parsed query"""
+    depth = 0
+    for subquery in tree.find_all(exp.Subquery):
+        level, node = 1, subquery.parent
+        while node is not None:
+            level += isinstance(node, exp.Subquery)
+            node = node.parent
+        depth = max(depth, level)
+    return depth
+
+def _row_limit(tree: exp.Expression) -> Optional[int]:
+    """The literal TOP / FETCH row limit of a parsed query, if any"""
+    limit = tree.args.get("limit")
+    if isinstance(limit, exp.Limit):
+        value = limit.expression
+    elif isinstance(limit, exp.Fetch):
+        value = limit.args.get("count")
+    else:
+        return None
+    return int(value.this) if isinstance(value, exp.Literal) and not value.is_string else None
+
+def _cheap_validate(query_response: Dict, ddl: str) -> Optional[Tuple[bool, str]]:
+    """
+    Validate a generated query with rules instead of an LLM call.
+
+    Returns:
+        Optional[Tuple[bool, str]]: The verdict when the rules are conclusive (unparseable,
+        not read-only, unknown tables, or every check passed), or None when the LLM
+        validator should decide
+    """
+    sql = clean_sql_query(query_response.get("sql", ""))
+    try:
+        tree = sqlglot.parse_one(sql, dialect="tsql")
+    except sqlglot.errors.SqlglotError as e:
+        # ParseError carries structured errors; its str() includes terminal highlighting
+        detail = e.errors[0]["description"] if getattr(e, "errors", None) else str(e)
+        return False, f"Query could not be parsed as T-SQL: {detail}"
     
-    Return your response in the following JSON structure:
-    {
-        "is_valid": true/false,
-        "explanation": "detailed explanation of validation result",
-        "suggested_improvements": ["list", "of", "improvements"] # only if not valid
-    }"""
+    if not isinstance(tree, exp.Query) or tree.find(*_WRITE_EXPRESSIONS):
+        return False, "Only read-only SELECT queries are allowed"
+    
+    known_tables = {name.lower() for name in _DDL_TABLE_RE.findall(ddl)}
+    cte_names = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    unknown_tables = {table.name for table in tree.find_all(exp.Table)
+                      if table.name.lower() not in known_tables | cte_names}
+    if unknown_tables:
+        return False, f"Query references tables not in the database: {', '.join(sorted(unknown_tables))}"
+    
+    if _subquery_depth(tree) > MAX_SUBQUERY_DEPTH:
+        return None
+    if query_response.get("expected_result_type") == "list":
+        limit = _row_limit(tree)
+        if limit is None or limit >= MAX_LIST_ROWS:
+            return None
+    return True, "Rule-based validation passed"
+
+def split_ddl_by_table(ddl: str) -> Dict[str, str]:
+    """Group the table, index and foreign key blocks of the DDL by table name"""
+    blocks: Dict[str, List[str]] = {}
+    matches = list(_DDL_BLOCK_RE.finditer(ddl))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match else len(ddl)
+        blocks.setdefault(match.group(1), []).append(ddl[match.start():end].strip())
+    return {table: "\n\n".join(table_blocks) for table, table_blocks in blocks.items()}
+
+async def _ddl_index(ddl: str) -> Tuple[List[str], np.ndarray]:
+    """Per-table DDL blocks and their unit-length embeddings, computed once per DDL"""
+    key = hashlib.sha256(ddl.encode()).hexdigest()
+    if key not in _DDL_INDEXES:
+        blocks = list(split_ddl_by_table(ddl).values())
+        embeddings = await embed_texts(blocks) if blocks else []
+        _DDL_INDEXES[key] = (blocks, np.asarray(embeddings, dtype=np.float32))
+    return _DDL_INDEXES[key]
+
+async def select_relevant_ddl(question: str, ddl: str, top_k: int = DDL_TOP_K_TABLES) -> str:
+    """
+    Select the DDL of the tables most relevant to the question.
+    
+    Tables are ranked by the cosine similarity of their DDL block to the question.
+    The full DDL is returned when the schema has no more than top_k tables or when
+    even the best match is weak.
+    """
+    blocks, matrix = await _ddl_index(ddl)
+    if len(blocks) <= top_k:
+        return ddl
+    
+    # OpenAI embeddings are unit length, so the dot product is the cosine similarity
+    scores = matrix @ await embed(question)
+    top = np.argsort(scores)[::-1][:top_k]
+    if scores[top[0]] < DDL_MIN_SIMILARITY:
+        logger.info("No table is clearly relevant to the question, using the full DDL")
+        return ddl
+    logger.info(f"Using DDL for {len(top)} of {len(blocks)} tables")
+    # Keep the selected tables in DDL order
+    return "\n\n".join(blocks[i] for i in sorted(top))
+
+async def _validate_candidate(question: str, candidate: Dict, ddl: str, prompt_ddl: str) -> Tuple[Dict, bool, str]:
+    """Validate a candidate query, returning it alongside the validation result.
+
+    The rule-based checks run against the full DDL; the LLM validator, which only runs
+    when they are inconclusive, sees the same DDL subset the query was generated from.
+    """
+    verdict = _cheap_validate(candidate, ddl)
+    if verdict is not None:
+        logger.info(f"Rule-based validation result: valid={verdict[0]}, message={verdict[1]}")
+        return candidate, verdict[0], verdict[1]
+    is_valid, validation_message = await validate_query(question, candidate, prompt_ddl)
+    return candidate, is_valid, validation_message
+
+async def _first_valid_candidate(question: str, candidates: List[Dict], ddl: str, prompt_ddl: str) -> Tuple[Dict, bool, str, int]:
+    """Validate candidates concurrently and return the first that passes, or the last failure.
+
+    Returns the candidate, whether it is valid, the validation message and the number
+    of unique candidates validated; the remaining validations are cancelled on success.
+    """
+    # Identical SQL only needs to be validated once
+    unique_candidates = list({clean_sql_query(candidate.get("sql", "")): candidate for candidate in candidates}.values())
+    logger.info(f"Validating {len(unique_candidates)} unique candidate(s) of {len(candidates)} generated")
+    
+    tasks = [asyncio.create_task(_validate_candidate(question, candidate, ddl, prompt_ddl)) for candidate in unique_candidates]
+    query_response, validation_message = unique_candidates[-1], "No candidate queries generated"
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            candidate, is_valid, message = await next_done
+            if is_valid:
+                logger.info("Query validation successful")
+                return candidate, True, message, len(unique_candidates)
+            query_response, validation_message = candidate, message
+            logger.warning(f"Candidate query failed validation: {message}")
+    finally:
+        for task in tasks:
+            task.cancel()
+    return query_response, False, validation_message, len(unique_candidates)
+
+async def attempt_query_generation_and_validation(question: str, ddl: str, validation_retries: int = 2,
+                                                  error_context: str = None, prior_response: Dict = None) -> Tuple[Dict, bool, str]:
+    """Speculatively generate and validate candidate queries.
+
+    Instead of a serial generate -> validate -> retry loop, validation_retries + 1
+    candidates are sampled in one request and validated concurrently. The first
+    candidate that passes wins and the remaining validations are cancelled. If every
+    candidate fails, one corrected query is generated from the validator's feedback
+    and validated in turn. Generation and validation share one DDL subset selected
+    for the question. When correcting a failed query, pass its response and error as
+    prior_response and error_context.
+    """
+    prompt_ddl = await select_relevant_ddl(question, ddl)
+    candidates = await generate_sql_candidates(question, prompt_ddl, validation_retries + 1, error_context, prior_response)
+    query_response, is_valid, validation_message, attempts = await _first_valid_candidate(question, candidates, ddl, prompt_ddl)
+    if is_valid:
+        return query_response, True, validation_message
+    
+    # Feed the validator's objection back for one corrected attempt
+    logger.warning(f"All candidates failed validation, regenerating with feedback: {validation_message}")
+    corrected = await generate_sql_candidates(question, prompt_ddl, 1, validation_message, query_response)
+    query_response, is_valid, validation_message, _ = await _first_valid_candidate(question, corrected, ddl, prompt_ddl)
+    attempts += 1
+    if is_valid:
+        return query_response, True, validation_message
     
+    logger.error(f"Query validation failed for all {attempts} candidates")
+    return query_response, False, f"Failed after {attempts} validation attempts. Last message: {validation_message}"
+
+async def forget_query_generation(question: str, ddl: str, validation_retries: int = 2,
+                                  error_context: str = None, prior_response: Dict = None) -> int:
+    """Drop the cached candidates attempt_query_generation_and_validation sampled for these arguments.
+
+    Call this when the chosen query fails to execute, so rephrasings of the question
+    don't replay it from the semantic cache.
+    """
+    prompt_ddl = await select_relevant_ddl(question, ddl)
+    return await generate_sql_candidates.invalidate(question, prompt_ddl, validation_retries + 1, error_context, prior_response)
+
+def _parse_validation_prefix(buffer: str) -> Optional[Dict]:
+    """Parse is_valid and explanation from a partial validation response, or None if incomplete"""
+    # The key can only appear unescaped once the explanation string has been closed
+    end = buffer.find('"suggested_improvements"')
+    if end == -1:
+        return None
+    try:
+        return orjson.loads(buffer[:end].rstrip().rstrip(",") + "}")
+    except ValueError:
+        return None
+
+@functools.lru_cache(maxsize=8)
+def _ddl_hash(ddl: str) -> str:
+    """Hash a DDL text once rather than on every validation"""
+    return hashlib.sha256(ddl.encode()).hexdigest()
+
+async def validate_query(question: str, query_response: Dict, ddl: str) -> Tuple[bool, str]:
+    """Validate a query, reusing the outcome when the same SQL was already validated for the question.
+
+    Retries sometimes regenerate an identical query with a reworded explanation, which would
+    otherwise miss the caches keyed on the whole response and cost another LLM round trip.
+    """
+    key = hashlib.sha256(f"{question}\0{query_response['sql']}\0{_ddl_hash(ddl)}".encode()).hexdigest()
+    if key in _VALIDATION_RESULTS:
+        _VALIDATION_RESULTS.move_to_end(key)
+        logger.info("Reusing validation result for previously validated query")
+        return _VALIDATION_RESULTS[key]
+
+    result = await _validate_query_cached(question, query_response, ddl)
+    _VALIDATION_RESULTS[key] = result
+    if len(_VALIDATION_RESULTS) > VALIDATION_CACHE_SIZE:
+        _VALIDATION_RESULTS.popitem(last=False)
+    return result
+
+async def _validate_query_cached(question: str, query_response: Dict, ddl: str) -> Tuple[bool, str]:
+    logger.info("Validating generated query")
     messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f"Question: {question}\nQuery Response: {json.dumps(query_response)}\nDDL: {ddl}"}
+        {"role": "system", "content": f"{_SYS_VALIDATE}\n\nDDL:\n{ddl}"},
+        {"role": "user", "content": f"Question: {question}\nQuery Response: {orjson.dumps(query_response).decode()}"}
     ]
     
     try:
-        response = openai.chat.completions.create(
+        # Stream the response and stop as soon as is_valid and explanation are complete,
+        # rather than waiting for the trailing suggested improvements
+        buffer, validation_result = "", None
+        stream = stream_chat_completion(
             model="gpt-4o",
             messages=messages,
             temperature=0.1,
             max_tokens=300,
-            response_format={ "type": "json_object" }
+            response_format=VALIDATION_RESPONSE_FORMAT
         )
-        validation_result = json.loads(response.choices[0].message.content)
+        try:
+            async for delta in stream:
+                buffer += delta
+                validation_result = _parse_validation_prefix(buffer)
+                if validation_result is not None:
+                    break
+        finally:
+            await stream.aclose()
+        if validation_result is None:
+            validation_result = orjson.loads(buffer)
         logger.info(f"Query validation result: valid={validation_result['is_valid']}, message={validation_result['explanation']}")
         return validation_result["is_valid"], validation_result["explanation"]
     except Exception as e:
         logger.error(f"Error during query validation: {str(e)}")
         raise
 
-def attempt_query_execution(query: str, max_retries: int = 2) -> Tuple[pd.DataFrame, bool, str]:
+def attempt_query_execution(query: str, max_retries: int = 2, db_conn: SessionConnection = None) -> Tuple[pd.DataFrame, bool, str]:
     """Attempt to execute a query with retries."""
     current_attempt = 0
     
     while current_attempt <= max_retries:
         logger.info(f"Attempt {current_attempt + 1} of {max_retries + 1} for query execution")
         try:
-            results_df = execute_query(query)
+            results_df = execute_query(query, db_conn)
             logger.info("Query executed successfully")
             return results_df, True, "Query executed successfully"
         except Exception as e:
@@ -193,50 +573,39 @@ def attempt_query_execution(query: str, max_retries: int = 2) -> Tuple[pd.DataFr
 
 def clean_sql_query(query: str) -> str:
     """Clean a SQL query by removing markdown code blocks and extra whitespace."""
-    # Remove markdown code blocks if present
-    if query.startswith("```"):
-        lines = query.split("\n")
-        # Remove first and last lines if they contain ```
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].startswith("```"):
-            lines = lines[:-1]
-        query = "\n".join(lines)
-    
-    # Remove extra whitespace
-    query = query.strip()
-    return query
+    # Structured responses almost always carry bare SQL; skip the regex for those
+    if "```" not in query:
+        return query.strip()
+    match = _FENCE_RE.match(query)
+    return (match.group(1) if match else query).strip()
 
-def execute_query(query: str) -> pd.DataFrame:
+def execute_query(query: str, db_conn: SessionConnection = None) -> pd.DataFrame:
+    """Execute a query on the session's connection, or a one-off pooled connection if none is given"""
     logger.info("Executing SQL query")
     cleaned_query = clean_sql_query(query)
-    engine = get_db_connection()
+    db_conn = db_conn or SessionConnection(get_db_connection())
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(cleaned_query))
-            df = pd.DataFrame(result.fetchall(), columns=result.keys())
-            logger.info(f"Query executed successfully, returned {len(df)} rows")
-            return df
+        # Build Arrow-backed columns directly instead of materializing a list of row tuples
+        df = db_conn.run(lambda conn: pd.read_sql_query(text(cleaned_query), conn, dtype_backend="pyarrow"))
+        logger.info(f"Query executed successfully, returned {len(df)} rows")
+        return df
     except Exception as e:
         logger.error(f"Error executing query: {str(e)}")
         raise
 
-def generate_data_interpretation(question: str, query_response: Dict, results_df: pd.DataFrame) -> str:
+async def generate_data_interpretation(question: str, query_response: Dict, results_df: pd.DataFrame) -> str:
     logger.info("Generating business interpretation of the data")
     
     # Prepare the context for the LLM
     data_summary = f"Data shape: {results_df.shape[0]} rows, {results_df.shape[1]} columns"
     if not results_df.empty:
-        sample_data = results_df.head(3).to_string()
+        # CSV carries the same values as to_string() without the column padding
+        sample_data = results_df.head(3).to_csv(index=False)
     else:
         sample_data = "No data returned"
     
-    system_prompt = """You are a business analyst expert. Given a user's question, SQL query explanation, 
-    and the resulting data, provide a concise business-friendly interpretation of what the data shows.
-    Focus on key insights and business implications. Keep the response under 100 words."""
-    
     messages = [
-        {"role": "system", "content": system_prompt},
+        _SYS_INTERPRET_MESSAGE,
         {"role": "user", "content": f"""
 Question: {question}
 Query Explanation: {query_response['explanation']}
@@ -247,19 +616,52 @@ Sample Data:
     ]
     
     try:
-        response = openai.chat.completions.create(
+        interpretation = await chat_completion(
             model="gpt-4o",
             messages=messages,
             temperature=0.7,
             max_tokens=150
         )
-        interpretation = response.choices[0].message.content
         logger.info("Data interpretation generated successfully")
         return interpretation
     except Exception as e:
         logger.error(f"Error generating data interpretation: {str(e)}")
         return "Unable to generate data interpretation due to an error."
 
+def run_with_status(label: str, fn, *args, **kwargs):
+    """Run a blocking call on the worker pool, showing its progress in a status box"""
+    start = time.monotonic()
+    with st.status(label, expanded=False) as status:
+        future = _EXECUTOR.submit(fn, *args, **kwargs)
+        while not future.done():
+            status.update(label=f"{label} ({time.monotonic() - start:.0f}s)")
+            time.sleep(0.1)
+        try:
+            result = future.result()
+        except Exception:
+            status.update(label=f"{label} failed", state="error")
+            raise
+        status.update(label=f"{label} done in {time.monotonic() - start:.1f}s", state="complete")
+    return result
+
+def _set_results_page(question: str, page: int):
+    """Remember the results page being viewed for a question"""
+    st.session_state.results_pages[question] = page
+
+@st.fragment
+def render_results_page(results_df: pd.DataFrame, question: str):
+    """Show one page of query results; paging reruns only this fragment, not the whole chain"""
+    pages = max(1, math.ceil(len(results_df) / RESULTS_PAGE_SIZE))
+    page = min(st.session_state.setdefault("results_pages", {}).get(question, 0), pages - 1)
+    start = page * RESULTS_PAGE_SIZE
+    st.dataframe(results_df.iloc[start:start + RESULTS_PAGE_SIZE])
+    
+    if pages > 1:
+        previous_col, info_col, next_col = st.columns([1, 2, 1])
+        previous_col.button("Previous", disabled=page == 0, on_click=_set_results_page, args=(question, page - 1))
+        info_col.caption(f"Rows {start + 1}-{min(start + RESULTS_PAGE_SIZE, len(results_df))} of {len(results_df)}")
+        next_col.button("Next", disabled=page == pages - 1, on_click=_set_results_page, args=(question, page + 1))
+
 def add_visualization_options(query_response, results_df):
     # Initialize visualization selector
     viz_selector = VisualizationSelector()
@@ -267,14 +669,16 @@ def add_visualization_options(query_response, results_df):
     # Select visualization based on query and data
     viz_config = viz_selector.select_visualization(results_df, query_response["sql"])
 
+    # Generate the business interpretation first; a status box cannot be nested in an expander
+    interpretation = run_with_status("Interpreting results...", run_async, generate_data_interpretation(
+        st.session_state.user_question, 
+        query_response, 
+        results_df
+    ))
+
     # Create visualization section
     with st.expander("Data Visualization & Interpretation", expanded=True):
-        # Generate and display business interpretation
-        interpretation = generate_data_interpretation(
-            st.session_state.user_question, 
-            query_response, 
-            results_df
-        )
+        # Display business interpretation
         st.info("**Business Interpretation:**\n" + interpretation)
         
         # Display visualization
@@ -302,80 +706,98 @@ if 'ddl' not in st.session_state or 'db_summary' not in st.session_state:
     with st.spinner('Becoming aware of your database...'):
         logger.info("Initializing database schema and summary")
         if 'ddl' not in st.session_state:
-            st.session_state.ddl = get_database_ddl()
+            st.session_state.ddl = _cached_ddl()
             logger.info("Database DDL retrieved")
         if 'db_summary' not in st.session_state:
-            st.session_state.db_summary = get_db_summary(st.session_state.ddl)
+            st.session_state.db_summary = _cached_db_summary(st.session_state.ddl)
             logger.info("Database summary generated")
 
 st.info(st.session_state.db_summary)
 
+# One long-lived database connection per session
+if 'db_conn' not in st.session_state:
+    st.session_state.db_conn = SessionConnection(get_db_connection())
+
 # User input
 user_question = st.text_input("Ask a question about the database:", key="user_question")
 
 if user_question:
     logger.info(f"Processing user question: {user_question}")
-    with st.spinner("Processing your question..."):
-        # First attempt at query generation and validation
-        query_response, is_valid, validation_message = attempt_query_generation_and_validation(user_question, st.session_state.ddl)
-        generated_query = query_response["sql"]
-        
-        # Display query
-        with st.expander("Generated SQL Query", expanded=False):
-            st.markdown(f"""
-            <div class="content-box">
-                <pre style="white-space: pre-wrap; word-wrap: break-word;">{generated_query.replace('\n', '<br>')}</pre>
-            </div>
-            """, unsafe_allow_html=True)
+    # First attempt at query generation and validation
+    query_response, is_valid, validation_message = run_with_status(
+        "Generating query...", run_async, attempt_query_generation_and_validation(user_question, st.session_state.ddl)
+    )
+    generated_query = query_response["sql"]
+    
+    # Display query
+    with st.expander("Generated SQL Query", expanded=False):
+        st.markdown(f"""
+        <div class="content-box">
+            <pre style="white-space: pre-wrap; word-wrap: break-word;">{generated_query.replace('\n', '<br>')}</pre>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with st.expander("Query Details", expanded=False):
+        st.write("**Explanation:**", query_response["explanation"])
+        st.write("**Tables Used:**", ", ".join(query_response["tables_used"]))
+        st.write("**Expected Result Type:**", query_response["expected_result_type"])
+    
+    with st.expander("Validation Results", expanded=False):
+        st.write("**Valid:**", "✅" if is_valid else "❌")
+        st.write("**Validation Message:**", validation_message)
+    
+    if is_valid:
+        st.success("Query validated successfully!")
+    else:
+        st.warning("Query validation failed, but we'll try to run it anyway")
         
-        with st.expander("Query Details", expanded=False):
-            st.write("**Explanation:**", query_response["explanation"])
-            st.write("**Tables Used:**", ", ".join(query_response["tables_used"]))
-            st.write("**Expected Result Type:**", query_response["expected_result_type"])
+    try:
+        # Attempt query execution with retries
+        results_df, execution_success, execution_message = run_with_status(
+            "Executing query...", attempt_query_execution, generated_query, db_conn=st.session_state.db_conn
+        )
         
-        with st.expander("Validation Results", expanded=False):
-            st.write("**Valid:**", "✅" if is_valid else "❌")
-            st.write("**Validation Message:**", validation_message)
+        correction = None
+        if not execution_success:
+            st.error(execution_message)
+            # Don't replay the failed query for later rephrasings of the question
+            run_async(forget_query_generation(user_question, st.session_state.ddl))
+            # Try one more time with error context
+            st.info("Attempting to generate a corrected query...")
+            correction = {
+                "validation_retries": 1,  # Only try one more time
+                "error_context": execution_message,
+                "prior_response": query_response
+            }
+            query_response, is_valid, validation_message = run_with_status(
+                "Generating a corrected query...", run_async, attempt_query_generation_and_validation(
+                    user_question, st.session_state.ddl, **correction
+                )
+            )
+            
+            # Display updated validation status
+            if is_valid:
+                st.success("Generated a valid corrected query")
+            else:
+                st.warning("Corrected query validation failed, but we'll try to run it anyway")
+            
+            # Try to execute the query regardless of validation status
+            results_df, execution_success, execution_message = run_with_status(
+                "Executing corrected query...", attempt_query_execution,
+                query_response["sql"],
+                max_retries=1,  # Only try one more time
+                db_conn=st.session_state.db_conn
+            )
         
-        if is_valid:
-            st.success("Query validated successfully!")
+        # Handle final results
+        if execution_success:
+            st.success("Query executed successfully!")
+            render_results_page(results_df, user_question)
+            add_visualization_options(query_response, results_df)
         else:
-            st.warning("Query validation failed, but we'll try to run it anyway")
+            st.error(f"Final attempt failed: {execution_message}")
+            if correction:
+                run_async(forget_query_generation(user_question, st.session_state.ddl, **correction))
             
-        try:
-            with st.spinner("Executing query..."):
-                # Attempt query execution with retries
-                results_df, execution_success, execution_message = attempt_query_execution(generated_query)
-                
-                if not execution_success:
-                    st.error(execution_message)
-                    # Try one more time with error context
-                    st.info("Attempting to generate a corrected query...")
-                    query_response, is_valid, validation_message = attempt_query_generation_and_validation(
-                        user_question, 
-                        st.session_state.ddl,
-                        validation_retries=1  # Only try one more time
-                    )
-                    
-                    # Display updated validation status
-                    if is_valid:
-                        st.success("Generated a valid corrected query")
-                    else:
-                        st.warning("Corrected query validation failed, but we'll try to run it anyway")
-                    
-                    # Try to execute the query regardless of validation status
-                    results_df, execution_success, execution_message = attempt_query_execution(
-                        query_response["sql"],
-                        max_retries=1  # Only try one more time
-                    )
-                
-                # Handle final results
-                if execution_success:
-                    st.success("Query executed successfully!")
-                    st.dataframe(results_df)
-                    add_visualization_options(query_response, results_df)
-                else:
-                    st.error(f"Final attempt failed: {execution_message}")
-                    
-        except Exception as e:
-            st.error(f"Unexpected error: {str(e)}")
+    except Exception as e:
+        st.error(f"Unexpected error: {str(e)}")
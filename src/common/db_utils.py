@@ -1,10 +1,17 @@
 import urllib.parse
 import time
+import threading
 from sqlalchemy import create_engine, text
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
 
-def wait_for_sql_server(engine, max_attempts=5, delay=2):
-    """Wait for SQL Server to be ready"""
+# Engines own their connection pools, so one is created per (database, host, autocommit)
+# and shared by every caller in the process
+_ENGINE_CACHE: dict[tuple, Engine] = {}
+_ENGINE_LOCK = threading.Lock()
+
+def wait_for_sql_server(engine, max_attempts=8, delay=0.25, max_delay=10.0):
+    """Wait for SQL Server to be ready, polling quickly at first and backing off exponentially"""
     for attempt in range(max_attempts):
         try:
             with engine.connect() as conn:
@@ -12,8 +19,9 @@ def wait_for_sql_server(engine, max_attempts=5, delay=2):
                 return True
         except Exception as e:
             if attempt < max_attempts - 1:
-                print(f"Attempt {attempt + 1} failed, retrying in {delay} seconds...")
+                print(f"Attempt {attempt + 1} failed, retrying in {delay:.2f} seconds...")
                 time.sleep(delay)
+                delay = min(delay * 1.8, max_delay)
             else:
                 print(f"Could not connect to SQL Server after {max_attempts} attempts")
                 raise
@@ -21,7 +29,10 @@ def wait_for_sql_server(engine, max_attempts=5, delay=2):
 
 def get_db_connection(database='olist', host='localhost', autocommit=False):
     """
-    Get database connection properties and create SQLAlchemy engine
+    Get the SQLAlchemy engine for a database, creating it on first use.
+    
+    The engine is cached per (database, host, autocommit), and the server readiness
+    check only runs when the engine is first created.
     
     Args:
         database (str): Name of the database to connect to. Defaults to 'olist'
@@ -31,6 +42,18 @@ def get_db_connection(database='olist', host='localhost', autocommit=False):
     Returns:
         sqlalchemy.engine.Engine: SQLAlchemy engine instance
     """
+    key = (database, host, autocommit)
+    with _ENGINE_LOCK:
+        engine = _ENGINE_CACHE.get(key)
+        if engine is None:
+            engine = _create_engine(database, host, autocommit)
+            # Test the connection
+            wait_for_sql_server(engine)
+            _ENGINE_CACHE[key] = engine
+    return engine
+
+def _create_engine(database, host, autocommit):
+    """Create a pooled SQLAlchemy engine for a database"""
     username = 'sa'
     password = 'YourStrong@Passw0rd'
     
@@ -45,13 +68,66 @@ def get_db_connection(database='olist', host='localhost', autocommit=False):
         'LoginTimeout=30'  # Add explicit login timeout
     )
     
-    engine = create_engine(
+    return create_engine(
         f'mssql+pyodbc:///?odbc_connect={urllib.parse.quote_plus(conn_str)}',
         isolation_level='AUTOCOMMIT' if autocommit else None,
-        pool_pre_ping=True  # Add connection health check
+        pool_size=8,  # Keep warm connections for repeated queries
+        max_overflow=16,
+        # No pool_pre_ping: dropped connections are detected when a query fails instead,
+        # see SessionConnection
+        pool_recycle=1800,  # Recycle connections before the server drops idle ones
+        # Send executemany batches (e.g. DataFrame.to_sql) as one bulk parameter array
+        # instead of one round trip per row
+        fast_executemany=True
     )
+
+class SessionConnection:
+    """
+    A long-lived connection for one interactive session.
     
-    # Test the connection
-    wait_for_sql_server(engine)
+    Queries reuse the same connection instead of checking one out (and probing it)
+    per query. If the server has dropped it, the connection is reopened and the
+    query retried once. The connection goes back to the pool on close() or when the
+    object is garbage collected with its session.
+    """
     
-    return engine
+    def __init__(self, engine: Engine):
+        """Wrap an engine; the connection is opened on first use"""
+        self.engine = engine
+        self._conn: Connection = None
+        self._lock = threading.Lock()
+    
+    def run(self, fn):
+        """
+        Call fn(connection) and return its result, reconnecting once if the connection was lost
+        
+        Args:
+            fn: Function taking an open SQLAlchemy Connection, e.g. a pandas read_sql call
+        """
+        with self._lock:
+            for attempt in range(2):
+                if self._conn is None:
+                    self._conn = self.engine.connect()
+                try:
+                    result = fn(self._conn)
+                    # End the implicit transaction so the idle connection holds no locks
+                    self._conn.rollback()
+                    return result
+                except DBAPIError as e:
+                    lost = e.connection_invalidated or isinstance(e, OperationalError)
+                    if lost:
+                        self.close()
+                    else:
+                        self._conn.rollback()
+                    if not lost or attempt:
+                        raise
+                    print(f"Database connection lost, reconnecting: {e}")
+                except Exception:
+                    self._conn.rollback()
+                    raise
+    
+    def close(self):
+        """Return the connection to the pool"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
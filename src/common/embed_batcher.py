@@ -0,0 +1,82 @@
+"""
+This module batches embedding requests made concurrently across callers.
+
+Each call to embed() puts its text on a queue and waits on a future. A background
+task collects the queued texts for a short window (or until a batch fills) and
+embeds them with a single embeddings request, so concurrent cache probes from
+several users cost one round trip instead of one each.
+"""
+
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from common.llm_utils import embed_texts
+
+# Seconds to wait for more texts after the first one of a batch arrives
+EMBED_BATCH_WINDOW = float(os.getenv("EMBED_BATCH_WINDOW", 0.01))
+# Maximum texts sent in one embeddings request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embed() calls into batched embeddings requests"""
+
+    def __init__(self, model: str = "text-embedding-3-small", window: float = EMBED_BATCH_WINDOW,
+                 max_batch: int = EMBED_BATCH_SIZE):
+        """Create a batcher; its worker task starts on the first embed() call"""
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a text as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        # The queue and worker belong to one event loop; start them on first use
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for a queued text, then collect more until the window closes or the batch fills"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """Embed queued texts batch by batch and resolve their futures"""
+        while True:
+            batch = await self._next_batch()
+            try:
+                embeddings = await embed_texts([text for text, _ in batch], self.model)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), embedding in zip(batch, embeddings):
+                # Skip callers that were cancelled while waiting
+                if not future.done():
+                    future.set_result(np.asarray(embedding, dtype=np.float32))
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+
+async def embed(text: str, model: str = "text-embedding-3-small") -> np.ndarray:
+    """Embed a text, batched with any other texts requested at the same time"""
+    if model not in _batchers:
+        _batchers[model] = EmbeddingBatcher(model)
+    return await _batchers[model].embed(text)
@@ -0,0 +1,108 @@
+"""
+This module provides shared helpers for bulk writes to the Neo4j graph.
+
+Large UNWIND statements are split into batches so a single transaction never
+holds an entire enterprise schema in the Neo4j heap, and relationship writes can
+be spread over several worker sessions sharded by their target node.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+# Rows written per UNWIND transaction
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", 20000))
+# Parallel writer sessions used for sharded relationship writes
+NEO4J_WRITE_WORKERS = int(os.getenv("NEO4J_WRITE_WORKERS", 8))
+
+def chunks(rows: Iterable[T], size: int = NEO4J_BATCH_SIZE) -> Iterator[List[T]]:
+    """Yield successive lists of at most `size` rows"""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def write_batches(session, tx_function, rows: List[dict], size: int = NEO4J_BATCH_SIZE) -> int:
+    """Run a write transaction function over the rows in batches, one transaction per batch
+
+    Args:
+        session: Open Neo4j session
+        tx_function: Function called as tx_function(tx, batch)
+        rows (List[dict]): Rows to write
+        size (int): Maximum rows per transaction
+
+    Returns:
+        int: Number of rows written
+    """
+    for batch in chunks(rows, size):
+        session.execute_write(tx_function, batch)
+    return len(rows)
+
+def write_sharded(driver, tx_function, rows: List[dict], shard_key: str,
+                  workers: int = NEO4J_WRITE_WORKERS, size: int = NEO4J_BATCH_SIZE) -> int:
+    """Write rows from a pool of workers, each with its own session, sharded by a row key
+
+    Rows sharing a shard key value (e.g. the target node of a relationship) always go
+    to the same worker, so concurrent transactions rarely contend for the same node
+    locks. Transactions that still hit a transient error such as a deadlock are
+    retried by execute_write.
+
+    Args:
+        driver: Neo4j driver
+        tx_function: Function called as tx_function(tx, batch)
+        rows (List[dict]): Rows to write
+        shard_key (str): Row key whose value selects the worker
+        workers (int): Number of worker sessions
+        size (int): Maximum rows per transaction
+
+    Returns:
+        int: Number of rows written
+    """
+    shards = [[] for _ in range(workers)]
+    for row in rows:
+        shards[hash(row[shard_key]) % workers].append(row)
+
+    def write_shard(shard: List[dict]):
+        with driver.session() as session:
+            write_batches(session, tx_function, shard, size)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() re-raises the first worker exception, if any
+        list(executor.map(write_shard, [shard for shard in shards if shard]))
+    return len(rows)
+
+class BatchWriter:
+    """Buffer rows and write them through a transaction function whenever a batch fills"""
+
+    def __init__(self, session, tx_function, size: int = NEO4J_BATCH_SIZE, depends_on: "BatchWriter" = None):
+        """
+        Args:
+            session: Open Neo4j session
+            tx_function: Function called as tx_function(tx, batch)
+            size (int): Maximum rows per transaction
+            depends_on (BatchWriter): Writer whose buffered rows must be written first,
+                e.g. the table writer for a column writer that matches on tables
+        """
+        self.session = session
+        self.tx_function = tx_function
+        self.size = size
+        self.depends_on = depends_on
+        self.count = 0
+        self._rows = []
+
+    def add(self, row: dict):
+        """Buffer a row, writing the batch once it is full"""
+        self._rows.append(row)
+        if len(self._rows) >= self.size:
+            self.flush()
+
+    def flush(self):
+        """Write any buffered rows"""
+        if self.depends_on:
+            self.depends_on.flush()
+        if self._rows:
+            self.session.execute_write(self.tx_function, self._rows)
+            self.count += len(self._rows)
+            self._rows = []
@@ -0,0 +1,267 @@
+"""
+This module provides a persistent cache for LLM responses.
+
+Responses are keyed by a hash of the full request (messages, model and sampling
+parameters), held in a small in-memory LRU and persisted to SQLite so they
+survive Streamlit reruns and process restarts.
+
+The semantic cache sits in front of whole prompt-chain steps instead: responses
+are stored with an embedding of the user question and served again for any later
+question whose embedding is close enough, as long as the rest of the inputs (DDL,
+generated query, ...) are identical and the questions mention the same numbers and
+quoted values.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Location of the on-disk cache, overridable for tests or shared deployments
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".llm_cache", "responses.sqlite"))
+# Cosine similarity above which a question is treated as a repeat of a cached one
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+# Seconds a semantic cache entry can be served before it is ignored
+SEMANTIC_CACHE_MAX_AGE = float(os.getenv("SEMANTIC_CACHE_MAX_AGE", 7 * 24 * 3600))
+
+# Numbers and quoted values; "orders in 2017" and "orders in 2018" embed almost
+# identically but must never share an answer
+_LITERAL_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*")
+
+def question_literals(question: str) -> Tuple[str, ...]:
+    """Get the sorted numbers and quoted values mentioned in a question"""
+    return tuple(sorted(_LITERAL_PATTERN.findall(question.lower())))
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable cache key from JSON-serializable request parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=32).hexdigest()
+
+class ResponseCache:
+    """Two-tier (memory + SQLite) key/value cache for LLM responses"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, maxsize: int = 512):
+        """Open (or create) the cache database at the given path"""
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss or if older than max_age seconds"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                response, created_at = self._memory[key]
+            else:
+                row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                response, created_at = row
+                self._remember(key, response, created_at)
+            if max_age is not None and time.time() - created_at > max_age:
+                return None
+            return response
+
+    def set(self, key: str, response: str):
+        """Store a response under a key"""
+        created_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, created_at)
+            )
+            self._conn.commit()
+            self._remember(key, response, created_at)
+
+    def _remember(self, key: str, response: str, created_at: float):
+        """Add an entry to the in-memory LRU, evicting the oldest if full"""
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
+
+class SemanticCache:
+    """Responses keyed by question embedding within a scope, matched by cosine similarity"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH):
+        """Open (or create) the semantic cache table in the database at the given path"""
+        self._lock = threading.Lock()
+        # Per scope: embedding matrix, responses, literals of each question and creation times
+        self._index: Dict[str, Tuple[np.ndarray, List[str], List[Tuple[str, ...]], np.ndarray]] = {}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_responses ("
+            "scope TEXT NOT NULL, question TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "response TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_responses_scope ON semantic_responses (scope)")
+        self._conn.commit()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _entries(self, scope: str) -> Tuple[np.ndarray, List[str], List[Tuple[str, ...]], np.ndarray]:
+        """Load the embeddings, responses, question literals and creation times of a scope, reading SQLite once per scope"""
+        if scope not in self._index:
+            rows = self._conn.execute(
+                "SELECT embedding, response, question, created_at FROM semantic_responses WHERE scope = ?", (scope,)
+            ).fetchall()
+            matrix = np.array([np.frombuffer(row[0], dtype=np.float32) for row in rows])
+            self._index[scope] = (
+                matrix,
+                [row[1] for row in rows],
+                [question_literals(row[2]) for row in rows],
+                np.array([row[3] for row in rows], dtype=np.float64)
+            )
+        return self._index[scope]
+
+    def get(self, scope: str, question: str, embedding: List[float], threshold: float = SEMANTIC_CACHE_THRESHOLD,
+            max_age: Optional[float] = SEMANTIC_CACHE_MAX_AGE) -> Optional[str]:
+        """
+        Return the response of the most similar cached question in the scope, or None.
+
+        A cached question only matches if it is at least `threshold` similar, no older
+        than `max_age` seconds and mentions exactly the same numbers and quoted values.
+        """
+        with self._lock:
+            matches = self._matches(scope, question, embedding, threshold, max_age)
+            return matches[0] if matches else None
+
+    def discard(self, scope: str, question: str, embedding: List[float], threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                max_age: Optional[float] = SEMANTIC_CACHE_MAX_AGE) -> int:
+        """Delete every response in the scope that get would serve for the question, returning how many were deleted"""
+        with self._lock:
+            matches = self._matches(scope, question, embedding, threshold, max_age)
+            if matches:
+                self._conn.executemany(
+                    "DELETE FROM semantic_responses WHERE scope = ? AND response = ?",
+                    [(scope, response) for response in set(matches)]
+                )
+                self._conn.commit()
+                # Reloaded from SQLite on the next lookup
+                self._index.pop(scope, None)
+            return len(matches)
+
+    def _matches(self, scope: str, question: str, embedding: List[float], threshold: float,
+                 max_age: Optional[float]) -> List[str]:
+        """Get the responses matching a question, most similar first; the caller holds the lock"""
+        literals = question_literals(question)
+        matrix, responses, entry_literals, created_at = self._entries(scope)
+        if not responses:
+            return []
+        scores = matrix @ self._normalize(embedding)
+        if max_age is not None:
+            scores[created_at < time.time() - max_age] = -1.0
+        return [
+            responses[i] for i in np.argsort(scores)[::-1]
+            if scores[i] >= threshold and entry_literals[i] == literals
+        ]
+
+    def set(self, scope: str, question: str, embedding: List[float], response: str):
+        """Store a response under a question embedding in the scope"""
+        vector = self._normalize(embedding)
+        created_at = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO semantic_responses (scope, question, embedding, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (scope, question, vector.tobytes(), response, created_at)
+            )
+            self._conn.commit()
+            matrix, responses, entry_literals, created = self._entries(scope)
+            self._index[scope] = (
+                np.vstack([matrix, vector]) if responses else vector[np.newaxis, :],
+                responses + [response],
+                entry_literals + [question_literals(question)],
+                np.append(created, created_at)
+            )
+
+_semantic_cache: Optional[SemanticCache] = None
+
+def get_semantic_cache() -> SemanticCache:
+    """Get the process-wide semantic cache"""
+    global _semantic_cache
+    with _default_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache()
+    return _semantic_cache
+
+def semantic_cache(namespace: str, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                   max_age: Optional[float] = SEMANTIC_CACHE_MAX_AGE):
+    """
+    Cache an async function of a user question by the question's meaning.
+
+    The decorated function must take the question as its first argument and return
+    a JSON-serializable result. All other arguments are matched exactly (scoped by
+    their hash), while the question is matched by embedding similarity, so rephrased
+    repeats of a question against the same DDL skip the LLM call entirely. Numbers
+    and quoted values in the question must match exactly, since questions differing
+    only in those ("top 5" vs "top 10") need different answers.
+
+    Results are cached as soon as they are returned, so callers that find one unusable
+    afterwards (e.g. a generated query that fails to execute) should drop it with
+    `await func.invalidate(question, *args, **kwargs)`, called with the same arguments.
+
+    Args:
+        namespace (str): Name separating the entries of different functions
+        threshold (float): Minimum cosine similarity for a cache hit
+        max_age (Optional[float]): Seconds an entry can be served, or None for no limit
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(question: str, *args, **kwargs):
+            # Imported here because the embedding helpers depend on this module
+            from common.embed_batcher import embed
+
+            scope = make_cache_key(namespace, args, kwargs)
+            embedding = await embed(question)
+            cached = get_semantic_cache().get(scope, question, embedding, threshold, max_age)
+            if cached is not None:
+                return json.loads(cached)
+
+            result = await func(question, *args, **kwargs)
+            get_semantic_cache().set(scope, question, embedding, json.dumps(result))
+            return result
+
+        async def invalidate(question: str, *args, **kwargs) -> int:
+            """Delete the cached results a call with these arguments would be served"""
+            from common.embed_batcher import embed
+
+            scope = make_cache_key(namespace, args, kwargs)
+            return get_semantic_cache().discard(scope, question, await embed(question), threshold, max_age)
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
@@ -0,0 +1,278 @@
+"""
+This module provides shared helpers for calling OpenAI asynchronously from
+synchronous entry points such as the Streamlit apps and the metadata scripts.
+
+All coroutines run on one long-lived background event loop, so the AsyncOpenAI
+client and its HTTP connection pool stay warm across Streamlit reruns. Requests
+are bounded by a concurrency semaphore and a requests-per-minute token bucket,
+and transient failures (429s, 5xx, connection errors) are retried with random
+exponential backoff. When the openai[aiohttp] extra is installed the client uses
+the aiohttp transport, which handles many concurrent requests better than the
+default httpx one.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+from typing import Any, AsyncIterator, Coroutine, Dict, Iterator, List, Optional, TypeVar
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+from common.llm_cache import get_response_cache, make_cache_key
+
+try:
+    # aiohttp transport for AsyncOpenAI, installed with the openai[aiohttp] extra
+    from openai import DefaultAioHttpClient
+    import httpx_aiohttp  # noqa: F401
+except ImportError:
+    DefaultAioHttpClient = None
+
+T = TypeVar("T")
+
+# Maximum number of in-flight OpenAI requests per process
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", 8))
+# Client-side request budget, kept below the account's rate limit
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", 500))
+# Attempts per request before a transient error is raised to the caller
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", 6))
+
+# Errors worth retrying; APITimeoutError is a subclass of APIConnectionError
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_client: Optional[AsyncOpenAI] = None
+_semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
+# Counts of requests, retried attempts per error type and requests that ran out of attempts
+_retry_statistics = Counter()
+
+class AsyncRateLimiter:
+    """Token bucket allowing at most `rate` acquisitions per `period` seconds"""
+
+    def __init__(self, rate: int, period: float = 60.0):
+        """Create a full bucket of `rate` tokens refilled evenly over `period`"""
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+
+_rate_limiter = AsyncRateLimiter(OPENAI_RPM)
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get the background event loop shared by all OpenAI calls in this process"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+    return _loop
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine on the shared event loop and block until it completes"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+async def _anext(agen: AsyncIterator[T]) -> T:
+    """Await the next item of an async iterator"""
+    return await agen.__anext__()
+
+async def _aclose(agen: AsyncIterator[T]):
+    """Close an async generator"""
+    await agen.aclose()
+
+def iter_async(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Iterate an async generator from synchronous code, stepping it on the shared event loop"""
+    try:
+        while True:
+            try:
+                yield run_async(_anext(agen))
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(_aclose(agen))
+
+def get_async_client() -> AsyncOpenAI:
+    """Get the process-wide AsyncOpenAI client"""
+    global _client
+    with _lock:
+        if _client is None:
+            # Retries are handled by call_with_retries
+            http_client = DefaultAioHttpClient() if DefaultAioHttpClient else None
+            _client = AsyncOpenAI(max_retries=0, http_client=http_client)
+    return _client
+
+async def call_with_retries(method, **params):
+    """
+    Call an AsyncOpenAI API method with rate limiting and retries.
+
+    Transient errors are retried up to OPENAI_MAX_ATTEMPTS times, sleeping a random
+    delay between 1 second and an exponentially growing cap (at most 60 seconds).
+
+    Args:
+        method: Bound client method, e.g. client.chat.completions.create
+        **params: Keyword arguments passed through to the method
+
+    Returns:
+        The raw API response
+    """
+    _retry_statistics["requests"] += 1
+    for attempt in range(OPENAI_MAX_ATTEMPTS):
+        await _rate_limiter.acquire()
+        try:
+            async with _semaphore:
+                return await method(**params)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == OPENAI_MAX_ATTEMPTS - 1:
+                _retry_statistics["exhausted"] += 1
+                raise
+            _retry_statistics[f"retries.{type(e).__name__}"] += 1
+            await asyncio.sleep(random.uniform(1, min(60, 2 ** (attempt + 1))))
+
+def get_retry_statistics() -> Dict[str, int]:
+    """
+    Get the retry counters of call_with_retries since the process started.
+    
+    Returns:
+        Dict[str, int]: "requests" made, "retries.<ErrorType>" attempts retried per
+            error type and "exhausted" requests that failed after every attempt
+    """
+    return dict(_retry_statistics)
+
+async def create_chat_completion(**params):
+    """Call chat.completions.create with rate limiting and retries"""
+    return await call_with_retries(get_async_client().chat.completions.create, **params)
+
+async def chat_completion(cache: bool = True, **params) -> str:
+    """
+    Create a chat completion and return the content of the first choice.
+
+    Args:
+        cache (bool): Whether to serve/store the response from the response cache.
+            Requests are keyed on all parameters (messages, model, temperature, ...)
+        **params: Keyword arguments passed through to chat.completions.create
+
+    Returns:
+        str: The message content of the first choice
+    """
+    key = make_cache_key("chat", params) if cache else None
+    if key:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return cached
+
+    response = await create_chat_completion(**params)
+    content = response.choices[0].message.content
+
+    if key and content is not None:
+        get_response_cache().set(key, content)
+    return content
+
+async def chat_completion_choices(cache: bool = True, **params) -> List[str]:
+    """
+    Create a chat completion and return the content of every choice.
+
+    Use with the ``n`` parameter to sample several candidates in one request,
+    which is cheaper than ``n`` separate calls since the prompt is billed once.
+
+    Args:
+        cache (bool): Whether to serve/store the responses from the response cache
+        **params: Keyword arguments passed through to chat.completions.create
+
+    Returns:
+        List[str]: The message content of each choice, in choice order
+    """
+    key = make_cache_key("chat_choices", params) if cache else None
+    if key:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            return json.loads(cached)
+
+    response = await create_chat_completion(**params)
+    contents = [choice.message.content for choice in response.choices]
+
+    if key and all(content is not None for content in contents):
+        get_response_cache().set(key, json.dumps(contents))
+    return contents
+
+async def stream_chat_completion(cache: bool = True, **params) -> AsyncIterator[str]:
+    """
+    Create a streaming chat completion and yield the content deltas as they arrive.
+
+    Shares cache entries with chat_completion; a cached response is yielded as a
+    single chunk, and a fully streamed response is stored once it completes. Closing
+    the generator early aborts the request and caches nothing.
+
+    Args:
+        cache (bool): Whether to serve/store the response from the response cache
+        **params: Keyword arguments passed through to chat.completions.create
+
+    Yields:
+        str: Successive pieces of the first choice's message content
+    """
+    key = make_cache_key("chat", params) if cache else None
+    if key:
+        cached = get_response_cache().get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    stream = await create_chat_completion(stream=True, **params)
+    parts = []
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield parts[-1]
+    finally:
+        # Release the connection promptly when the consumer stops reading early
+        await stream.close()
+
+    if key and parts:
+        get_response_cache().set(key, "".join(parts))
+
+async def embed_texts(texts: List[str], model: str = "text-embedding-3-small", cache: bool = True) -> List[List[float]]:
+    """
+    Embed texts, requesting only those not already in the response cache.
+
+    Args:
+        texts (List[str]): Texts to embed
+        model (str): Embedding model name
+        cache (bool): Whether to serve/store the embeddings from the response cache
+
+    Returns:
+        List[List[float]]: One embedding per input text, in input order
+    """
+    keys = [make_cache_key("embedding", model, text) for text in texts]
+    embeddings: List[Optional[List[float]]] = [None] * len(texts)
+    if cache:
+        for i, key in enumerate(keys):
+            cached = get_response_cache().get(key)
+            if cached is not None:
+                embeddings[i] = json.loads(cached)
+
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        response = await call_with_retries(
+            get_async_client().embeddings.create,
+            model=model,
+            input=[texts[i] for i in missing]
+        )
+        for i, item in zip(missing, response.data):
+            embeddings[i] = item.embedding
+            if cache:
+                get_response_cache().set(keys[i], json.dumps(item.embedding))
+    return embeddings
@@ -1,9 +1,176 @@
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from typing import Dict, Any, List
+from pandas.api.types import (
+    CategoricalDtype, is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype, is_object_dtype, is_string_dtype
+)
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Set, Tuple
+import functools
 import re
 
+try:
+    # Optional Aho-Corasick matcher (pip install pyahocorasick); falls back to one regex scan
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Score added to an intent by each of its keyword tiers
+_KEYWORD_WEIGHTS = {'high': 1.0, 'medium': 0.6, 'low': 0.3}
+# Score added per SQL time pattern found in the query
+_SQL_TIME_WEIGHT = 0.3
+# Intent boosted by an explicit mention of each chart type
+_CHART_INTENTS = {'line': 'temporal', 'bar': 'comparison', 'pie': 'composition', 'scatter': 'relationship'}
+_INTENTS = ('temporal', 'comparison', 'distribution', 'relationship', 'composition')
+
+def _classify_columns(df: pd.DataFrame) -> Tuple[List[str], List[str], List[str]]:
+    """Split columns into numeric, categorical and datetime lists in one pass over the dtypes.
+
+    Uses dtype predicates rather than dtype names, so Arrow-backed columns (e.g. int64[pyarrow])
+    are classified the same way as their NumPy equivalents.
+    """
+    numeric_cols, categorical_cols, datetime_cols = [], [], []
+    for name, dtype in df.dtypes.items():
+        if is_datetime64_any_dtype(dtype):
+            datetime_cols.append(name)
+        elif is_bool_dtype(dtype):
+            continue
+        elif is_numeric_dtype(dtype):
+            numeric_cols.append(name)
+        elif is_object_dtype(dtype) or is_string_dtype(dtype) or isinstance(dtype, CategoricalDtype):
+            categorical_cols.append(name)
+    return numeric_cols, categorical_cols, datetime_cols
+
+@dataclass
+class DataStructure:
+    """Shape and column types of a result DataFrame.
+
+    Columns are only classified when one of the column lists is first read, so e.g. a
+    single-value result never pays for a dtype scan. Supports dict-style access
+    (structure['numeric_cols']) as well as attributes.
+    """
+    df: pd.DataFrame = field(repr=False)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.df)
+
+    @property
+    def num_cols(self) -> int:
+        return len(self.df.columns)
+
+    @functools.cached_property
+    def _columns(self) -> Tuple[List[str], List[str], List[str]]:
+        return _classify_columns(self.df)
+
+    @property
+    def numeric_cols(self) -> List[str]:
+        return self._columns[0]
+
+    @property
+    def categorical_cols(self) -> List[str]:
+        return self._columns[1]
+
+    @property
+    def datetime_cols(self) -> List[str]:
+        return self._columns[2]
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+def _freeze(value):
+    """Convert nested keyword lists and dicts into hashable tuples"""
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+class _KeywordMatcher:
+    """Compiled keyword tables that score a query's visualization intents in one scan.
+
+    Each keyword maps to a precomputed payload of the intent scores it adds and the
+    intents its chart type mention boosts, so scoring a hit is a single lookup. With pyahocorasick installed, the scan is
+    an Aho-Corasick automaton that reports every (possibly overlapping) keyword
+    occurrence in one pass. Otherwise it is a lookahead alternation tried at every
+    position, longest keyword first, so overlapping keywords (e.g. 'between' inside
+    'difference between') are all found; keywords that are prefixes of the longest
+    match at a position (e.g. 'time' for 'time series') are credited through _prefixes.
+    """
+
+    def __init__(self, sql_time_patterns, intent_keywords, chart_indicators):
+        """Compile the frozen keyword tables built by VisualizationSelector"""
+        scores: Dict[str, List[Tuple[str, float]]] = {}
+        # Chart indicator -> intents boosted by mentioning that chart type
+        chart_intents: Dict[str, List[str]] = {}
+        for pattern in sql_time_patterns:
+            scores.setdefault(pattern, []).append(('temporal', _SQL_TIME_WEIGHT))
+        for intent, keywords in intent_keywords:
+            keywords = dict(keywords)
+            for tier, weight in _KEYWORD_WEIGHTS.items():
+                for word in keywords[tier]:
+                    scores.setdefault(word, []).append((intent, weight))
+        for chart_type, indicators in chart_indicators:
+            if chart_type in _CHART_INTENTS:
+                for indicator in indicators:
+                    chart_intents.setdefault(indicator, []).append(_CHART_INTENTS[chart_type])
+        
+        keywords = sorted(set(scores) | set(chart_intents), key=len, reverse=True)
+        self._payloads = {word: (tuple(scores.get(word, ())), tuple(chart_intents.get(word, ()))) for word in keywords}
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for word in keywords:
+                self._automaton.add_word(word, word)
+            self._automaton.make_automaton()
+            return
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(word) for word in keywords) + '))')
+        self._prefixes = {word: [prefix for prefix in keywords if word.startswith(prefix)] for word in keywords}
+
+    def match(self, query: str) -> Set[str]:
+        """Return the distinct keywords occurring anywhere in a lowercased query"""
+        if self._automaton is not None:
+            return {word for _, word in self._automaton.iter(query)}
+        matched = set()
+        for match in self._pattern.finditer(query):
+            matched.update(self._prefixes[match.group(1)])
+        return matched
+
+    def score(self, query: str) -> Dict[str, float]:
+        """Score and normalize the visualization intents of a lowercased query"""
+        intents = dict.fromkeys(_INTENTS, 0.0)
+        
+        # Score SQL time patterns, weighted intent keywords and explicit chart type
+        # mentions from a single scan of the query
+        # Each chart type boosts its intent once however many of its indicators appear;
+        # chart types map to distinct intents, so deduplicating intents is equivalent
+        boosted = set()
+        for word in self.match(query):
+            word_scores, word_boosts = self._payloads[word]
+            for intent, weight in word_scores:
+                intents[intent] += weight
+            boosted.update(word_boosts)
+        for intent in boosted:
+            intents[intent] += 1.0
+                    
+        # Normalize scores; all-zero scores are left as they are
+        max_score = max(intents.values())
+        if max_score > 0:
+            inverse = 1.0 / max_score
+            intents = {k: v * inverse for k, v in intents.items()}
+        
+        return intents
+
+@functools.lru_cache(maxsize=8)
+def _get_keyword_matcher(tables: tuple) -> _KeywordMatcher:
+    """Compile keyword tables once per process rather than once per selector"""
+    return _KeywordMatcher(*tables)
+
+@functools.lru_cache(maxsize=512)
+def _analyze_intent_cached(query: str, matcher: _KeywordMatcher) -> Tuple[Tuple[str, float], ...]:
+    """Intent scores of a lowercased query as a hashable, compact tuple of (intent, score) pairs"""
+    return tuple(matcher.score(query).items())
+
 class VisualizationSelector:
     def __init__(self):
         # SQL-specific keywords and aggregations
@@ -45,64 +212,32 @@ class VisualizationSelector:
             'scatter': ['scatter plot', 'scatter graph', 'correlation plot'],
             'area': ['area chart', 'stacked area', 'cumulative'],
         }
+        
+        # The apps build a selector per render, so compiled matchers are shared by all
+        # selectors with the same keyword tables
+        self._matcher = _get_keyword_matcher(_freeze((
+            self.sql_time_patterns,
+            [
+                ('temporal', self.time_keywords),
+                ('comparison', self.comparison_keywords),
+                ('distribution', self.distribution_keywords),
+                ('relationship', self.relationship_keywords),
+                ('composition', self.composition_keywords)
+            ],
+            self.chart_indicators
+        )))
 
     def analyze_query_intent(self, query: str) -> Dict[str, float]:
-        """Analyze the query text to determine visualization intent with confidence scores."""
-        query = query.lower()
-        intents = {
-            'temporal': 0.0,
-            'comparison': 0.0,
-            'distribution': 0.0,
-            'relationship': 0.0,
-            'composition': 0.0
-        }
-        
-        # Check SQL-specific patterns
-        sql_temporal_score = sum(pattern in query for pattern in self.sql_time_patterns) * 0.3
-        sql_agg_score = sum(agg in query for agg in self.sql_aggregations) * 0.2
-        intents['temporal'] += sql_temporal_score
-        
-        # Analyze keywords with weights
-        for intent, keywords in [
-            ('temporal', self.time_keywords),
-            ('comparison', self.comparison_keywords),
-            ('distribution', self.distribution_keywords),
-            ('relationship', self.relationship_keywords),
-            ('composition', self.composition_keywords)
-        ]:
-            score = 0.0
-            score += sum(1.0 for word in keywords['high'] if word in query)
-            score += sum(0.6 for word in keywords['medium'] if word in query)
-            score += sum(0.3 for word in keywords['low'] if word in query)
-            intents[intent] += score
-            
-        # Check for explicit chart type mentions
-        for chart_type, indicators in self.chart_indicators.items():
-            if any(indicator in query for indicator in indicators):
-                if chart_type == 'line':
-                    intents['temporal'] += 1.0
-                elif chart_type == 'bar':
-                    intents['comparison'] += 1.0
-                elif chart_type == 'pie':
-                    intents['composition'] += 1.0
-                elif chart_type == 'scatter':
-                    intents['relationship'] += 1.0
-                    
-        # Normalize scores
-        max_score = max(intents.values()) if max(intents.values()) > 0 else 1.0
-        intents = {k: v/max_score for k, v in intents.items()}
-        
-        return intents
+        """Analyze the query text to determine visualization intent with confidence scores.
 
-    def analyze_data_structure(self, df: pd.DataFrame) -> Dict[str, Any]:
+        Scores are memoized per lowercased query, since Streamlit reruns re-select the
+        visualization for the same query on every widget interaction.
+        """
+        return dict(_analyze_intent_cached(query.lower(), self._matcher))
+
+    def analyze_data_structure(self, df: pd.DataFrame) -> DataStructure:
         """Analyze the structure of the result DataFrame."""
-        return {
-            'num_rows': len(df),
-            'num_cols': len(df.columns),
-            'numeric_cols': df.select_dtypes(include=['int64', 'float64']).columns.tolist(),
-            'categorical_cols': df.select_dtypes(include=['object', 'category']).columns.tolist(),
-            'datetime_cols': df.select_dtypes(include=['datetime64']).columns.tolist()
-        }
+        return DataStructure(df)
 
     def select_visualization(self, df: pd.DataFrame, query: str) -> Dict[str, Any]:
         """Select the most appropriate visualization based on query intent and data structure."""
@@ -131,7 +266,9 @@ class VisualizationSelector:
             'x': None,
             'y': None,
             'color': None,
-            'confidence': confidence
+            'confidence': confidence,
+            # Column classification reused by render_visualization
+            'structure': structure
         }
         
         # Select visualization based on intent and data structure
@@ -208,17 +345,21 @@ def render_visualization(viz_config: Dict[str, Any], df: pd.DataFrame, st) -> No
         st.dataframe(df)
         return
         
-    # Ensure we have proper column configuration for the visualization type
-    structure = {
-        'numeric_cols': df.select_dtypes(include=['int64', 'float64']).columns.tolist(),
-        'categorical_cols': df.select_dtypes(include=['object', 'category']).columns.tolist(),
-        'datetime_cols': df.select_dtypes(include=['datetime64']).columns.tolist()
-    }
+    # Work out which column settings are missing for the visualization type; the common
+    # case (a config from select_visualization) already has them, so no dtype scan is needed
+    viz_type = viz_config['type']
+    missing_xy = viz_config.get('x') is None or viz_config.get('y') is None
+    need_xy = viz_type in ['line', 'bar', 'scatter', 'box'] and missing_xy
+    need_x = viz_type == 'histogram' and not viz_config.get('x')
+    need_pie = viz_type == 'pie' and missing_xy and not (viz_config.get('names') and viz_config.get('values'))
     
-    # Configure columns based on visualization type
-    if viz_config.get('x') is None or viz_config.get('y') is None:
-        if viz_config['type'] in ['line', 'bar', 'scatter', 'box']:
-            if structure['datetime_cols'] and viz_config['type'] == 'line':
+    if need_xy or need_x or need_pie:
+        # Reuse the column classification from select_visualization when the config came from there
+        structure = viz_config.get('structure') or DataStructure(df)
+        
+        # Configure columns based on visualization type
+        if need_xy:
+            if structure['datetime_cols'] and viz_type == 'line':
                 viz_config['x'] = structure['datetime_cols'][0]
             elif structure['categorical_cols']:
                 viz_config['x'] = structure['categorical_cols'][0]
@@ -228,11 +369,11 @@ def render_visualization(viz_config: Dict[str, Any], df: pd.DataFrame, st) -> No
             if structure['numeric_cols']:
                 viz_config['y'] = structure['numeric_cols'][0]
                 
-        elif viz_config['type'] == 'histogram' and not viz_config.get('x'):
+        elif need_x:
             if structure['numeric_cols']:
                 viz_config['x'] = structure['numeric_cols'][0]
                 
-        elif viz_config['type'] == 'pie':
+        elif need_pie:
             if structure['categorical_cols'] and structure['numeric_cols']:
                 viz_config['names'] = structure['categorical_cols'][0]
                 viz_config['values'] = structure['numeric_cols'][0]
@@ -1,120 +1,148 @@
 import sqlite3
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 import urllib.parse
+from collections import defaultdict
 from tqdm import tqdm
 from common.db_utils import get_db_connection
 
-def get_table_columns_with_types(engine, table_name):
-    """Get all columns and their data types for a given table"""
-    query = f"""
-    SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
+def quote_identifier(name):
+    """Bracket-quote a SQL Server identifier, escaping any closing brackets"""
+    return "[" + name.replace("]", "]]") + "]"
+
+def get_all_columns(conn, tables):
+    """Get the columns and data types of all the given tables with a single query"""
+    query = text("""
+    SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
     FROM INFORMATION_SCHEMA.COLUMNS
-    WHERE TABLE_NAME = '{table_name}'
-    """
-    with engine.connect() as conn:
-        result = conn.execute(text(query))
-        return {row[0]: {'type': row[1], 'length': row[2]} for row in result}
+    WHERE TABLE_NAME IN :names
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """).bindparams(bindparam('names', expanding=True))
+    columns = {table: {} for table in tables}
+    for row in conn.execute(query, {'names': list(tables)}):
+        columns[row[0]][row[1]] = {'type': row[2], 'length': row[3]}
+    return columns
 
-def ensure_valid_key_type(engine, table_name, column_name):
+def ensure_valid_key_type(conn, table_name, column_name):
     """Convert column to a valid type for keys if needed"""
     alter_query = f"""
-    ALTER TABLE {table_name}
-    ALTER COLUMN {column_name} NVARCHAR(255) NOT NULL;
+    ALTER TABLE {quote_identifier(table_name)}
+    ALTER COLUMN {quote_identifier(column_name)} NVARCHAR(255) NOT NULL;
     """
     try:
-        with engine.connect() as conn:
-            conn.execute(text(alter_query))
-            conn.commit()
-            return True
+        conn.execute(text(alter_query))
+        conn.commit()
+        return True
     except Exception as e:
+        conn.rollback()
         print(f"Error converting column {column_name} in {table_name}: {str(e)}")
         return False
 
-def check_uniqueness(engine, table_name, column_name):
+def check_uniqueness(conn, table_name, column_name):
     """Check if a column contains unique values"""
+    # EXISTS lets the server stop at the first duplicate instead of counting every
+    # distinct value; the column is already NOT NULL (see ensure_valid_key_type)
+    column = quote_identifier(column_name)
     query = f"""
-    SELECT COUNT(*) as total_rows, COUNT(DISTINCT {column_name}) as unique_values
-    FROM {table_name}
+    SELECT CASE WHEN EXISTS (
+        SELECT 1 FROM {quote_identifier(table_name)}
+        GROUP BY {column}
+        HAVING COUNT(*) > 1
+    ) THEN 0 ELSE 1 END as is_unique
     """
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(query)).fetchone()
-            return result[0] == result[1]  # True if all values are unique
+        return bool(conn.execute(text(query)).scalar())  # True if all values are unique
     except Exception as e:
+        conn.rollback()
         print(f"Error checking uniqueness for {column_name} in {table_name}: {str(e)}")
         return False
 
-def get_primary_key_columns(engine, table_name):
-    """Get existing primary key columns for a table"""
-    query = f"""
-    SELECT c.name as column_name
+def get_all_primary_key_columns(conn):
+    """Get the existing primary key columns of every table, keyed by table name"""
+    query = """
+    SELECT OBJECT_NAME(i.object_id) as table_name, c.name as column_name
     FROM sys.indexes i
     JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
     JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
     WHERE i.is_primary_key = 1
-    AND OBJECT_NAME(i.object_id) = '{table_name}'
+    ORDER BY table_name, ic.key_ordinal
     """
+    primary_keys = {}
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(query))
-            return [row[0] for row in result]
+        for row in conn.execute(text(query)):
+            primary_keys.setdefault(row[0], []).append(row[1])
     except Exception as e:
-        print(f"Error getting primary key for {table_name}: {str(e)}")
-        return []
+        conn.rollback()
+        print(f"Error getting primary keys: {str(e)}")
+    return primary_keys
 
-def find_foreign_key_relationships(engine, tables):
+def find_foreign_key_relationships(conn, tables):
     """Find potential foreign key relationships based on column names"""
     relationships = []
+    # Fetch every table's columns up front rather than twice per table pair
+    all_columns = get_all_columns(conn, tables)
+    
+    # Index the tables containing each column name, so candidate child tables are a
+    # lookup rather than a scan over every other table
+    column_tables = defaultdict(list)
+    for table in tables:
+        for column in all_columns[table]:
+            column_tables[column].append(table)
     
     for parent_table in tables:
-        parent_columns = get_table_columns_with_types(engine, parent_table)
+        parent_columns = all_columns[parent_table]
         
         # Look for potential ID columns that might be primary keys
         id_columns = [col for col in parent_columns.keys() if col.lower().endswith('_id')]
         
-        for child_table in tables:
-            if child_table != parent_table:
-                child_columns = get_table_columns_with_types(engine, child_table)
-                
-                # Find matching columns that could be foreign keys
-                for id_col in id_columns:
-                    if id_col in child_columns:
-                        # Check if this is likely a primary key reference
-                        base_name = id_col.lower().replace('_id', '')
-                        if parent_table.lower().startswith(base_name):
-                            relationships.append({
-                                'parent_table': parent_table,
-                                'child_table': child_table,
-                                'column_name': id_col,
-                                'parent_type': parent_columns[id_col],
-                                'child_type': child_columns[id_col]
-                            })
+        for id_col in id_columns:
+            # Check if this is likely a primary key reference
+            base_name = id_col.lower().replace('_id', '')
+            if not parent_table.lower().startswith(base_name):
+                continue
+            
+            # Every other table with the same column could hold a foreign key
+            for child_table in column_tables[id_col]:
+                if child_table != parent_table:
+                    relationships.append({
+                        'parent_table': parent_table,
+                        'child_table': child_table,
+                        'column_name': id_col,
+                        'parent_type': parent_columns[id_col],
+                        'child_type': all_columns[child_table][id_col]
+                    })
     
     return relationships
 
-def check_referential_integrity(engine, parent_table, child_table, column_name):
+def check_referential_integrity(conn, parent_table, child_table, column_name):
     """Check if all values in child table exist in parent table"""
+    # NOT EXISTS plans as a left anti semi join, without materializing the NULL-extended
+    # rows of a LEFT JOIN; NOLOCK avoids taking shared locks for this read-only check
+    column = quote_identifier(column_name)
     query = f"""
     SELECT COUNT(*) as invalid_count
-    FROM {child_table} c
-    LEFT JOIN {parent_table} p ON c.{column_name} = p.{column_name}
-    WHERE p.{column_name} IS NULL
-    AND c.{column_name} IS NOT NULL
+    FROM {quote_identifier(child_table)} c WITH (NOLOCK)
+    WHERE c.{column} IS NOT NULL
+    AND NOT EXISTS (
+        SELECT 1 FROM {quote_identifier(parent_table)} p WITH (NOLOCK)
+        WHERE p.{column} = c.{column}
+    )
     """
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text(query)).fetchone()
-            invalid_count = result[0]
-            if invalid_count > 0:
-                print(f"Warning: Found {invalid_count} rows in {child_table} with {column_name} values that don't exist in {parent_table}")
-            return invalid_count == 0
+        result = conn.execute(text(query)).fetchone()
+        invalid_count = result[0]
+        if invalid_count > 0:
+            print(f"Warning: Found {invalid_count} rows in {child_table} with {column_name} values that don't exist in {parent_table}")
+        return invalid_count == 0
     except Exception as e:
+        conn.rollback()
         print(f"Error checking referential integrity between {child_table} and {parent_table}: {str(e)}")
         return False
 
-def create_foreign_keys(engine, relationships):
+def create_foreign_keys(conn, relationships):
     """Create foreign key constraints for identified relationships"""
     print("Creating foreign key relationships...")
+    # Existing primary keys are fetched once and kept up to date as keys are created
+    primary_keys = get_all_primary_key_columns(conn)
     
     for rel in tqdm(relationships):
         try:
@@ -123,53 +151,55 @@ def create_foreign_keys(engine, relationships):
             column_name = rel['column_name']
             
             # First ensure the columns are of a valid type for keys
-            if not ensure_valid_key_type(engine, parent_table, column_name):
+            if not ensure_valid_key_type(conn, parent_table, column_name):
                 continue
-            if not ensure_valid_key_type(engine, child_table, column_name):
+            if not ensure_valid_key_type(conn, child_table, column_name):
                 continue
             
             # Check if parent table already has a primary key
-            existing_pk = get_primary_key_columns(engine, parent_table)
+            existing_pk = primary_keys.get(parent_table)
             
             # If no primary key exists and the column is unique, create one
-            if not existing_pk and check_uniqueness(engine, parent_table, column_name):
+            if not existing_pk and check_uniqueness(conn, parent_table, column_name):
                 create_pk_query = f"""
-                ALTER TABLE {parent_table}
-                ADD CONSTRAINT PK_{parent_table} PRIMARY KEY ({column_name});
+                ALTER TABLE {quote_identifier(parent_table)}
+                ADD CONSTRAINT {quote_identifier(f"PK_{parent_table}")} PRIMARY KEY ({quote_identifier(column_name)});
                 """
-                with engine.connect() as conn:
-                    conn.execute(text(create_pk_query))
-                    conn.commit()
-                    print(f"Created primary key on {parent_table}({column_name})")
+                conn.execute(text(create_pk_query))
+                conn.commit()
+                print(f"Created primary key on {parent_table}({column_name})")
+                primary_keys[parent_table] = [column_name]
             elif not existing_pk:
                 print(f"Warning: Cannot create primary key on {parent_table}({column_name}) - values are not unique")
                 continue
             
             # Check referential integrity before creating foreign key
-            if not check_referential_integrity(engine, parent_table, child_table, column_name):
+            if not check_referential_integrity(conn, parent_table, child_table, column_name):
                 print(f"Skipping foreign key creation due to referential integrity issues")
                 continue
             
-            # Create foreign key if it doesn't exist
+            # Create foreign key if it doesn't exist; table names are bound as parameters and
+            # identifiers are bracket-quoted, so the existence check reuses one cached plan
+            column = quote_identifier(column_name)
             create_fk_query = f"""
             IF NOT EXISTS (
                 SELECT 1 FROM sys.foreign_keys
-                WHERE parent_object_id = OBJECT_ID('{child_table}')
-                AND referenced_object_id = OBJECT_ID('{parent_table}')
+                WHERE parent_object_id = OBJECT_ID(:child_table)
+                AND referenced_object_id = OBJECT_ID(:parent_table)
             )
             BEGIN
-                ALTER TABLE {child_table}
-                ADD CONSTRAINT FK_{child_table}_{parent_table}_{column_name}
-                FOREIGN KEY ({column_name})
-                REFERENCES {parent_table}({column_name});
+                ALTER TABLE {quote_identifier(child_table)}
+                ADD CONSTRAINT {quote_identifier(f"FK_{child_table}_{parent_table}_{column_name}")}
+                FOREIGN KEY ({column})
+                REFERENCES {quote_identifier(parent_table)}({column});
             END
             """
             
-            with engine.connect() as conn:
-                conn.execute(text(create_fk_query))
-                conn.commit()
-                print(f"Successfully created relationship: {child_table}.{column_name} -> {parent_table}.{column_name}")
+            conn.execute(text(create_fk_query), {'child_table': child_table, 'parent_table': parent_table})
+            conn.commit()
+            print(f"Successfully created relationship: {child_table}.{column_name} -> {parent_table}.{column_name}")
         except Exception as e:
+            conn.rollback()
             print(f"Error creating relationship {rel}: {str(e)}")
 
 def main():
@@ -177,8 +207,9 @@ def main():
     # Create engine for the target database
     engine = get_db_connection()
     
-    # Get all tables in the database
+    # One connection is shared by the whole scan instead of a pool checkout per query
     with engine.connect() as conn:
+        # Get all tables in the database
         result = conn.execute(text("""
             SELECT TABLE_NAME 
             FROM INFORMATION_SCHEMA.TABLES 
@@ -186,14 +217,14 @@ def main():
         """))
         tables = [row[0] for row in result]
     
-    # Find and create foreign key relationships
-    relationships = find_foreign_key_relationships(engine, tables)
-    if relationships:
-        print(f"Found {len(relationships)} potential foreign key relationships")
-        create_foreign_keys(engine, relationships)
-        print("Foreign key creation completed")
-    else:
-        print("No potential foreign key relationships found")
+        # Find and create foreign key relationships on the same connection
+        relationships = find_foreign_key_relationships(conn, tables)
+        if relationships:
+            print(f"Found {len(relationships)} potential foreign key relationships")
+            create_foreign_keys(conn, relationships)
+            print("Foreign key creation completed")
+        else:
+            print("No potential foreign key relationships found")
 
 if __name__ == "__main__":
     main()
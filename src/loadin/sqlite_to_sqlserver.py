@@ -3,11 +3,21 @@ import sys
 import zipfile
 import sqlite3
 import pandas as pd
-from sqlalchemy import text
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sqlalchemy import BigInteger, Float, LargeBinary, Text, text
 from time import sleep
 from tqdm import tqdm
 from common.db_utils import get_db_connection
 
+# Rows read from SQLite and held in memory at a time while transferring a table
+READ_CHUNK_SIZE = 50000
+# SQLite storage classes in order of precedence when a column mixes them, and the
+# SQL Server column type each one maps to
+SQLITE_STORAGE_CLASSES = ("text", "real", "integer", "blob")
+SQLITE_COLUMN_TYPES = (Text, Float, BigInteger, LargeBinary)
+# Tables transferred concurrently; bounded by the engine's pool of 8 connections
+TRANSFER_WORKERS = int(os.getenv("TRANSFER_WORKERS", 8))
+
 def extract_sqlite_file():
     """Extract the SQLite database from zip file"""
     zip_path = 'data/olist.sqlite.zip'
@@ -43,8 +53,8 @@ def get_sqlite_tables(sqlite_path):
         print(f"Error accessing SQLite database: {e}")
         raise
 
-def wait_for_sql_server(engine, max_attempts=30, delay=2):
-    """Wait for SQL Server to be ready"""
+def wait_for_sql_server(engine, max_attempts=30, delay=0.25, max_delay=10.0):
+    """Wait for SQL Server to be ready, polling quickly at first and backing off exponentially"""
     print("Waiting for SQL Server to be ready...")
     for attempt in range(max_attempts):
         try:
@@ -54,12 +64,100 @@ def wait_for_sql_server(engine, max_attempts=30, delay=2):
                 return True
         except Exception as e:
             if attempt < max_attempts - 1:
-                print(f"Attempt {attempt + 1}/{max_attempts}: SQL Server not ready yet. Waiting {delay} seconds...")
+                print(f"Attempt {attempt + 1}/{max_attempts}: SQL Server not ready yet. Waiting {delay:.2f} seconds...")
                 sleep(delay)
+                delay = min(delay * 1.8, max_delay)
             else:
                 print(f"Could not connect to SQL Server after {max_attempts} attempts: {e}")
                 return False
 
+def get_column_types(sqlite_conn, table):
+    """Get a SQLAlchemy type per column from the SQLite storage classes found across all of its rows
+    
+    One aggregate query scans the whole table without holding rows in memory. A column
+    holding any text is TEXT, otherwise any real makes it FLOAT (as pandas would widen
+    mixed ints and floats), then BIGINT and binary; all-NULL columns become TEXT, as to_sql
+    creates them. Unlike pandas, integer columns with NULLs stay BIGINT rather than FLOAT.
+    """
+    columns = [row[1] for row in sqlite_conn.execute(f"PRAGMA table_info([{table}])")]
+    checks = ", ".join(
+        f"MAX(typeof([{column}]) = '{storage_class}')"
+        for column in columns for storage_class in SQLITE_STORAGE_CLASSES
+    )
+    flags = sqlite_conn.execute(f"SELECT {checks} FROM [{table}]").fetchone()
+    
+    column_types = {}
+    for i, column in enumerate(columns):
+        found = flags[i * len(SQLITE_STORAGE_CLASSES):(i + 1) * len(SQLITE_STORAGE_CLASSES)]
+        column_types[column] = next(
+            (sql_type for storage_class_found, sql_type in zip(found, SQLITE_COLUMN_TYPES) if storage_class_found),
+            Text
+        )
+    return column_types
+
+def create_target_table(sqlite_conn, engine, table):
+    """(Re)create an empty SQL Server table with types derived from every row of the SQLite table"""
+    column_types = get_column_types(sqlite_conn, table)
+    pd.DataFrame(columns=list(column_types)).to_sql(
+        name=table, con=engine, if_exists='replace', index=False, dtype=column_types
+    )
+
+def transfer_table_chunked(sqlite_conn, engine, table):
+    """Copy a table by forwarding SQLite rows in chunks straight to a pyodbc executemany
+    
+    Only the table schema goes through pandas; the rows themselves skip DataFrame
+    construction and dtype inference, and memory holds one chunk at a time.
+    
+    Returns:
+        int: Number of rows transferred
+    """
+    create_target_table(sqlite_conn, engine, table)
+    
+    source = sqlite_conn.execute(f"SELECT * FROM [{table}]")
+    columns = [description[0] for description in source.description]
+    insert_sql = (
+        f"INSERT INTO [{table}] ({', '.join(f'[{column}]' for column in columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    
+    rows = 0
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+        # Bind each chunk as one parameter array rather than one round trip per row
+        cursor.fast_executemany = True
+        while batch := source.fetchmany(READ_CHUNK_SIZE):
+            cursor.executemany(insert_sql, batch)
+            rows += len(batch)
+        raw_conn.commit()
+    finally:
+        raw_conn.close()
+    return rows
+
+def transfer_table(sqlite_path, engine, table):
+    """Transfer one table on its own SQLite connection, which cannot be shared across threads
+    
+    Returns:
+        int: Number of rows transferred
+    """
+    try:
+        sqlite_conn = sqlite3.connect(sqlite_path)
+    except sqlite3.Error as e:
+        print(f"Error connecting to SQLite database: {e}")
+        raise
+    
+    try:
+        tqdm.write(f"Starting transfer of table: {table}")
+        
+        rows = transfer_table_chunked(sqlite_conn, engine, table)
+        tqdm.write(f"Completed transfer of table: {table} ({rows} rows)")
+        return rows
+    except Exception as e:
+        tqdm.write(f"Error transferring table {table}: {e}")
+        raise
+    finally:
+        sqlite_conn.close()
+
 def transfer_data(sqlite_path):
     """Transfer all tables from SQLite to SQL Server"""
     target_db = 'olist'
@@ -85,39 +183,23 @@ def transfer_data(sqlite_path):
     # Now connect to our target database
     engine = get_db_connection(database=target_db)
     
-    # Connect to SQLite
-    try:
-        sqlite_conn = sqlite3.connect(sqlite_path)
-    except sqlite3.Error as e:
-        print(f"Error connecting to SQLite database: {e}")
-        raise
-    
     # Get all tables
     tables = get_sqlite_tables(sqlite_path)
     
+    # Tables are independent and each transfer mostly waits on the database drivers,
+    # so several run at once on worker threads
     print(f"Found {len(tables)} tables to transfer")
-    for table in tqdm(tables, desc="Transferring tables", unit="table"):
+    with ThreadPoolExecutor(max_workers=max(1, min(TRANSFER_WORKERS, len(tables)))) as executor:
+        futures = [executor.submit(transfer_table, sqlite_path, engine, table) for table in tables]
         try:
-            tqdm.write(f"Starting transfer of table: {table}")
-            
-            # Read data from SQLite
-            df = pd.read_sql_query(f"SELECT * FROM {table}", sqlite_conn)
-            tqdm.write(f"Read {len(df)} rows from {table}")
-            
-            # Write to SQL Server
-            df.to_sql(
-                name=table,
-                con=engine,
-                if_exists='replace',
-                index=False,
-                chunksize=1000
-            )
-            tqdm.write(f"Completed transfer of table: {table}")
-        except Exception as e:
-            tqdm.write(f"Error transferring table {table}: {e}")
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Transferring tables", unit="table"):
+                future.result()
+        except Exception:
+            # Don't start the remaining tables once one has failed
+            for future in futures:
+                future.cancel()
             raise
     
-    sqlite_conn.close()
     print("Data transfer completed successfully!")
 
 def main():
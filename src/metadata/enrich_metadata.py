@@ -1,34 +1,98 @@
 import os
 import re
+import json
+import asyncio
+import argparse
+from collections import defaultdict
 from sqlalchemy import text
 from common.db_utils import get_db_connection
+from common.llm_cache import get_response_cache, make_cache_key
+from common.llm_utils import create_chat_completion, get_async_client, get_retry_statistics
 from metadata.get_database_ddl import get_database_ddl
-from openai import OpenAI
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-def get_table_columns(engine, table_name: str) -> List[Tuple[str, str, bool]]:
-    """Get columns and their data types for a table"""
+# Maximum number of column descriptions generated concurrently; requests are further capped
+# process-wide at OPENAI_CONCURRENCY (common.llm_utils, default 8), so raise that as well to
+# go above it
+ENRICHMENT_CONCURRENCY = int(os.getenv("ENRICHMENT_CONCURRENCY", 20))
+# Seconds between status checks while waiting for a Batch API job
+BATCH_POLL_INTERVAL = int(os.getenv("BATCH_POLL_INTERVAL", 60))
+# Maximum columns of one table described by a single request
+TABLE_DESCRIPTION_COLUMNS = int(os.getenv("TABLE_DESCRIPTION_COLUMNS", 25))
+# Existing descriptions at least this long are kept as they are, without asking the LLM
+SUFFICIENT_DESCRIPTION_LENGTH = int(os.getenv("SUFFICIENT_DESCRIPTION_LENGTH", 80))
+# Seconds a generated description is reused for an unchanged column before it is regenerated
+DESCRIPTION_CACHE_TTL = float(os.getenv("DESCRIPTION_CACHE_TTL", 30 * 24 * 3600))
+
+DESCRIPTION_MODEL = "gpt-4o-mini"
+# Stands in for the table name in a description shared by same-named columns of several tables
+TABLE_PLACEHOLDER = "{table_name}"
+DESCRIPTION_SYSTEM_PROMPT = "You are a database expert who specializes in documenting database schemas with clear, concise, and business-focused descriptions."
+
+# Update or add a column's MS_Description property, prepared once and run for every updated column
+UPDATE_DESCRIPTION_SQL = text("""
+DECLARE @ObjectId INT = OBJECT_ID(:table_name);
+IF EXISTS (
+    SELECT 1 FROM sys.extended_properties 
+    WHERE major_id = @ObjectId
+    AND minor_id = (
+        SELECT column_id 
+        FROM sys.columns 
+        WHERE object_id = @ObjectId 
+        AND name = :column_name
+    )
+    AND name = 'MS_Description'
+)
+BEGIN
+    EXEC sys.sp_updateextendedproperty 
+        @name = N'MS_Description',
+        @value = :description,
+        @level0type = N'SCHEMA',
+        @level0name = N'dbo',
+        @level1type = N'TABLE',
+        @level1name = :table_name,
+        @level2type = N'COLUMN',
+        @level2name = :column_name
+END
+ELSE
+BEGIN
+    EXEC sys.sp_addextendedproperty 
+        @name = N'MS_Description',
+        @value = :description,
+        @level0type = N'SCHEMA',
+        @level0name = N'dbo',
+        @level1type = N'TABLE',
+        @level1name = :table_name,
+        @level2type = N'COLUMN',
+        @level2name = :column_name
+END
+""")
+
+def get_all_columns(conn) -> Dict[str, List[Tuple[str, str, bool, str]]]:
+    """Get the columns, data types and current descriptions of every table, grouped by table"""
     query = """
     SELECT 
+        tb.name as table_name,
         c.name,
         t.name as data_type,
         c.is_nullable,
         COALESCE(ep.value, '') as description
-    FROM sys.columns c
+    FROM sys.tables tb
+    JOIN sys.columns c ON c.object_id = tb.object_id
     JOIN sys.types t ON c.user_type_id = t.user_type_id
     LEFT JOIN sys.extended_properties ep ON 
         ep.major_id = c.object_id 
         AND ep.minor_id = c.column_id 
         AND ep.name = 'MS_Description'
-    WHERE c.object_id = OBJECT_ID(:table_name)
-    ORDER BY c.column_id
+    ORDER BY tb.name, c.column_id
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchall()
-        return [(row[0], row[1], row[2], row[3]) for row in result]
+    columns_by_table = defaultdict(list)
+    for row in conn.execute(text(query)):
+        columns_by_table[row[0]].append((row[1], row[2], row[3], row[4]))
+    return columns_by_table
 
-def get_foreign_key_info(engine, table_name: str) -> List[Dict]:
-    """Get foreign key relationships for a table"""
+def get_all_foreign_keys(conn) -> Dict[str, List[Dict]]:
+    """Get the foreign key relationships of every table, grouped by both the parent and the referenced table"""
     query = """
     SELECT 
         fk.name as fk_name,
@@ -38,43 +102,47 @@ def get_foreign_key_info(engine, table_name: str) -> List[Dict]:
         COL_NAME(fkc.referenced_object_id, fkc.referenced_column_id) as referenced_column
     FROM sys.foreign_keys fk
     JOIN sys.foreign_key_columns fkc ON fk.object_id = fkc.constraint_object_id
-    WHERE OBJECT_NAME(fk.parent_object_id) = :table_name
-        OR OBJECT_NAME(fk.referenced_object_id) = :table_name
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchall()
-        return [
-            {
-                "fk_name": row[0],
-                "parent_table": row[1],
-                "parent_column": row[2],
-                "referenced_table": row[3],
-                "referenced_column": row[4]
-            }
-            for row in result
-        ]
+    fks_by_table = defaultdict(list)
+    for row in conn.execute(text(query)):
+        fk = {
+            "fk_name": row[0],
+            "parent_table": row[1],
+            "parent_column": row[2],
+            "referenced_table": row[3],
+            "referenced_column": row[4]
+        }
+        fks_by_table[fk["parent_table"]].append(fk)
+        # A self-referencing key is listed once for its table
+        if fk["referenced_table"] != fk["parent_table"]:
+            fks_by_table[fk["referenced_table"]].append(fk)
+    return fks_by_table
+
+def _fk_context(table_name: str, column_name: str, fk_info: List[Dict]) -> List[str]:
+    """Describe the foreign key relationships of a column, one sentence per relationship"""
+    fk_context = []
+    for fk in fk_info:
+        if fk["parent_table"] == table_name and fk["parent_column"] == column_name:
+            fk_context.append(f"This column is a foreign key referencing {fk['referenced_table']}.{fk['referenced_column']}")
+        elif fk["referenced_table"] == table_name and fk["referenced_column"] == column_name:
+            fk_context.append(f"This column is referenced by {fk['parent_table']}.{fk['parent_column']}")
+    return fk_context
 
-def generate_column_description(
+def build_description_request(
     table_name: str,
     column_name: str,
     data_type: str,
     is_nullable: bool,
     fk_info: List[Dict],
     existing_description: str
-) -> str:
-    """Generate detailed column description using OpenAI"""
+) -> Dict:
+    """Build the chat completion parameters for describing a column"""
     
     # Build context about foreign key relationships
-    fk_context = []
-    for fk in fk_info:
-        if fk["parent_table"] == table_name and fk["parent_column"] == column_name:
-            fk_context.append(f"This column is a foreign key referencing {fk['referenced_table']}.{fk['referenced_column']}")
-        elif fk["referenced_table"] == table_name and fk["referenced_column"] == column_name:
-            fk_context.append(f"This column is referenced by {fk['parent_table']}.{fk['parent_column']}")
-    
+    fk_context = _fk_context(table_name, column_name, fk_info)
     fk_context_str = "\n".join(fk_context) if fk_context else "This column has no foreign key relationships."
     
-    prompt = f"""Analyze this database column and provide a detailed business description:
+    prompt = f"""Analyze this database column and provide a business description:
 
 Table: {table_name}
 Column: {column_name}
@@ -84,79 +152,332 @@ Foreign Key Information:
 {fk_context_str}
 Existing Description: {existing_description if existing_description else 'None'}
 
-Please provide a comprehensive description that covers:
-1. The business purpose and meaning of this column
-2. Its relationship to the overall table entity
-3. How it connects to other tables (if applicable)
-4. Any business rules or constraints implied by its data type and nullability
-5. Typical use cases for this column in business analysis
+Return a single 40-60 word paragraph covering the column's purpose, relationships, and typical use, suitable for a SQL column description."""
+    if table_name == TABLE_PLACEHOLDER:
+        prompt += f"\nThis column appears in several tables; refer to its table only as {TABLE_PLACEHOLDER}."
 
-Format the response as a concise paragraph suitable for a SQL column description."""
+    return {
+        "model": DESCRIPTION_MODEL,
+        "messages": [
+            {"role": "system", "content": DESCRIPTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        # Output tokens dominate latency; 60 words fit well within 120 tokens
+        "temperature": 0.3,
+        "max_tokens": 120
+    }
 
+def description_template_job(job: Tuple) -> Optional[Tuple]:
+    """
+    Get the table-independent version of an undescribed column's job, or None.
+    
+    Columns with the same name, data type, nullability and relationships (for example
+    a CreatedDate in every table) produce the same template job, so one generated
+    description can be shared by all of them with the table name substituted in.
+    """
+    table_name, column_name, data_type, is_nullable, fk_info, existing_description = job
+    if existing_description:
+        return None
+    
+    def generic(name: str) -> str:
+        return TABLE_PLACEHOLDER if name == table_name else name
+    
+    # Keep only this column's relationships, the rest of the table's do not enter the prompt
+    fk_info = [
+        {**fk, "parent_table": generic(fk["parent_table"]), "referenced_table": generic(fk["referenced_table"])}
+        for fk in fk_info
+        if (fk["parent_table"], fk["parent_column"]) == (table_name, column_name)
+        or (fk["referenced_table"], fk["referenced_column"]) == (table_name, column_name)
+    ]
+    return (TABLE_PLACEHOLDER, column_name, data_type, is_nullable, fk_info, "")
+
+def build_table_description_request(jobs: List[Tuple]) -> Dict:
+    """Build the chat completion parameters for describing several columns of one table as a JSON object"""
+    table_name = jobs[0][0]
+    column_lines = []
+    for _, column_name, data_type, is_nullable, fk_info, existing_description in jobs:
+        details = [data_type, "NULL" if is_nullable else "NOT NULL"] + _fk_context(table_name, column_name, fk_info)
+        column_lines.append(f"- {column_name}: {'; '.join(details)}")
+        if existing_description:
+            column_lines.append(f"  Existing Description: {existing_description}")
+    columns_str = "\n".join(column_lines)
+    
+    prompt = f"""Analyze these columns of a database table and provide a business description of each:
+
+Table: {table_name}
+Columns:
+{columns_str}
+
+For each column, write a single 40-60 word paragraph covering its purpose, relationships, and typical use, suitable for a SQL column description. Return a JSON object mapping each column name to its description."""
+
+    column_names = [job[1] for job in jobs]
+    return {
+        "model": DESCRIPTION_MODEL,
+        "messages": [
+            {"role": "system", "content": DESCRIPTION_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 120 * len(jobs),
+        # Strict structured output guarantees exactly one description per requested column
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "column_descriptions",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {name: {"type": "string"} for name in column_names},
+                    "required": column_names,
+                    "additionalProperties": False
+                }
+            }
+        }
+    }
+
+def pack_jobs(jobs: List[Tuple]) -> List[List[int]]:
+    """
+    Group jobs into requests: up to TABLE_DESCRIPTION_COLUMNS columns of the same table
+    share one request, while template jobs (see description_template_job) stay alone.
+    
+    Returns:
+        List[List[int]]: Indices into jobs, one list per request
+    """
+    packs = []
+    by_table = defaultdict(list)
+    for i, job in enumerate(jobs):
+        if job[0] == TABLE_PLACEHOLDER:
+            packs.append([i])
+        else:
+            by_table[job[0]].append(i)
+    for indices in by_table.values():
+        packs.extend(indices[start:start + TABLE_DESCRIPTION_COLUMNS] for start in range(0, len(indices), TABLE_DESCRIPTION_COLUMNS))
+    return packs
+
+def build_pack_request(jobs: List[Tuple]) -> Dict:
+    """Build the chat completion parameters for a pack of jobs"""
+    if len(jobs) == 1:
+        return build_description_request(*jobs[0])
+    return build_table_description_request(jobs)
+
+def parse_pack_response(jobs: List[Tuple], content: Optional[str]) -> List[Optional[str]]:
+    """Extract one description per job from a pack's response content, None where missing"""
+    if content is None:
+        return [None] * len(jobs)
+    if len(jobs) == 1:
+        return [content.strip() or None]
     try:
-        client = OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a database expert who specializes in documenting database schemas with clear, concise, and business-focused descriptions."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=300
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print(f"Error generating description for {table_name}.{column_name}: {str(e)}")
-        return existing_description if existing_description else ""
+        descriptions = json.loads(content)
+    except json.JSONDecodeError:
+        return [None] * len(jobs)
+    return [(descriptions.get(job[1]) or "").strip() or None for job in jobs]
 
-def update_column_description(engine, table_name: str, column_name: str, description: str):
-    """Update or add extended property for column description"""
-    query = """
-    IF EXISTS (
-        SELECT 1 FROM sys.extended_properties 
-        WHERE major_id = OBJECT_ID(:table_name)
-        AND minor_id = (
-            SELECT column_id 
-            FROM sys.columns 
-            WHERE object_id = OBJECT_ID(:table_name) 
-            AND name = :column_name
-        )
-        AND name = 'MS_Description'
+def _pack_label(jobs: List[Tuple]) -> str:
+    """Name a pack of jobs in log messages"""
+    if len(jobs) == 1:
+        return f"{jobs[0][0]}.{jobs[0][1]}"
+    return f"{len(jobs)} columns of {jobs[0][0]}"
+
+def _finish_description(job: Tuple, description: Optional[str]) -> str:
+    """Cache a generated description, or fall back to the existing one (the last job argument)"""
+    if description is None:
+        return job[-1] or ""
+    cache_description(*job, description)
+    return description
+
+def _description_cache_key(table_name: str, column_name: str, data_type: str, is_nullable: bool, fk_info: List[Dict]) -> str:
+    """Cache key covering the model, prompt and column facts, but not the existing description"""
+    return make_cache_key("column_description", build_description_request(
+        table_name, column_name, data_type, is_nullable, fk_info, ""
+    ))
+
+def get_cached_description(
+    table_name: str,
+    column_name: str,
+    data_type: str,
+    is_nullable: bool,
+    fk_info: List[Dict],
+    existing_description: str
+) -> Optional[str]:
+    """
+    Return the previously generated description of an unchanged column, or None.
+    
+    The existing description is part of the prompt, but after a run it is the generated
+    description itself, so a hit also requires the stored description to be either the
+    one given to the last generation or the one it produced (i.e. not edited since).
+    """
+    cached = get_response_cache().get(
+        _description_cache_key(table_name, column_name, data_type, is_nullable, fk_info),
+        max_age=DESCRIPTION_CACHE_TTL
     )
-    BEGIN
-        EXEC sys.sp_updateextendedproperty 
-            @name = N'MS_Description',
-            @value = :description,
-            @level0type = N'SCHEMA',
-            @level0name = N'dbo',
-            @level1type = N'TABLE',
-            @level1name = :table_name,
-            @level2type = N'COLUMN',
-            @level2name = :column_name
-    END
-    ELSE
-    BEGIN
-        EXEC sys.sp_addextendedproperty 
-            @name = N'MS_Description',
-            @value = :description,
-            @level0type = N'SCHEMA',
-            @level0name = N'dbo',
-            @level1type = N'TABLE',
-            @level1name = :table_name,
-            @level2type = N'COLUMN',
-            @level2name = :column_name
-    END
+    if cached is None:
+        return None
+    entry = json.loads(cached)
+    if existing_description in (entry["existing_description"], entry["description"]):
+        return entry["description"]
+    return None
+
+def cache_description(table_name: str, column_name: str, data_type: str, is_nullable: bool,
+                      fk_info: List[Dict], existing_description: str, description: str):
+    """Store a generated description for get_cached_description"""
+    get_response_cache().set(
+        _description_cache_key(table_name, column_name, data_type, is_nullable, fk_info),
+        json.dumps({"existing_description": existing_description, "description": description})
+    )
+
+async def generate_column_description(
+    table_name: str,
+    column_name: str,
+    data_type: str,
+    is_nullable: bool,
+    fk_info: List[Dict],
+    existing_description: str
+) -> str:
+    """Generate detailed column description using OpenAI"""
+    job = (table_name, column_name, data_type, is_nullable, fk_info, existing_description)
+    return (await generate_table_descriptions([job]))[0]
+
+async def generate_table_descriptions(jobs: List[Tuple]) -> List[str]:
     """
-    with engine.connect() as conn:
-        conn.execute(text(query), {
-            "table_name": table_name,
-            "column_name": column_name,
-            "description": description
-        })
-        conn.commit()
+    Generate descriptions for columns of one table with a single OpenAI request.
+    
+    Packing a table's columns into one request amortizes the prompt preamble and the
+    per-request overhead over all of them. Columns whose description is missing from
+    the response, or whose request fails, keep their existing description.
+    
+    Args:
+        jobs (List[Tuple]): generate_column_description arguments of columns of the same table
+    
+    Returns:
+        List[str]: One description per job, in job order
+    """
+    try:
+        # The shared async client keeps its connection pool warm across the whole run, and
+        # rate limits, timeouts and 5xx errors are retried with backoff before reaching here
+        response = await create_chat_completion(**build_pack_request(jobs))
+        generated = parse_pack_response(jobs, response.choices[0].message.content)
+    except Exception as e:
+        print(f"Error generating description for {_pack_label(jobs)}: {str(e)}")
+        generated = [None] * len(jobs)
+    return [_finish_description(job, description) for job, description in zip(jobs, generated)]
+
+def update_column_description(conn, table_name: str, column_name: str, description: str):
+    """Update or add extended property for column description; the caller commits"""
+    update_column_descriptions(conn, [(table_name, column_name, description)])
+
+def update_column_descriptions(conn, rows: List[Tuple[str, str, str]]):
+    """
+    Update or add the description properties of many columns with one executemany call.
+    
+    Args:
+        conn: Open connection; the caller commits
+        rows (List[Tuple[str, str, str]]): (table_name, column_name, description) per column
+    """
+    if rows:
+        conn.execute(UPDATE_DESCRIPTION_SQL, [
+            {"table_name": table_name, "column_name": column_name, "description": description}
+            for table_name, column_name, description in rows
+        ])
+
+async def generate_column_descriptions(jobs: List[Tuple]) -> List[str]:
+    """
+    Generate descriptions for many columns concurrently, at most ENRICHMENT_CONCURRENCY requests
+    (and no more than OPENAI_CONCURRENCY) at a time, packing columns of the same table into
+    shared requests.
+    
+    Args:
+        jobs (List[Tuple]): generate_column_description arguments, one tuple per column
+    
+    Returns:
+        List[str]: One description per job, in job order
+    """
+    semaphore = asyncio.Semaphore(ENRICHMENT_CONCURRENCY)
+    packs = pack_jobs(jobs)
+    
+    async def describe(indices: List[int]) -> List[str]:
+        pack = [jobs[i] for i in indices]
+        async with semaphore:
+            generated = await generate_table_descriptions(pack)
+        print(f"  Generated descriptions for: {_pack_label(pack)}")
+        return generated
+    
+    descriptions = [""] * len(jobs)
+    for indices, generated in zip(packs, await asyncio.gather(*(describe(indices) for indices in packs))):
+        for i, description in zip(indices, generated):
+            descriptions[i] = description
+    return descriptions
 
-def enrich_metadata():
-    """Main function to enrich database metadata with column descriptions"""
+async def generate_column_descriptions_batch(jobs: List[Tuple], path: str = "enrich_metadata_batch.jsonl") -> List[str]:
+    """
+    Generate descriptions for many columns with one OpenAI Batch API job.
+    
+    Batch requests cost half as much as live requests and are not subject to the
+    per-minute rate limits, at the price of waiting (up to 24h) for the job to finish.
+    Columns whose request fails keep their existing description.
+    
+    Args:
+        jobs (List[Tuple]): generate_column_description arguments, one tuple per column
+        path (str): Where to write the batch input file
+    
+    Returns:
+        List[str]: One description per job, in job order
+    """
+    client = get_async_client()
+    pack_indices = pack_jobs(jobs)
+    packs = [[jobs[i] for i in indices] for indices in pack_indices]
+    # Template jobs of different columns can share table and column names, so ids include the pack index
+    custom_ids = [f"{n}:{_pack_label(pack)}" for n, pack in enumerate(packs)]
+    with open(path, "w") as f:
+        for custom_id, pack in zip(custom_ids, packs):
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": build_pack_request(pack)
+            }) + "\n")
+    
+    with open(path, "rb") as f:
+        batch_file = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"Submitted description batch {batch.id} with {len(packs)} requests")
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+        print(f"  Batch {batch.id}: {batch.status} ({batch.request_counts.completed}/{batch.request_counts.total} requests done)")
+    if batch.status != "completed":
+        raise RuntimeError(f"Batch {batch.id} did not complete (status: {batch.status})")
+    
+    results = {}
+    if batch.output_file_id:
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            item = json.loads(line)
+            response = item.get("response")
+            if item.get("error") or not response or response["status_code"] != 200:
+                print(f"Error generating description for {item['custom_id']}: {item.get('error') or response}")
+                continue
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    
+    descriptions = [""] * len(jobs)
+    for custom_id, indices, pack in zip(custom_ids, pack_indices, packs):
+        for i, description in zip(indices, parse_pack_response(pack, results.get(custom_id))):
+            descriptions[i] = _finish_description(jobs[i], description)
+    return descriptions
+
+def enrich_metadata(use_batch: bool = False, force: bool = False):
+    """
+    Main function to enrich database metadata with column descriptions
+    
+    Args:
+        use_batch (bool): Generate the descriptions with the OpenAI Batch API instead of
+            live requests; half the cost, but waits for the batch job to finish
+        force (bool): Regenerate every description, ignoring cached and existing ones
+    """
     # Ensure OpenAI API key is set
     if not os.getenv("OPENAI_API_KEY"):
         raise ValueError("OPENAI_API_KEY environment variable must be set")
@@ -171,37 +492,86 @@ def enrich_metadata():
     ORDER BY TABLE_NAME
     """
     
+    # Read the tables, columns and foreign keys over one connection; it is released
+    # before generation so no session sits idle while waiting on OpenAI
     with engine.connect() as conn:
-        tables = [row[0] for row in conn.execute(text(table_query)).fetchall()]
+        tables = conn.execute(text(table_query)).scalars().all()
+        
+        # Fetch the columns and foreign keys of the whole database in two queries
+        columns_by_table = get_all_columns(conn)
+        fks_by_table = get_all_foreign_keys(conn)
     
-    # Process each table
+    # Collect every column of every table first, so descriptions for the whole
+    # database can be generated concurrently
+    jobs = []
+    sufficient = 0
     for table_name in tables:
         print(f"\nProcessing table: {table_name}")
         
-        # Get foreign key information for context
-        fk_info = get_foreign_key_info(engine, table_name)
-        
-        # Get columns and their current metadata
-        columns = get_table_columns(engine, table_name)
+        # Foreign key information for context
+        fk_info = fks_by_table.get(table_name, [])
         
-        # Process each column
-        for column_name, data_type, is_nullable, existing_description in columns:
-            print(f"  Generating description for column: {column_name}")
-            
-            # Generate enhanced description
-            description = generate_column_description(
-                table_name,
-                column_name,
-                data_type,
-                is_nullable,
-                fk_info,
-                existing_description
-            )
-            
-            # Update the column description in the database
-            if description:
-                update_column_description(engine, table_name, column_name, description)
-                print(f"    Updated description for {column_name}")
+        # Columns and their current metadata
+        for column_name, data_type, is_nullable, existing_description in columns_by_table.get(table_name, []):
+            # Skip columns that are already well described; cheaper than any cache
+            if not force and len(existing_description) >= SUFFICIENT_DESCRIPTION_LENGTH:
+                sufficient += 1
+                continue
+            jobs.append((table_name, column_name, data_type, is_nullable, fk_info, existing_description))
+    print(f"\nKeeping {sufficient} existing descriptions of at least {SUFFICIENT_DESCRIPTION_LENGTH} characters")
+    
+    # Reuse descriptions generated for unchanged columns by earlier runs
+    descriptions = {}
+    if not force:
+        for job in jobs:
+            cached = get_cached_description(*job)
+            if cached is not None:
+                descriptions[job[:2]] = cached
+    pending = [job for job in jobs if job[:2] not in descriptions]
+    
+    # Undescribed columns with identical templates share one request
+    groups = defaultdict(list)
+    for job in pending:
+        template = description_template_job(job)
+        key = make_cache_key(build_description_request(*template)) if template else job[:2]
+        groups[key].append((job, template))
+    requests = [members[0][1] if len(members) > 1 else members[0][0] for members in groups.values()]
+    
+    # Generate enhanced descriptions
+    print(f"\nGenerating descriptions for {len(pending)} columns ({len(requests)} distinct, {len(descriptions)} cached)")
+    if requests:
+        if use_batch:
+            generated = asyncio.run(generate_column_descriptions_batch(requests))
+        else:
+            generated = asyncio.run(generate_column_descriptions(requests))
+            # Retries show how close the run is to the account's rate limits
+            print(f"OpenAI retry statistics: {get_retry_statistics()}")
+        for members, description in zip(groups.values(), generated):
+            if len(members) == 1:
+                descriptions[members[0][0][:2]] = description
+                continue
+            for job, _ in members:
+                column_description = description.replace(TABLE_PLACEHOLDER, job[0])
+                descriptions[job[:2]] = column_description
+                if column_description:
+                    cache_description(*job, column_description)
+    
+    # Update the column descriptions in the database in one transaction, skipping ones that are unchanged
+    updates = []
+    for table_name, column_name, _, _, _, existing_description in jobs:
+        description = descriptions[(table_name, column_name)]
+        if description and description != existing_description:
+            updates.append((table_name, column_name, description))
+    with engine.connect() as conn:
+        update_column_descriptions(conn, updates)
+        conn.commit()
+    print(f"\nUpdated {len(updates)} column descriptions")
 
 if __name__ == "__main__":
-    enrich_metadata()
+    parser = argparse.ArgumentParser(description="Generate column descriptions and store them as MS_Description properties")
+    parser.add_argument("--batch", action="store_true",
+                        help="Use the OpenAI Batch API (half the cost, results can take up to 24h)")
+    parser.add_argument("--force", action="store_true",
+                        help="Regenerate all descriptions instead of keeping existing ones or reusing cached ones for unchanged columns")
+    args = parser.parse_args()
+    enrich_metadata(use_batch=args.batch, force=args.force)
@@ -3,118 +3,120 @@ This module provides functions to generate DDL (Data Definition Language) script
 for SQL Server database objects.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import attrgetter
 from sqlalchemy import text
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from common.db_utils import get_db_connection
 
-def get_table_ddl(engine, table_name):
-    """Get the DDL for a specific table"""
+# Tables whose DDL is read in parallel, each over its own pooled connection
+DDL_WORKERS = int(os.getenv("DDL_WORKERS", 8))
+
+def get_table_ddl(conn, table_name, object_id):
+    """Get the DDL for a specific table, given its name and object_id"""
     query = """
     DECLARE @TableName NVARCHAR(128) = :table_name;
-    DECLARE @Result NVARCHAR(MAX) = '';
-    
-    -- Get column definitions
-    SELECT @Result = 'CREATE TABLE ' + QUOTENAME(OBJECT_SCHEMA_NAME(OBJECT_ID(@TableName))) + '.' + QUOTENAME(@TableName) + ' ('
-    
-    -- Add columns
-    SELECT @Result = @Result + CHAR(13) + CHAR(10) + 
-        '    ' + QUOTENAME(c.name) + ' ' + 
-        CASE WHEN t.name IN ('char', 'varchar', 'nchar', 'nvarchar') 
-            THEN t.name + '(' + 
-                CASE WHEN c.max_length = -1 
-                    THEN 'MAX'
-                    ELSE CAST(CASE WHEN t.name LIKE 'n%' 
-                        THEN c.max_length/2 
-                        ELSE c.max_length END AS VARCHAR(10))
-                END + ')'
-            WHEN t.name IN ('decimal', 'numeric')
-                THEN t.name + '(' + CAST(c.precision AS VARCHAR(10)) + ',' + CAST(c.scale AS VARCHAR(10)) + ')'
-            ELSE t.name
-        END + ' ' +
-        CASE WHEN c.is_nullable = 1 THEN 'NULL' ELSE 'NOT NULL' END + ','
-    FROM sys.columns c
-    JOIN sys.types t ON c.user_type_id = t.user_type_id
-    WHERE c.object_id = OBJECT_ID(@TableName)
-    ORDER BY c.column_id;
-    
-    -- Add primary key constraint if exists
-    SELECT @Result = @Result + CHAR(13) + CHAR(10) + 
-        '    CONSTRAINT ' + QUOTENAME(i.name) + ' PRIMARY KEY ' +
-        CASE WHEN i.type = 1 THEN 'CLUSTERED' ELSE 'NONCLUSTERED' END +
-        ' (' +
-        (SELECT STUFF((
-            SELECT ', ' + QUOTENAME(c.name) + 
-                   CASE WHEN ic.is_descending_key = 1 
-                        THEN ' DESC'
-                        ELSE ' ASC'
-                   END
-            FROM sys.index_columns ic
-            JOIN sys.columns c ON ic.object_id = c.object_id 
-                AND ic.column_id = c.column_id
-            WHERE ic.object_id = i.object_id 
-                AND ic.index_id = i.index_id
-            ORDER BY ic.key_ordinal
-            FOR XML PATH('')), 1, 2, '')) + '),'
-    FROM sys.indexes i
-    WHERE i.object_id = OBJECT_ID(@TableName)
-        AND i.is_primary_key = 1;
+    DECLARE @ObjectId INT = :object_id;
+    DECLARE @Separator NVARCHAR(3) = ',' + CHAR(13) + CHAR(10);
     
-    -- Add unique constraints
-    SELECT @Result = @Result + CHAR(13) + CHAR(10) + 
-        '    CONSTRAINT ' + QUOTENAME(i.name) + ' UNIQUE ' +
-        CASE WHEN i.type = 1 THEN 'CLUSTERED' ELSE 'NONCLUSTERED' END +
-        ' (' +
-        (SELECT STUFF((
-            SELECT ', ' + QUOTENAME(c.name) + 
-                   CASE WHEN ic.is_descending_key = 1 
-                        THEN ' DESC'
-                        ELSE ' ASC'
-                   END
+    -- Build one line per column and constraint, then join them in a single set-based pass
+    SELECT 'CREATE TABLE ' + QUOTENAME(OBJECT_SCHEMA_NAME(@ObjectId)) + '.' + QUOTENAME(@TableName) + ' (' +
+        CHAR(13) + CHAR(10) +
+        STRING_AGG(CAST(lines.line AS NVARCHAR(MAX)), @Separator)
+            WITHIN GROUP (ORDER BY lines.section, lines.position) +
+        CHAR(13) + CHAR(10) + ');'
+    FROM (
+        -- Columns
+        SELECT 
+            0 AS section,
+            c.column_id AS position,
+            '    ' + QUOTENAME(c.name) + ' ' + 
+            CASE WHEN t.name IN ('char', 'varchar', 'nchar', 'nvarchar') 
+                THEN t.name + '(' + 
+                    CASE WHEN c.max_length = -1 
+                        THEN 'MAX'
+                        ELSE CAST(CASE WHEN t.name LIKE 'n%' 
+                            THEN c.max_length/2 
+                            ELSE c.max_length END AS VARCHAR(10))
+                    END + ')'
+                WHEN t.name IN ('decimal', 'numeric')
+                    THEN t.name + '(' + CAST(c.precision AS VARCHAR(10)) + ',' + CAST(c.scale AS VARCHAR(10)) + ')'
+                ELSE t.name
+            END + ' ' +
+            CASE WHEN c.is_nullable = 1 THEN 'NULL' ELSE 'NOT NULL' END AS line
+        FROM sys.columns c
+        JOIN sys.types t ON c.user_type_id = t.user_type_id
+        WHERE c.object_id = @ObjectId
+        
+        UNION ALL
+        
+        -- Primary key and unique constraints
+        SELECT 
+            CASE WHEN i.is_primary_key = 1 THEN 1 ELSE 2 END,
+            i.index_id,
+            '    CONSTRAINT ' + QUOTENAME(i.name) +
+            CASE WHEN i.is_primary_key = 1 THEN ' PRIMARY KEY ' ELSE ' UNIQUE ' END +
+            CASE WHEN i.type = 1 THEN 'CLUSTERED' ELSE 'NONCLUSTERED' END +
+            ' (' +
+            (SELECT STRING_AGG(QUOTENAME(c.name) + 
+                       CASE WHEN ic.is_descending_key = 1 
+                            THEN ' DESC'
+                            ELSE ' ASC'
+                       END, ', ') WITHIN GROUP (ORDER BY ic.key_ordinal)
             FROM sys.index_columns ic
             JOIN sys.columns c ON ic.object_id = c.object_id 
                 AND ic.column_id = c.column_id
             WHERE ic.object_id = i.object_id 
-                AND ic.index_id = i.index_id
-            ORDER BY ic.key_ordinal
-            FOR XML PATH('')), 1, 2, '')) + '),'
-    FROM sys.indexes i
-    WHERE i.object_id = OBJECT_ID(@TableName)
-        AND i.is_unique_constraint = 1;
-    
-    -- Remove the last comma and close the parentheses
-    SET @Result = LEFT(@Result, LEN(@Result) - 1) + CHAR(13) + CHAR(10) + ');'
-    
-    SELECT @Result;
+                AND ic.index_id = i.index_id) + ')'
+        FROM sys.indexes i
+        WHERE i.object_id = @ObjectId
+            AND (i.is_primary_key = 1 OR i.is_unique_constraint = 1)
+    ) AS lines;
     """
     ddl_parts = []
     
     # Get the table creation DDL
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchone()
-        if result and result[0]:
-            ddl_parts.append(result[0])
+    result = conn.execute(text(query), {"table_name": table_name, "object_id": object_id}).fetchone()
+    if result and result[0]:
+        ddl_parts.append(result[0])
     
     # Get and add column descriptions
-    descriptions = get_column_descriptions(engine, table_name)
+    descriptions = get_column_descriptions(conn, object_id)
     if descriptions:
         ddl_parts.append("\n-- Column Descriptions")
-        for column_name, description in descriptions:
-            # Escape single quotes in description
-            description = description.replace("'", "''")
-            ddl_parts.append(f"""EXEC sys.sp_addextendedproperty
-    @name = N'MS_Description',
-    @value = N'{description}',
-    @level0type = N'SCHEMA',
-    @level0name = N'dbo',
-    @level1type = N'TABLE',
-    @level1name = N'{table_name}',
-    @level2type = N'COLUMN',
-    @level2name = N'{column_name}';""")
+        ddl_parts.extend(iter_column_description_ddl(table_name, descriptions))
     
     return "\n".join(ddl_parts)
 
-def get_column_descriptions(engine, table_name):
-    """Get descriptions for all columns in a table"""
+def _nvarchar_literal(value: str) -> str:
+    """Quote a value as a T-SQL N'...' string literal"""
+    return "N'" + value.replace("'", "''") + "'"
+
+def iter_column_description_ddl(table_name: str, descriptions: List[Tuple[str, str]]) -> Iterator[str]:
+    """
+    Yield one sp_addextendedproperty statement per described column
+    
+    The DDL is read as script text (by the chat apps, as prompt context), so the
+    values are written as escaped literals; names are escaped the same way.
+    """
+    table_literal = _nvarchar_literal(table_name)
+    for column_name, description in descriptions:
+        yield (
+            "EXEC sys.sp_addextendedproperty\n"
+            "    @name = N'MS_Description',\n"
+            f"    @value = {_nvarchar_literal(description)},\n"
+            "    @level0type = N'SCHEMA',\n"
+            "    @level0name = N'dbo',\n"
+            "    @level1type = N'TABLE',\n"
+            f"    @level1name = {table_literal},\n"
+            "    @level2type = N'COLUMN',\n"
+            f"    @level2name = {_nvarchar_literal(column_name)};"
+        )
+
+def get_column_descriptions(conn, object_id):
+    """Get descriptions for all columns in a table, given its object_id"""
     query = """
     SELECT 
         c.name as column_name,
@@ -124,45 +126,40 @@ def get_column_descriptions(engine, table_name):
         ep.major_id = c.object_id 
         AND ep.minor_id = c.column_id 
         AND ep.name = 'MS_Description'
-    WHERE c.object_id = OBJECT_ID(:table_name)
+    WHERE c.object_id = :object_id
         AND ep.value IS NOT NULL
     ORDER BY c.column_id
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchall()
-        return [(row[0], row[1]) for row in result]
+    return [(row[0], row[1]) for row in conn.execute(text(query), {"object_id": object_id})]
 
-def get_foreign_key_ddl(engine, table_name):
-    """Get the DDL for foreign keys of a specific table"""
+def get_foreign_key_ddl(conn, object_id):
+    """Get the DDL for foreign keys of a specific table, given its object_id"""
     query = """
     SELECT 
         'ALTER TABLE ' + QUOTENAME(OBJECT_SCHEMA_NAME(parent_object_id)) + '.' + 
         QUOTENAME(OBJECT_NAME(parent_object_id)) + 
-        ' ADD CONSTRAINT ' + QUOTENAME(name) + ' FOREIGN KEY (' + 
-        (SELECT STUFF((
-            SELECT ', ' + QUOTENAME(COL_NAME(fc.parent_object_id, fc.parent_column_id))
-            FROM sys.foreign_key_columns fc
-            WHERE fc.constraint_object_id = fk.object_id
-            ORDER BY fc.constraint_column_id
-            FOR XML PATH('')), 1, 2, '')) + 
+        ' ADD CONSTRAINT ' + QUOTENAME(fk.name) + ' FOREIGN KEY (' + 
+        cols.parent_columns + 
         ') REFERENCES ' + QUOTENAME(OBJECT_SCHEMA_NAME(referenced_object_id)) + '.' + 
         QUOTENAME(OBJECT_NAME(referenced_object_id)) + ' (' + 
-        (SELECT STUFF((
-            SELECT ', ' + QUOTENAME(COL_NAME(fc.referenced_object_id, fc.referenced_column_id))
-            FROM sys.foreign_key_columns fc
-            WHERE fc.constraint_object_id = fk.object_id
-            ORDER BY fc.constraint_column_id
-            FOR XML PATH('')), 1, 2, '')) + 
+        cols.referenced_columns + 
         ');'
     FROM sys.foreign_keys fk
-    WHERE OBJECT_NAME(parent_object_id) = :table_name
+    CROSS APPLY (
+        SELECT
+            STRING_AGG(QUOTENAME(COL_NAME(fc.parent_object_id, fc.parent_column_id)), ', ')
+                WITHIN GROUP (ORDER BY fc.constraint_column_id) AS parent_columns,
+            STRING_AGG(QUOTENAME(COL_NAME(fc.referenced_object_id, fc.referenced_column_id)), ', ')
+                WITHIN GROUP (ORDER BY fc.constraint_column_id) AS referenced_columns
+        FROM sys.foreign_key_columns fc
+        WHERE fc.constraint_object_id = fk.object_id
+    ) cols
+    WHERE fk.parent_object_id = :object_id
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchall()
-        return '\n'.join([row[0] for row in result]) if result else ""
+    return '\n'.join(row[0] for row in conn.execute(text(query), {"object_id": object_id}))
 
-def get_index_ddl(engine, table_name):
-    """Get the DDL for indexes of a specific table"""
+def get_index_ddl(conn, object_id):
+    """Get the DDL for indexes of a specific table, given its object_id"""
     query = """
     SELECT
         'CREATE ' + 
@@ -170,75 +167,106 @@ def get_index_ddl(engine, table_name):
         'INDEX ' + QUOTENAME(i.name) + ' ON ' + 
         QUOTENAME(OBJECT_SCHEMA_NAME(i.object_id)) + '.' + 
         QUOTENAME(OBJECT_NAME(i.object_id)) + ' (' +
-        (SELECT STUFF((
-            SELECT ', ' + QUOTENAME(c.name) + 
+        (SELECT STRING_AGG(QUOTENAME(c.name) + 
                    CASE WHEN ic.is_descending_key = 1 
                         THEN ' DESC'
                         ELSE ' ASC'
-                   END
-            FROM sys.index_columns ic
-            JOIN sys.columns c ON ic.object_id = c.object_id 
-                AND ic.column_id = c.column_id
-            WHERE ic.object_id = i.object_id 
-                AND ic.index_id = i.index_id
-            ORDER BY ic.key_ordinal
-            FOR XML PATH('')), 1, 2, '')) + ');'
+                   END, ', ') WITHIN GROUP (ORDER BY ic.key_ordinal)
+        FROM sys.index_columns ic
+        JOIN sys.columns c ON ic.object_id = c.object_id 
+            AND ic.column_id = c.column_id
+        WHERE ic.object_id = i.object_id 
+            AND ic.index_id = i.index_id) + ');'
     FROM sys.indexes i
-    WHERE i.object_id = OBJECT_ID(:table_name)
+    WHERE i.object_id = :object_id
         AND i.type = 2  -- Non-clustered indexes only
         AND i.is_primary_key = 0
         AND i.is_unique_constraint = 0
     """
-    with engine.connect() as conn:
-        result = conn.execute(text(query), {"table_name": table_name}).fetchall()
-        return '\n'.join([row[0] for row in result]) if result else ""
+    return '\n'.join(row[0] for row in conn.execute(text(query), {"object_id": object_id}))
 
-def get_database_ddl():
+def iter_database_ddl() -> Iterator[str]:
     """
-    Generate DDL for the entire database
+    Generate DDL for the entire database, one fragment at a time
     
-    Returns:
-        str: Complete DDL script for the database
+    Fragments are produced as each table is read, so the script can be written out
+    or consumed without holding all of it in memory.
+    
+    Yields:
+        str: Successive fragments of the DDL script, to be joined with newlines
     """
     engine = get_db_connection()
-    ddl_parts = []
 
-    # Get all tables
+    # Get all tables with their object_id, so later queries need not resolve names
     table_query = """
-    SELECT TABLE_NAME
-    FROM INFORMATION_SCHEMA.TABLES
-    WHERE TABLE_TYPE = 'BASE TABLE'
-    ORDER BY TABLE_NAME
+    SELECT name, object_id
+    FROM sys.tables
+    ORDER BY name
     """
     
     with engine.connect() as conn:
-        tables = [row[0] for row in conn.execute(text(table_query)).fetchall()]
+        tables = conn.execute(text(table_query)).fetchall()
     
-    # Generate DDL for each table
-    for table_name in tables:
-        # Table definition
-        table_ddl = get_table_ddl(engine, table_name)
-        if table_ddl:
-            ddl_parts.append(f"-- Table: {table_name}")
-            ddl_parts.append(table_ddl)
-            ddl_parts.append("\nGO\n")
-        
-        # Indexes
-        index_ddl = get_index_ddl(engine, table_name)
-        if index_ddl:
-            ddl_parts.append(f"-- Indexes for: {table_name}")
-            ddl_parts.append(index_ddl)
-            ddl_parts.append("\nGO\n")
+    def table_ddl_parts(table) -> Tuple[str, str, str]:
+        # Each worker checks out its own pooled connection for the table's queries
+        with engine.connect() as conn:
+            return (
+                get_table_ddl(conn, table.name, table.object_id),
+                get_index_ddl(conn, table.object_id),
+                get_foreign_key_ddl(conn, table.object_id)
+            )
+    
+    # The per-table queries are independent, so their round trips overlap across
+    # workers; map() still returns the results in table order
+    fk_ddls = []
+    with ThreadPoolExecutor(max_workers=DDL_WORKERS) as executor:
+        for table_name, (table_ddl, index_ddl, fk_ddl) in zip((table.name for table in tables), executor.map(table_ddl_parts, tables)):
+            # Table definition
+            if table_ddl:
+                yield f"-- Table: {table_name}"
+                yield table_ddl
+                yield "\nGO\n"
+            
+            # Indexes
+            if index_ddl:
+                yield f"-- Indexes for: {table_name}"
+                yield index_ddl
+                yield "\nGO\n"
+            
+            fk_ddls.append((table_name, fk_ddl))
     
     # Add foreign keys at the end
-    for table_name in tables:
-        fk_ddl = get_foreign_key_ddl(engine, table_name)
+    for table_name, fk_ddl in fk_ddls:
         if fk_ddl:
-            ddl_parts.append(f"-- Foreign Keys for: {table_name}")
-            ddl_parts.append(fk_ddl)
-            ddl_parts.append("\nGO\n")
+            yield f"-- Foreign Keys for: {table_name}"
+            yield fk_ddl
+            yield "\nGO\n"
+
+def get_database_ddl():
+    """
+    Generate DDL for the entire database
+    
+    Returns:
+        str: Complete DDL script for the database
+    """
+    return '\n'.join(iter_database_ddl())
+
+def write_database_ddl(path: str):
+    """
+    Write the DDL for the entire database to a file as it is generated
     
-    return '\n'.join(ddl_parts)
+    Args:
+        path (str): File to write the DDL script to
+    """
+    with open(path, 'w') as f:
+        for i, fragment in enumerate(iter_database_ddl()):
+            if i:
+                f.write('\n')
+            f.write(fragment)
+
+def _group_by_object_id(rows) -> Dict[int, List]:
+    """Group result rows ordered by object_id into lists keyed by object_id"""
+    return {object_id: list(group) for object_id, group in groupby(rows, key=attrgetter('object_id'))}
 
 def get_database_schema() -> Dict:
     """
@@ -291,9 +319,67 @@ def get_database_schema() -> Dict:
     ORDER BY schema_name, table_name
     """
     
+    # Columns of every table, fetched in one query and grouped by table below
+    column_query = """
+    SELECT 
+        c.object_id,
+        c.name as column_name,
+        t.name as data_type,
+        c.max_length,
+        c.precision,
+        c.scale,
+        c.is_nullable,
+        ep.value as description
+    FROM sys.tables tb
+    JOIN sys.columns c ON c.object_id = tb.object_id
+    JOIN sys.types t ON c.user_type_id = t.user_type_id
+    LEFT JOIN sys.extended_properties ep ON 
+        ep.major_id = c.object_id AND 
+        ep.minor_id = c.column_id AND 
+        ep.name = 'MS_Description'
+    ORDER BY c.object_id, c.column_id
+    """
+    
+    # Primary keys of every table, fetched in one query and grouped by table below
+    pk_query = """
+    SELECT 
+        i.object_id,
+        i.name as pk_name,
+        c.name as column_name,
+        ic.is_descending_key
+    FROM sys.indexes i
+    JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+    JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+    WHERE i.is_primary_key = 1
+    ORDER BY i.object_id, ic.key_ordinal
+    """
+    
+    # Foreign keys of every table, fetched in one query and grouped by parent table below
+    fk_query = """
+    SELECT 
+        fk.parent_object_id as object_id,
+        fk.name as fk_name,
+        fk_col.name as fk_column_name,
+        SCHEMA_NAME(pk_tab.schema_id) as pk_schema_name,
+        pk_tab.name as pk_table_name,
+        pk_col.name as pk_column_name
+    FROM sys.foreign_keys fk
+    JOIN sys.foreign_key_columns fk_cols ON fk.object_id = fk_cols.constraint_object_id
+    JOIN sys.columns fk_col ON fk_cols.parent_object_id = fk_col.object_id 
+        AND fk_cols.parent_column_id = fk_col.column_id
+    JOIN sys.tables pk_tab ON fk.referenced_object_id = pk_tab.object_id
+    JOIN sys.columns pk_col ON fk_cols.referenced_object_id = pk_col.object_id 
+        AND fk_cols.referenced_column_id = pk_col.column_id
+    ORDER BY fk.parent_object_id, fk.name, fk_cols.constraint_column_id
+    """
+    
     with engine.connect() as conn:
         tables = conn.execute(text(table_query)).fetchall()
         
+        columns_by_table = _group_by_object_id(conn.execute(text(column_query)))
+        pks_by_table = _group_by_object_id(conn.execute(text(pk_query)))
+        fks_by_table = _group_by_object_id(conn.execute(text(fk_query)))
+        
         for table in tables:
             table_info = {
                 'schema': table.schema_name,
@@ -303,28 +389,7 @@ def get_database_schema() -> Dict:
                 'foreign_keys': []
             }
             
-            # Get columns
-            column_query = """
-            SELECT 
-                c.name as column_name,
-                t.name as data_type,
-                c.max_length,
-                c.precision,
-                c.scale,
-                c.is_nullable,
-                ep.value as description
-            FROM sys.columns c
-            JOIN sys.types t ON c.user_type_id = t.user_type_id
-            LEFT JOIN sys.extended_properties ep ON 
-                ep.major_id = c.object_id AND 
-                ep.minor_id = c.column_id AND 
-                ep.name = 'MS_Description'
-            WHERE c.object_id = :object_id
-            ORDER BY c.column_id
-            """
-            
-            columns = conn.execute(text(column_query), {'object_id': table.object_id}).fetchall()
-            for col in columns:
+            for col in columns_by_table.get(table.object_id, []):
                 # Format the data type with precision/scale/length if applicable
                 data_type = col.data_type
                 if col.data_type in ('char', 'varchar', 'nchar', 'nvarchar'):
@@ -342,50 +407,16 @@ def get_database_schema() -> Dict:
                     'description': col.description
                 })
             
-            # Get primary key
-            pk_query = """
-            SELECT 
-                i.name as pk_name,
-                c.name as column_name,
-                ic.is_descending_key
-            FROM sys.indexes i
-            JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
-            JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
-            WHERE i.object_id = :object_id AND i.is_primary_key = 1
-            ORDER BY ic.key_ordinal
-            """
-            
-            pk_columns = conn.execute(text(pk_query), {'object_id': table.object_id}).fetchall()
+            pk_columns = pks_by_table.get(table.object_id)
             if pk_columns:
                 table_info['primary_key'] = {
                     'name': pk_columns[0].pk_name,
                     'columns': [col.column_name for col in pk_columns]
                 }
             
-            # Get foreign keys
-            fk_query = """
-            SELECT 
-                fk.name as fk_name,
-                fk_col.name as fk_column_name,
-                SCHEMA_NAME(pk_tab.schema_id) as pk_schema_name,
-                pk_tab.name as pk_table_name,
-                pk_col.name as pk_column_name
-            FROM sys.foreign_keys fk
-            JOIN sys.foreign_key_columns fk_cols ON fk.object_id = fk_cols.constraint_object_id
-            JOIN sys.columns fk_col ON fk_cols.parent_object_id = fk_col.object_id 
-                AND fk_cols.parent_column_id = fk_col.column_id
-            JOIN sys.tables pk_tab ON fk.referenced_object_id = pk_tab.object_id
-            JOIN sys.columns pk_col ON fk_cols.referenced_object_id = pk_col.object_id 
-                AND fk_cols.referenced_column_id = pk_col.column_id
-            WHERE fk.parent_object_id = :object_id
-            ORDER BY fk.name, fk_cols.constraint_column_id
-            """
-            
-            fk_results = conn.execute(text(fk_query), {'object_id': table.object_id}).fetchall()
-            
             # Group foreign key columns by constraint name
             fk_dict = {}
-            for fk in fk_results:
+            for fk in fks_by_table.get(table.object_id, []):
                 if fk.fk_name not in fk_dict:
                     fk_dict[fk.fk_name] = {
                         'name': fk.fk_name,